@@ -0,0 +1,89 @@
+# action_performer/actions.py
+import shlex
+import subprocess
+import sys
+from typing import Sequence
+
+from evdev import ecodes
+from action_performer.linux import KEY_CLASS, VIRTUAL_DEVICES, encode_frames, write_encoded
+from utils.logger import get_logger
+
+logger = get_logger("actions")
+
+# The mapper's volume / media commands as consumer keys
+VOLUME_KEYS = {'up': ecodes.KEY_VOLUMEUP, 'down': ecodes.KEY_VOLUMEDOWN, 'mute': ecodes.KEY_MUTE}
+MEDIA_KEYS = {
+    'play_pause': ecodes.KEY_PLAYPAUSE,
+    'next_track': ecodes.KEY_NEXTSONG,
+    'prev_track': ecodes.KEY_PREVIOUSSONG,
+    'stop': ecodes.KEY_STOPCD,
+}
+
+
+class KeyTapAction:
+    """
+    Key taps, each pressing its keys in order and releasing them in reverse:
+    a hotkey such as Ctrl+C, a sequence ("Ctrl+K, Ctrl+C"), or a single
+    media key. Encoded once.
+    """
+
+    __slots__ = ('action_type', 'taps', 'writes')
+
+    def __init__(self, action_type: str, taps: Sequence[Sequence[int]]):
+        if not taps or not all(taps):
+            raise ValueError(f"{action_type} action without keys")
+        self.action_type = action_type
+        self.taps = tuple(tuple(codes) for codes in taps)
+        frames = []
+        for codes in self.taps:
+            frames.append([(ecodes.EV_KEY, code, 1) for code in codes])
+            frames.append([(ecodes.EV_KEY, code, 0) for code in reversed(codes)])
+        # Each key goes to the virtual device that declares it ("Ctrl+VolumeUp"
+        # spans the keyboard and consumer devices); consecutive frames for the
+        # same device share one buffer, so a plain hotkey is still one write
+        writes = []
+        for events in frames:
+            routes = {}
+            for event in events:
+                routes.setdefault(KEY_CLASS[event[1]], []).append(event)
+            for capability, batch in routes.items():
+                if writes and writes[-1][0] == capability:
+                    writes[-1][1].append(batch)
+                else:
+                    writes.append((capability, [batch]))
+        self.writes = tuple((capability, encode_frames(batches)) for capability, batches in writes)
+
+    def __call__(self, device, code, value):
+        try:
+            for capability, buffer in self.writes:
+                write_encoded(buffer, VIRTUAL_DEVICES.get(capability))
+        except OSError as e:
+            logger.error(f"Could not send {self.action_type} keys: {e}")
+
+    def __repr__(self) -> str:
+        return f"KeyTapAction({self.action_type!r}, {self.taps!r})"
+
+
+class LaunchAction:
+    """Starts a program (launch) or runs a script, detached from the input loop"""
+
+    __slots__ = ('action_type', 'argv')
+
+    def __init__(self, action_type: str, path: str, args: str = ""):
+        self.action_type = action_type
+        self.argv = (path,) + tuple(shlex.split(args)) if args else (path,)
+
+    def __call__(self, device, code, value):
+        argv = self.argv
+        if argv[0].endswith(".py"):
+            # Scripts from the mapper need not be executable
+            argv = (sys.executable,) + argv
+        try:
+            subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL, start_new_session=True)
+            logger.info(f"Started {' '.join(argv)}")
+        except OSError as e:
+            logger.error(f"Could not start {self.argv[0]}: {e}")
+
+    def __repr__(self) -> str:
+        return f"LaunchAction({self.action_type!r}, {self.argv!r})"
@@ -1,12 +1,222 @@
 # action_performer/linux.py
-from evdev import UInput, ecodes
-from utils.logger import get_logger
+import atexit
+import logging
+import os
+import struct
+import time
+from typing import Dict, Optional
+
+from evdev import ecodes
+from utils.logger import EVENT_JOURNAL, LogGate, get_logger
 
 logger = get_logger("action_performer")
+simulate_log = LogGate(logger, logging.DEBUG)
+
+ACTION_SIMULATED = EVENT_JOURNAL.action_id("simulated")
+ACTION_BATCH = EVENT_JOURNAL.action_id("batch")
+VIRTUAL_DEVICE_ID = EVENT_JOURNAL.device_id("uinput")
+
+# struct input_event; uinput ignores the timestamp and stamps events itself
+EVENT_STRUCT = struct.Struct("llHHi")
+SYN_REPORT_BYTES = EVENT_STRUCT.pack(0, 0, ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+
+# Capability classes, one virtual device each
+KEYBOARD, MOUSE, CONSUMER, GAMEPAD = "keyboard", "mouse", "consumer", "gamepad"
+
+# Inclusive EV_KEY code ranges per class; the keyboard takes every code no other class claims
+MOUSE_RANGES = [(ecodes.BTN_LEFT, ecodes.BTN_TASK)]
+GAMEPAD_RANGES = [
+    (ecodes.BTN_MISC, ecodes.BTN_GEAR_UP),  # misc, joystick, gamepad, digitizer and wheel buttons
+    (ecodes.BTN_DPAD_UP, ecodes.BTN_DPAD_RIGHT),
+    (ecodes.BTN_TRIGGER_HAPPY1, ecodes.BTN_TRIGGER_HAPPY40),
+]
+# Extended keys from KEY_OK up; the media keys below it are listed by name
+CONSUMER_RANGES = [(ecodes.KEY_OK, ecodes.KEY_MAX)]
+
+CONSUMER_KEY_NAMES = [
+    'KEY_MUTE', 'KEY_VOLUMEDOWN', 'KEY_VOLUMEUP', 'KEY_POWER', 'KEY_SLEEP', 'KEY_WAKEUP',
+    'KEY_NEXTSONG', 'KEY_PLAYPAUSE', 'KEY_PREVIOUSSONG', 'KEY_STOPCD', 'KEY_RECORD',
+    'KEY_REWIND', 'KEY_FASTFORWARD', 'KEY_PLAYCD', 'KEY_PAUSECD', 'KEY_EJECTCD',
+    'KEY_PLAY', 'KEY_MEDIA', 'KEY_CALC', 'KEY_MAIL', 'KEY_WWW', 'KEY_HOMEPAGE',
+    'KEY_BACK', 'KEY_FORWARD', 'KEY_REFRESH', 'KEY_BOOKMARKS', 'KEY_SEARCH', 'KEY_COMPUTER',
+    'KEY_CONFIG', 'KEY_BRIGHTNESSDOWN', 'KEY_BRIGHTNESSUP', 'KEY_MICMUTE',
+]
+
+def _codes(ranges) -> set:
+    return {code for first, last in ranges for code in range(first, last + 1)}
+
+def _build_capabilities() -> Dict[str, Dict[int, list]]:
+    mouse = _codes(MOUSE_RANGES)
+    gamepad = _codes(GAMEPAD_RANGES) - mouse
+    consumer = (_codes(CONSUMER_RANGES) - gamepad) | {getattr(ecodes, name) for name in CONSUMER_KEY_NAMES
+                                                      if hasattr(ecodes, name)}
+    keyboard = set(range(1, ecodes.KEY_MAX + 1)) - mouse - gamepad - consumer
+
+    return {
+        KEYBOARD: {ecodes.EV_KEY: sorted(keyboard)},
+        MOUSE: {
+            ecodes.EV_KEY: sorted(mouse),
+            ecodes.EV_REL: [ecodes.REL_X, ecodes.REL_Y, ecodes.REL_WHEEL, ecodes.REL_HWHEEL],
+        },
+        CONSUMER: {ecodes.EV_KEY: sorted(consumer)},
+        GAMEPAD: {ecodes.EV_KEY: sorted(gamepad)},
+    }
+
+CAPABILITY_CLASSES = _build_capabilities()
+
+# Key code -> capability class, so routing an event is one index
+KEY_CLASS = [KEYBOARD] * (ecodes.KEY_MAX + 1)
+for _cls in (MOUSE, CONSUMER, GAMEPAD):
+    for _code in CAPABILITY_CLASSES[_cls][ecodes.EV_KEY]:
+        KEY_CLASS[_code] = _cls
+KEY_CLASS = tuple(KEY_CLASS)
+del _cls, _code
+
+DEVICE_NAMES = {
+    KEYBOARD: "ColdKeys Virtual Keyboard",
+    MOUSE: "ColdKeys Virtual Mouse",
+    CONSUMER: "ColdKeys Virtual Consumer Control",
+    GAMEPAD: "ColdKeys Virtual Gamepad",
+}
+
+
+class FakeUInput:
+    """In-memory stand-in for UInput; writes land in a memfd that never blocks"""
+
+    def __init__(self, events=None, name="fake-uinput", **kwargs):
+        self.name = name
+        self.fd = os.memfd_create(name)
+        self._capabilities = events or {}
+
+    def capabilities(self, verbose=False, absinfo=True):
+        return self._capabilities
+
+    def write(self, etype, code, value):
+        os.write(self.fd, EVENT_STRUCT.pack(0, 0, etype, code, value))
+
+    def syn(self):
+        os.write(self.fd, SYN_REPORT_BYTES)
+
+    def events(self):
+        """Everything written so far as (type, code, value) tuples"""
+        size = os.lseek(self.fd, 0, os.SEEK_END)
+        data = os.pread(self.fd, size, 0)
+        return [event[2:] for event in EVENT_STRUCT.iter_unpack(data)]
+
+    def clear(self):
+        os.ftruncate(self.fd, 0)
+        os.lseek(self.fd, 0, os.SEEK_SET)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def _uinput_backend(events, name):
+    from evdev import UInput
+    return UInput(events=events, name=name)
+
+def _fake_backend(events, name):
+    return FakeUInput(events=events, name=name)
+
+BACKENDS = {"uinput": _uinput_backend, "fake": _fake_backend}
+
+
+class VirtualDevicePool:
+    """Lazily creates one virtual device per capability class and reuses it"""
+
+    def __init__(self, backend: str = "uinput"):
+        self._devices: Dict[str, object] = {}
+        self.use_backend(backend)
+
+    def use_backend(self, backend: str):
+        """Switch between real uinput and the in-memory fake; closes open devices"""
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown virtual device backend: {backend}")
+        self.close()
+        self.backend = backend
+        self._factory = BACKENDS[backend]
+
+    def get(self, capability: str = KEYBOARD):
+        device = self._devices.get(capability)
+        if device is None:
+            device = self._factory(CAPABILITY_CLASSES[capability], DEVICE_NAMES[capability])
+            self._devices[capability] = device
+            logger.info(f"Created virtual {capability} device ({self.backend})")
+        return device
+
+    def for_event(self, etype: int, code: int):
+        if etype == ecodes.EV_KEY:
+            return self.get(KEY_CLASS[code])
+        if etype == ecodes.EV_REL:
+            return self.get(MOUSE)
+        return self.get(KEYBOARD)
+
+    def created(self) -> Dict[str, object]:
+        return dict(self._devices)
+
+    def close(self):
+        for capability, device in list(self._devices.items()):
+            try:
+                device.close()
+                logger.info(f"Closed virtual {capability} device")
+            except Exception as e:
+                logger.warning(f"Failed to close virtual {capability} device: {e}")
+        self._devices.clear()
+
+
+VIRTUAL_DEVICES = VirtualDevicePool(os.environ.get("COLDKEYS_UINPUT_BACKEND", "uinput"))
+atexit.register(VIRTUAL_DEVICES.close)
+
+def encode_events(events) -> bytes:
+    """Pre-encode (type, code, value) tuples as one frame ending in SYN_REPORT"""
+    pack = EVENT_STRUCT.pack
+    return b"".join([pack(0, 0, etype, code, value) for etype, code, value in events]) + SYN_REPORT_BYTES
+
+def encode_frames(frames) -> bytes:
+    """Pre-encode several frames (e.g. a macro's key taps), each with its own SYN"""
+    return b"".join([encode_events(events) for events in frames])
+
+def write_encoded(buffer: bytes, device=None) -> int:
+    """Emit a pre-encoded buffer with as few write() calls as the kernel allows"""
+    fd = (device or VIRTUAL_DEVICES.get(KEYBOARD)).fd
+    view = memoryview(buffer)
+    written = 0
+    while written < len(buffer):
+        written += os.write(fd, view[written:])
+    return written // EVENT_STRUCT.size
+
+def _route(events) -> Dict[object, list]:
+    """Split a frame across the virtual devices that can emit each event"""
+    routes = {}
+    for event in events:
+        routes.setdefault(VIRTUAL_DEVICES.for_event(event[0], event[1]), []).append(event)
+    return routes
+
+def write_events(events, device: Optional[object] = None) -> bool:
+    """
+    Emit a sequence of (type, code, value) tuples and one SYN_REPORT in a
+    single write() instead of a write + syn per event.
+    """
+    try:
+        if device is not None:
+            count = write_encoded(encode_events(events), device)
+        else:
+            count = 0
+            for target, batch in _route(events).items():
+                count += write_encoded(encode_events(batch), target)
+        EVENT_JOURNAL.record(time.time(), VIRTUAL_DEVICE_ID, ecodes.EV_SYN, ecodes.SYN_REPORT, count, ACTION_BATCH)
+        if simulate_log.enabled:
+            logger.debug(f"Simulated batch of {count} events")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to simulate event batch: {e}")
+        return False
 
-# Create virtual input device once
-ui = UInput()
-ui.name = "Virtual Input Device"
+def write_frame(frame, device=None) -> bool:
+    """Re-emit an input_handler frame: (sec, usec, ((type, code, value), ...))"""
+    return write_events(frame[2], device)
 
 def simulate_key(code, value):
     """
@@ -14,9 +224,12 @@ def simulate_key(code, value):
     value: 1 = down, 0 = up, 2 = hold
     """
     try:
-        ui.write(ecodes.EV_KEY, code, value)
-        ui.syn()
-        state = {0: "KEY_UP", 1: "KEY_DOWN", 2: "KEY_HOLD"}.get(value, f"UNKNOWN({value})")
-        logger.info(f"Simulated {state} for key code {code}")
+        device = VIRTUAL_DEVICES.get(KEY_CLASS[code])
+        # Event and SYN_REPORT go out in one write()
+        os.write(device.fd, EVENT_STRUCT.pack(0, 0, ecodes.EV_KEY, code, value) + SYN_REPORT_BYTES)
+        EVENT_JOURNAL.record(time.time(), VIRTUAL_DEVICE_ID, ecodes.EV_KEY, code, value, ACTION_SIMULATED)
+        if simulate_log.enabled:
+            state = {0: "KEY_UP", 1: "KEY_DOWN", 2: "KEY_HOLD"}.get(value, f"UNKNOWN({value})")
+            logger.debug(f"Simulated {state} for key code {code}")
     except Exception as e:
         logger.error(f"Failed to simulate key event: {e}")
@@ -0,0 +1,95 @@
+# benchmarks/bench_chords.py
+# Run from the repository root: python3 -m benchmarks.bench_chords
+import logging
+import random
+import time
+
+from evdev import ecodes
+from input_handler.key_state import MODIFIER_BITS
+from keymap_handler import chords, core
+from keymap_handler.chords import ChordMatcher, compile_chords
+from keymap_handler.core import KEY_DOWN, KEY_UP
+
+KEY_DOWNS = 200_000
+SCAN_LIMIT = 1000  # the linear scan gets too slow to time past this
+KEYS = [code for code in range(1, ecodes.KEY_F24 + 1) if code in ecodes.KEY and not MODIFIER_BITS[code]]
+
+
+def action(device, code, value):
+    pass
+
+
+def build_bindings(count: int, rng: random.Random) -> dict:
+    """count distinct bindings; a third of them two-chord sequences whose first chords never bind alone"""
+    bindings = {}
+    prefixes = set()
+    while len(bindings) < count:
+        first = (rng.randrange(16), rng.choice(KEYS))
+        if rng.random() < 0.33:
+            if (first,) in bindings:
+                continue
+            prefixes.add(first)
+            bindings.setdefault((first, (rng.randrange(16), rng.choice(KEYS))), action)
+        elif first not in prefixes:
+            bindings.setdefault((first,), action)
+    return bindings
+
+
+def key_stream(bindings: dict, rng: random.Random) -> list:
+    """(modifiers, code) key downs: mostly bound chords, the rest random keys"""
+    sequences = list(bindings)
+    stream = []
+    while len(stream) < KEY_DOWNS:
+        if rng.random() < 0.7:
+            stream.extend(rng.choice(sequences))
+        else:
+            stream.append((rng.randrange(16), rng.choice(KEYS)))
+    return stream[:KEY_DOWNS]
+
+
+def trie_ns(table, stream) -> float:
+    """Per key press: the key down that matches and its release"""
+    matcher = ChordMatcher()
+    feed = matcher.feed
+    start = time.perf_counter_ns()
+    for now, (modifiers, code) in enumerate(stream):
+        feed(table, code, KEY_DOWN, modifiers, now * 0.01)
+        feed(table, code, KEY_UP, modifiers, now * 0.01)
+    return (time.perf_counter_ns() - start) / len(stream)
+
+
+def scan_ns(bindings: dict, stream) -> float:
+    """The trie's work done by walking a binding list on every key down"""
+    entries = list(bindings.items())
+    progress = ()
+    start = time.perf_counter_ns()
+    for modifiers, code in stream:
+        chord = (modifiers, code)
+        candidate = progress + (chord,)
+        progress = ()
+        for sequence, handler in entries:
+            if sequence[:len(candidate)] == candidate:
+                progress = () if len(sequence) == len(candidate) else candidate
+                break
+    return (time.perf_counter_ns() - start) / len(stream)
+
+
+def main():
+    for module in (chords, core):
+        module.logger.handlers = [logging.NullHandler()]
+    rng = random.Random(1)
+
+    print(f"{'bindings':>9} {'compile ms':>11} {'trie ns/key':>12} {'scan ns/key':>12}")
+    for count in (10, 100, 1000, 10000):
+        bindings = build_bindings(count, rng)
+        start = time.perf_counter()
+        table = compile_chords(bindings)
+        compile_ms = (time.perf_counter() - start) * 1000
+        stream = key_stream(bindings, rng)
+        trie = min(trie_ns(table, stream) for _ in range(3))
+        scan = f"{scan_ns(bindings, stream[:KEY_DOWNS // 20]):>12.0f}" if count <= SCAN_LIMIT else f"{'-':>12}"
+        print(f"{count:>9} {compile_ms:>11.2f} {trie:>12.0f} {scan}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# benchmarks/bench_debounce.py
+# Run from the repository root: python3 -m benchmarks.bench_debounce
+import logging
+import os
+import random
+import string
+import tempfile
+import time
+
+from evdev import ecodes
+from action_performer.linux import VIRTUAL_DEVICES
+from device_manager.fake import build_backend
+from input_handler import debounce, linux, recorder
+from input_handler.debounce import DEBOUNCE, Debouncer
+from input_handler.recorder import EventRecorder, Recording
+
+KEYSTROKES = 20000
+CHATTER_RATE = 0.05  # share of key changes followed by a bounce
+WINDOW_MS = 5.0
+REPEATS = 5
+KEYS = [ecodes.ecodes[f"KEY_{letter}"] for letter in string.ascii_uppercase]
+
+
+def capture(path: str, rng: random.Random) -> int:
+    """Record a worn keyboard: 80-250 ms keystrokes, some changes bouncing 0.3-3 ms later; returns bounces"""
+    backend = build_backend(keyboards=1, mice=0)
+    device = next(iter(backend.devices.values()))
+    bounces = 0
+    stamp = 1_000_000
+    with EventRecorder(path, [device]) as recorder:
+        def frame(code, value):
+            sec, usec = divmod(stamp, 1_000_000)
+            recorder.record(device, [(sec, usec, ecodes.EV_MSC, ecodes.MSC_SCAN, code),
+                                     (sec, usec, ecodes.EV_KEY, code, value),
+                                     (sec, usec, ecodes.EV_SYN, ecodes.SYN_REPORT, 0)])
+
+        for _ in range(KEYSTROKES):
+            code = rng.choice(KEYS)
+            for value, hold in ((1, rng.randint(80_000, 250_000)), (0, rng.randint(30_000, 120_000))):
+                frame(code, value)
+                if rng.random() < CHATTER_RATE:
+                    # The contact opens and closes again before settling
+                    stamp += rng.randint(300, 1500)
+                    frame(code, 1 - value)
+                    stamp += rng.randint(300, 1500)
+                    frame(code, value)
+                    bounces += 2
+                stamp += hold
+    backend.close()
+    return bounces
+
+
+def key_frames(recording: Recording) -> list:
+    ev_key = ecodes.EV_KEY
+    return [([(code, value) for _, _, etype, code, value in raw if etype == ev_key], timestamp)
+            for _, timestamp, raw in recording.iter_frames()]
+
+
+def unfiltered(keys, stamp_us):
+    return keys
+
+
+def filter_ns(frames: list, key_events: int) -> float:
+    """What Debouncer.filter() adds per key event, over the same loop calling a no-op"""
+    best = {}
+    for _ in range(REPEATS):
+        for filter_keys in (unfiltered, Debouncer("bench", WINDOW_MS).filter):
+            start = time.perf_counter_ns()
+            for keys, stamp_us in frames:
+                filter_keys(keys, stamp_us)
+            elapsed = time.perf_counter_ns() - start
+            best[filter_keys.__name__] = min(best.get(filter_keys.__name__, elapsed), elapsed)
+    return (best['filter'] - best['unfiltered']) / key_events
+
+
+def replay_seconds(path: str, window_ms: float) -> float:
+    DEBOUNCE.set_window(None, window_ms)
+    for recorded in Recording.load(path).devices:
+        DEBOUNCE.forget(recorded.path)
+    return linux.replay_recording(path, speed=0)['seconds']
+
+
+def short_tap() -> list:
+    """
+    A real release inside the window is held back, then goes out once it
+    closes: on the next frame, or from a timer when no frame follows
+    """
+    expected = [[(ecodes.KEY_A, 1)], [], [(ecodes.KEY_A, 0), (ecodes.KEY_A, 1)], [(ecodes.KEY_A, 0)]]
+    debouncer = Debouncer("short_tap", 30.0)
+    frames = [debouncer.filter([(ecodes.KEY_A, value)], ms * 1000)
+              for ms, value in ((0, 1), (20, 0), (200, 1), (260, 0))]
+    assert frames == expected, f"short tap on the next frame: {frames}"
+
+    debouncer = Debouncer("short_tap", 30.0)
+    debouncer.filter([(ecodes.KEY_A, 1)], 0)
+    debouncer.filter([(ecodes.KEY_A, 0)], 20_000)
+    assert debouncer.due == [30_000], debouncer.due
+    assert debouncer.settle(29_999) == [] and debouncer.settle(30_000) == [(ecodes.KEY_A, 0)]
+    return frames
+
+
+def main():
+    for module in (debounce, linux, recorder):
+        module.logger.handlers = [logging.NullHandler()]
+    VIRTUAL_DEVICES.use_backend("fake")
+    rng = random.Random(1)
+
+    path = os.path.join(tempfile.mkdtemp(), "chatter.ckrec")
+    bounces = capture(path, rng)
+    recording = Recording.load(path)
+    frames = key_frames(recording)
+    key_events = sum(len(keys) for keys, _ in frames)
+    print(f"recording: {len(recording):,} events, {key_events:,} key events, {bounces:,} of them chatter")
+
+    print(f"filter() adds: {filter_ns(frames, key_events):.0f} ns/key event")
+
+    # Alternate the two so machine noise hits both alike
+    off = on = float("inf")
+    for _ in range(REPEATS):
+        off = min(off, replay_seconds(path, 0))
+        on = min(on, replay_seconds(path, WINDOW_MS))
+    print(f"replay, debounce off: {off * 1e9 / key_events:,.0f} ns/key event")
+    print(f"replay, {WINDOW_MS:g} ms window: {on * 1e9 / key_events:,.0f} ns/key event "
+          f"(includes skipping the keymap for dropped chatter)")
+
+    counts = {key: count for stats in DEBOUNCE.chatter().values() for key, count in stats.items()}
+    worst = ", ".join(f"{key} {count}" for key, count in sorted(counts.items(), key=lambda item: -item[1])[:3])
+    print(f"chatter filtered: {sum(counts.values()):,} of {bounces:,} (worst keys: {worst})")
+    print(f"short tap (30 ms window, released after 20 ms): {short_tap()}")
+
+
+if __name__ == "__main__":
+    main()
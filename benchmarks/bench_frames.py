@@ -0,0 +1,119 @@
+# benchmarks/bench_frames.py
+# Run from the repository root: python3 -m benchmarks.bench_frames
+import logging
+import time
+
+from evdev import ecodes
+from action_performer.linux import VIRTUAL_DEVICES
+from input_handler import linux
+from input_handler.key_state import key_name
+from keymap_handler.core import PASSTHROUGH
+from utils.logger import EVENT_JOURNAL
+
+READ_SIZE = 64  # evdev's device_read_many returns at most 64 events per read
+REPEATS = 5
+
+
+class StreamDevice:
+    name = "bench-device"
+    path = "/dev/input/bench0"
+    fd = -1
+
+
+def recorded_stream(seconds: float = 1.0):
+    """One second of a 1000 Hz NKRO keyboard and an 8 kHz mouse interleaved"""
+    events = []
+    usec = 0
+    for tick in range(int(8000 * seconds)):
+        usec += 125
+        sec, us = divmod(usec, 1_000_000)
+        # Mouse motion every 125 us
+        events.append((sec, us, ecodes.EV_REL, ecodes.REL_X, 1))
+        events.append((sec, us, ecodes.EV_REL, ecodes.REL_Y, -1))
+        events.append((sec, us, ecodes.EV_SYN, ecodes.SYN_REPORT, 0))
+        # Keyboard report every millisecond: scan code + 4 keys (rolling chord)
+        if tick % 8 == 0:
+            value = (tick // 8) % 2
+            events.append((sec, us, ecodes.EV_MSC, ecodes.MSC_SCAN, 0x70004))
+            for code in (ecodes.KEY_A, ecodes.KEY_S, ecodes.KEY_D, ecodes.KEY_F):
+                events.append((sec, us, ecodes.EV_KEY, code, value))
+            events.append((sec, us, ecodes.EV_SYN, ecodes.SYN_REPORT, 0))
+    return [tuple(events[i:i + READ_SIZE]) for i in range(0, len(events), READ_SIZE)]
+
+
+def per_event_path(device, reads):
+    """The pre-frame read_key_events body, applied to every event"""
+    log = linux.logger
+    for events in reads:
+        for sec, usec, etype, code, value in events:
+            if etype == ecodes.EV_KEY:
+                key_code = code
+                key_value = value
+                key_timestamp = sec + usec / 1e6
+
+                key_state = {0: "KEY_UP", 1: "KEY_DOWN", 2: "KEY_HOLD"}.get(key_value, "UNKNOWN")
+                key_name = ecodes.KEY.get(key_code, f"KEY_{key_code}")
+
+                log.info(f"{key_state}: {key_name} ({key_code}) at {key_timestamp:.4f}")
+
+
+def per_event_dispatch_path(device, reads):
+    """The per-event body doing what the frame path does for each key: state, keymap, journal"""
+    key_state = linux.PRESSED_KEYS.for_device(device.path)
+    device_id = EVENT_JOURNAL.device_id(device.path)
+    keymap = linux.ACTIVE_KEYMAP
+    log = linux.logger
+    for events in reads:
+        for sec, usec, etype, code, value in events:
+            if etype == ecodes.EV_KEY:
+                key_timestamp = sec + usec / 1e6
+                key_state.update(code, value)
+                handler = keymap.table.slots[code * 3 + value]
+                action_id = linux.ACTION_PASSTHROUGH if handler is PASSTHROUGH else linux.ACTION_SWALLOW
+                EVENT_JOURNAL.record(key_timestamp, device_id, etype, code, value, action_id)
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug(f"{linux.KEY_STATES.get(value, 'UNKNOWN')}: {key_name(code)} ({code}) "
+                              f"at {key_timestamp:.4f}")
+
+
+def per_frame_path(device, reads):
+    """The reactor's handler: key frames assembled and dispatched through the keymap"""
+    # The per-event body never re-emitted unmapped keys; leave that out here too
+    handle = linux.frame_handler(simulate_unmapped=False)
+    for events in reads:
+        handle(device, events)
+
+
+def bench(path, device, reads) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        path(device, reads)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    # Keep record creation and formatting but drop the console/file I/O
+    linux.logger.handlers = [logging.NullHandler()]
+    # Keys a stream leaves held are released at exit; keep that off /dev/uinput
+    VIRTUAL_DEVICES.use_backend("fake")
+
+    device = StreamDevice()
+    reads = recorded_stream()
+    total = sum(len(events) for events in reads)
+
+    event_time = bench(per_event_path, device, reads)
+    dispatch_time = bench(per_event_dispatch_path, device, reads)
+    frame_time = bench(per_frame_path, device, reads)
+
+    print(f"stream: {total:,} events in {len(reads):,} reads")
+    print(f"per-event (log only):   {event_time * 1e3:8.2f} ms  {total / event_time:>14,.0f} events/s")
+    print(f"per-event (dispatched): {dispatch_time * 1e3:8.2f} ms  {total / dispatch_time:>14,.0f} events/s")
+    print(f"per-frame (dispatched): {frame_time * 1e3:8.2f} ms  {total / frame_time:>14,.0f} events/s")
+    print(f"speedup vs log only:    {event_time / frame_time:8.2f}x")
+    print(f"speedup vs dispatched:  {dispatch_time / frame_time:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# benchmarks/bench_grab.py
+# Run from the repository root: python3 -m benchmarks.bench_grab
+import logging
+import time
+
+from evdev import ecodes
+
+from device_manager import linux
+from device_manager.fake import build_backend
+from utils import led_control
+
+ROUNDS = 20
+
+
+def grab_cycle(devices) -> tuple:
+    """Best grab+ungrab time in ms, with LED reads and writes per cycle"""
+    best = None
+    for _ in range(ROUNDS):
+        for device in devices:
+            device.ioctl_count = device.write_count = 0
+        start = time.perf_counter()
+        linux.grab_devices(devices)
+        # Something toggled Caps Lock on every device while they were grabbed
+        for device in devices:
+            device._leds.symmetric_difference_update({ecodes.LED_CAPSL})
+        linux.ungrab_devices(devices)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    # One EVIOCGLED at grab and one at ungrab; the changed LED plus a SYN written back
+    reads = sum(device.ioctl_count for device in devices)
+    writes = sum(device.write_count for device in devices)
+    return best * 1000, reads, writes
+
+
+def main():
+    for module in (linux, led_control):
+        module.logger.handlers = [logging.NullHandler()]
+
+    print(f"{'devices':>8} {'ms':>8} {'reads':>6} {'writes':>7}")
+    for keyboards in (5, 25, 100):
+        backend = build_backend(keyboards=keyboards, mice=0)
+        devices = list(backend.devices.values())
+        ms, reads, writes = grab_cycle(devices)
+        print(f"{len(devices):>8} {ms:>8.3f} {reads:>6} {writes:>7}")
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
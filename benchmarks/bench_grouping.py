@@ -0,0 +1,62 @@
+# benchmarks/bench_grouping.py
+# Run from the repository root: python3 -m benchmarks.bench_grouping
+import logging
+import tempfile
+import time
+from collections import defaultdict
+
+from device_manager import linux
+from device_manager.capability_cache import CapabilityCache
+from device_manager.fake import build_backend
+from device_manager.sysfs import SysfsBackend, write_fixture_tree
+
+ROUNDS = 5
+SUFFIXES = [' Consumer Control', ' System Control', ' Keyboard', ' Mouse', ' Touchpad', ' event', ' kbd', ' consumer']
+
+
+def legacy_group(devices):
+    """The name-suffix heuristic grouping used before topology grouping"""
+    device_names = defaultdict(list)
+    for path, device in devices.items():
+        normalized = device.name
+        for suffix in SUFFIXES:
+            if normalized.endswith(suffix):
+                normalized = normalized[:-len(suffix)]
+        device_names[normalized.strip()].append((path, device))
+    return {name: members for name, members in device_names.items() if len(members) > 1}
+
+
+def best_of(func) -> float:
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    linux.logger.handlers = [logging.NullHandler()]
+
+    print(f"{'devices':>8} {'name us/dev':>12} {'phys us/dev':>12} {'sysfs us/dev':>13} {'groups':>7}")
+    for pairs in (50, 200, 800, 1600):
+        backend = build_backend(keyboards=pairs, mice=pairs)
+        devices = dict(backend.devices)
+        detector = linux.InputDeviceDetector(backend, cache=CapabilityCache())
+
+        root = write_fixture_tree(tempfile.mkdtemp(), devices.values())
+        sysfs_backend = SysfsBackend(root, opener=backend.open)
+        sysfs_devices = {path: sysfs_backend.open(path) for path in sysfs_backend.list_devices()}
+        sysfs_detector = linux.InputDeviceDetector(sysfs_backend, cache=CapabilityCache())
+
+        count = len(devices)
+        name_us = best_of(lambda: legacy_group(devices)) / count * 1e6
+        phys_us = best_of(lambda: detector._group_related_devices(devices)) / count * 1e6
+        sysfs_us = best_of(lambda: sysfs_detector._group_related_devices(sysfs_devices)) / count * 1e6
+        print(f"{count:>8} {name_us:>12.2f} {phys_us:>12.2f} {sysfs_us:>13.2f} {len(detector.device_groups):>7}")
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_hotplug.py
+# Run from the repository root: python3 -m benchmarks.bench_hotplug
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from device_manager import hotplug, linux
+from device_manager.capability_cache import CapabilityCache
+from device_manager.fake import FakeBackend, build_backend, consumer_capabilities
+from device_manager.hotplug import DEVICE_REGRABBED, DeviceRegistry
+from evdev.device import DeviceInfo
+from utils import led_control
+
+CYCLES = 50
+BYSTANDERS = 40  # unrelated devices that a full rescan would have to revisit
+
+
+def main():
+    for module in (linux, hotplug, led_control):
+        module.logger.handlers = [logging.NullHandler()]
+
+    watch_dir = tempfile.mkdtemp()
+    backend = FakeBackend()
+    for device in build_backend(keyboards=BYSTANDERS // 2).devices.values():
+        path = os.path.join(watch_dir, os.path.basename(device.path))
+        backend.add_device(device.name, device.capabilities(), phys=device.phys, info=device.info, path=path)
+        open(path, "w").close()
+
+    info = DeviceInfo(bustype=0x03, vendor=0x1209, product=0x0100, version=0x1)
+    macropad = os.path.join(watch_dir, "event100")
+    consumer = os.path.join(watch_dir, "event101")
+
+    def plug():
+        backend.add_keyboard("Macropad", layout="macropad", phys="usb-9/input0", info=info, path=macropad)
+        backend.add_device("Macropad Consumer Control", consumer_capabilities(), phys="usb-9/input1",
+                           info=info, path=consumer)
+        for path in (macropad, consumer):
+            open(path, "w").close()
+
+    def unplug():
+        for path in (macropad, consumer):
+            backend.remove_device(path)
+            os.unlink(path)
+
+    plug()
+    registry = DeviceRegistry(backend, watch_dir=watch_dir,
+                              detector=linux.InputDeviceDetector(backend, cache=CapabilityCache()))
+    regrabbed = threading.Event()
+    registry.subscribe(lambda event, path, device: event == DEVICE_REGRABBED and regrabbed.set())
+    registry.start()
+    registry.grab(macropad)
+
+    latencies = []
+    for _ in range(CYCLES):
+        unplug()
+        time.sleep(0.005)
+        regrabbed.clear()
+        start = time.perf_counter()
+        plug()
+        if not regrabbed.wait(1.0):
+            print("re-grab timed out")
+            break
+        latencies.append((time.perf_counter() - start) * 1000)
+    registry.stop()
+
+    start = time.perf_counter()
+    linux.InputDeviceDetector(backend, cache=CapabilityCache()).scan_all_devices()
+    rescan_ms = (time.perf_counter() - start) * 1000
+
+    latencies.sort()
+    print(f"{len(backend.devices)} devices, {len(latencies)} reconnects")
+    print(f"reconnect -> re-grab: p50 {latencies[len(latencies) // 2]:.2f} ms, "
+          f"max {latencies[-1]:.2f} ms")
+    print(f"full rescan for comparison: {rescan_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
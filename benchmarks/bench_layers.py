@@ -0,0 +1,114 @@
+# benchmarks/bench_layers.py
+# Run from the repository root: python3 -m benchmarks.bench_layers
+import logging
+import random
+import time
+
+from evdev import ecodes
+from keymap_handler import core, layers
+from keymap_handler.core import KEY_DOWN, KEY_UP, KEY_VALUES, PASSTHROUGH, compile_keymap
+from keymap_handler.layers import LayerState, compile_layers, momentary
+
+KEY_PRESSES = 100_000
+BINDINGS_PER_LAYER = 40
+KEYS = [code for code in range(ecodes.KEY_1, ecodes.KEY_SLASH + 1)]
+LAYER_KEY = ecodes.KEY_CAPSLOCK
+
+
+def action(device, code, value):
+    pass
+
+
+def build_layers(count: int, rng: random.Random) -> list:
+    """Layer 0 binds everything plus a momentary key per upper layer; upper layers bind a few keys each"""
+    specs = [{code: action for code in KEYS}]
+    specs[0].update({ecodes.KEY_F1 + index: momentary(index + 1) for index in range(count - 1)})
+    for _ in range(count - 1):
+        specs.append({code: action for code in rng.sample(KEYS, min(BINDINGS_PER_LAYER // 4, len(KEYS)))})
+    return specs
+
+
+def resolve_ns(table, stream, active: int) -> float:
+    """LayerState.resolve() for a press and release, source-layer tracking included"""
+    state = LayerState()
+    state.resolve(table.layers, KEYS[0], KEY_UP)
+    state.set_layers(*range(active))
+    resolve = state.resolve
+    stack = table.layers
+    start = time.perf_counter_ns()
+    for code in stream:
+        resolve(stack, code, KEY_DOWN)
+        resolve(stack, code, KEY_UP)
+    return (time.perf_counter_ns() - start) / len(stream)
+
+
+def bitmask_ns(table, stream, active: int) -> float:
+    """The lookup alone: highest active layer that binds the slot"""
+    tables = table.layers.tables
+    owners = table.layers.owners
+    mask = (1 << active) - 1
+    start = time.perf_counter_ns()
+    for code in stream:
+        for value in (KEY_DOWN, KEY_UP):
+            slot = code * KEY_VALUES + value
+            tables[(mask & owners[slot]).bit_length() - 1][slot]
+    return (time.perf_counter_ns() - start) / len(stream)
+
+
+def walk_ns(table, stream, active: int) -> float:
+    """The same lookup checking each active layer top-down, without the owner masks"""
+    tables = table.layers.tables[:active][::-1]
+    start = time.perf_counter_ns()
+    for code in stream:
+        for value in (KEY_DOWN, KEY_UP):
+            slot = code * KEY_VALUES + value
+            for slots in tables:
+                if slots[slot] is not PASSTHROUGH:
+                    break
+    return (time.perf_counter_ns() - start) / len(stream)
+
+
+def switch_ns(table) -> float:
+    """One momentary layer key press + release"""
+    state = LayerState()
+    resolve = state.resolve
+    stack = table.layers
+    start = time.perf_counter_ns()
+    for _ in range(KEY_PRESSES // 10):
+        resolve(stack, ecodes.KEY_F1, KEY_DOWN)
+        resolve(stack, ecodes.KEY_F1, KEY_UP)
+    return (time.perf_counter_ns() - start) / (KEY_PRESSES // 10)
+
+
+def recompile_us(specs) -> float:
+    """The alternative: flatten the active layers into one table on every switch"""
+    merged = {}
+    for spec in specs:
+        merged.update({key: value for key, value in spec.items() if callable(value)})
+    start = time.perf_counter()
+    compile_keymap(merged, name="flattened")
+    return (time.perf_counter() - start) * 1e6
+
+
+def main():
+    for module in (core, layers):
+        module.logger.handlers = [logging.NullHandler()]
+    rng = random.Random(1)
+    stream = [rng.choice(KEYS) for _ in range(KEY_PRESSES)]
+
+    print(f"{'layers':>7} {'active':>7} {'bitmask ns':>11} {'walk ns':>8} {'resolve ns':>11} "
+          f"{'switch ns':>10} {'recompile us':>13}")
+    for count in (2, 4, 16, 32):
+        specs = build_layers(count, rng)
+        table = compile_layers(specs, name=f"bench{count}")
+        for active in sorted({1, count // 2 or 1, count}):
+            bitmask = min(bitmask_ns(table, stream, active) for _ in range(3))
+            walk = min(walk_ns(table, stream, active) for _ in range(3))
+            resolve = min(resolve_ns(table, stream, active) for _ in range(3))
+            print(f"{count:>7} {active:>7} {bitmask:>11.0f} {walk:>8.0f} {resolve:>11.0f} "
+                  f"{switch_ns(table):>10.0f} {recompile_us(specs):>13.0f}")
+    print("(per key press: down + up)")
+
+
+if __name__ == "__main__":
+    main()
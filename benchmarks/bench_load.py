@@ -0,0 +1,70 @@
+# benchmarks/bench_load.py
+# Run from the repository root: python3 -m benchmarks.bench_load
+import logging
+
+from action_performer.linux import VIRTUAL_DEVICES
+from device_manager.fake import build_backend
+from input_handler import linux
+from input_handler.load_generator import LoadGenerator
+from input_handler.reactor import EventReactor
+from utils.latency import KERNEL_TO_READ, LATENCY, LatencyHistogram
+
+DURATION = 2.0
+
+
+def bench(device_pairs: int):
+    """Realtime load: N keyboards at 1000 Hz plus N mice at 8 kHz"""
+    LATENCY.reset()
+    LATENCY.enabled = True
+    backend = build_backend(keyboards=device_pairs, mice=device_pairs)
+    devices = list(backend.devices.values())
+
+    handled = [0]
+    dispatch = linux.frame_handler()
+
+    def on_events(device, events):
+        handled[0] += len(events)
+        dispatch(device, events)
+
+    reactor = EventReactor(on_events)
+    generator = LoadGenerator()
+    for device in devices:
+        reactor.add_device(device)
+        if device.name.startswith("Fake Mouse"):
+            generator.add_mouse(device)
+        elif "Consumer" not in device.name:
+            generator.add_keyboard(device)
+
+    generator.start(DURATION)
+    while generator.running:
+        reactor.poll(0.01)
+    generator.stop()
+    while reactor.poll(0):
+        pass
+
+    stats = generator.stats()
+    latency = LatencyHistogram()
+    for label in LATENCY.summary(KERNEL_TO_READ).get(KERNEL_TO_READ, {}):
+        latency.merge(LATENCY.histogram(KERNEL_TO_READ, label))
+
+    reactor.close()
+    backend.close()
+    return stats, handled[0], latency.summary()
+
+
+def main():
+    # Keep record creation and formatting but drop the console/file I/O
+    for log in (linux.logger, logging.getLogger("input_reactor")):
+        log.handlers = [logging.NullHandler()]
+    # Keys a stream leaves held are released at exit; keep that off /dev/uinput
+    VIRTUAL_DEVICES.use_backend("fake")
+
+    print(f"{'pairs':>6} {'offered ev/s':>14} {'handled ev/s':>14} {'dropped':>8} {'read p50 us':>12} {'read p99 us':>12}")
+    for pairs in (1, 2, 4, 8):
+        stats, handled, latency = bench(pairs)
+        print(f"{pairs:>6} {stats['events'] / DURATION:>14,.0f} {handled / DURATION:>14,.0f} "
+              f"{stats['dropped']:>8} {latency['p50_us']:>12.1f} {latency['p99_us']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
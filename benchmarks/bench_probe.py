@@ -0,0 +1,61 @@
+# benchmarks/bench_probe.py
+# Run from the repository root: python3 -m benchmarks.bench_probe
+import logging
+import time
+
+from device_manager import capability_cache, handles, linux
+from device_manager.capability_cache import CapabilityCache
+from device_manager.fake import build_backend
+from device_manager.handles import HandleRegistry
+from device_manager.linux import InputDeviceDetector
+
+# Every device takes OPEN_DELAY to open (a real open plus its ioctls over a
+# slow bus), WAKING ones take WAKE_DELAY and one HUNG device never answers in time
+OPEN_DELAY = 0.01
+WAKE_DELAY = 0.25
+HUNG_DELAY = 3.0
+WAKING = 3
+PROBE_TIMEOUT = 0.5
+
+
+def scan(backend, workers: int, timeout: float) -> tuple:
+    """Scan time in ms, devices classified and devices reported slow"""
+    detector = InputDeviceDetector(backend, cache=CapabilityCache(), handles=HandleRegistry(backend),
+                                   probe_workers=workers, probe_timeout=timeout)
+    start = time.perf_counter()
+    results = detector.scan_all_devices()
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000, len(results['raw_devices']), len(results['slow_devices'])
+
+
+def main():
+    # Keep record creation and formatting but drop the console/file I/O
+    for module in (linux, capability_cache, handles):
+        module.logger.handlers = [logging.NullHandler()]
+
+    print(f"{'devices':>8} {'mode':<18} {'ms':>9} {'found':>6} {'slow':>5}")
+    for count in (10, 30):
+        third = count // 3
+        backend = build_backend(keyboards=third, mice=third, macropads=count - 3 * third)
+        paths = list(backend.devices)
+        delays = {path: OPEN_DELAY for path in paths}
+        delays.update((path, WAKE_DELAY) for path in paths[1:1 + WAKING])
+
+        modes = [
+            ("sequential", 1, HUNG_DELAY * 10, False),
+            ("parallel", linux.PROBE_WORKERS, PROBE_TIMEOUT, False),
+            ("parallel + hung", linux.PROBE_WORKERS, PROBE_TIMEOUT, True),
+        ]
+        for mode, workers, timeout, hung in modes:
+            backend.open_delays = dict(delays)
+            if hung:
+                backend.open_delays[paths[0]] = HUNG_DELAY
+            ms, found, slow = scan(backend, workers, timeout)
+            print(f"{len(paths):>8} {mode:<18} {ms:>9.1f} {found:>6} {slow:>5}")
+        # Let the abandoned probe finish before the devices go away
+        time.sleep(HUNG_DELAY)
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_profiles.py
+# Run from the repository root: python3 -m benchmarks.bench_profiles
+import json
+import logging
+import os
+import random
+import string
+import tempfile
+import time
+
+from keymap_handler import chords, core, profiles
+from keymap_handler.core import Keymap
+from keymap_handler.profiles import ProfileLoader
+
+PROFILE_COUNT = 36
+SHORTCUTS = 1000  # per profile
+DEVICES = ["event3", "event9", None]
+KEYS = list(string.ascii_uppercase + string.digits) + [f"F{n}" for n in range(1, 25)] + ["ArrowUp", "ArrowDown"]
+MODIFIERS = [[name for bit, name in enumerate(["Ctrl", "Alt", "Shift", "Meta"]) if mask >> bit & 1]
+             for mask in range(16)]
+SWITCHES = 20000
+
+
+def shortcut(rng: random.Random, index: int, key: str, modifiers: list, device_id) -> dict:
+    action_type = rng.choice(["launch", "hotkey", "volume", "media", "script"])
+    action = {
+        'launch': {'path': f"/usr/bin/app{index}"},
+        'script': {'path': f"/home/user/scripts/macro{index}.py", 'args': "--fast"},
+        'hotkey': {'keys': rng.choice(["Ctrl+C", "Ctrl+Shift+T", "Alt+Tab", "Ctrl+K, Ctrl+C"])},
+        'volume': {'command': rng.choice(["up", "down", "mute"])},
+        'media': {'command': rng.choice(["play_pause", "next_track", "prev_track", "stop"])},
+    }[action_type]
+    return {'id': f"shortcut{index}", 'key': key, 'modifiers': modifiers, 'deviceId': device_id,
+            'status': True, 'date': "12 Mar 25", 'actionType': action_type, 'action': action}
+
+
+def write_profiles(directory: str, rng: random.Random) -> list:
+    """Profiles of distinct (device, modifiers, key) triggers, as the mapper would save them"""
+    triggers = [(device_id, modifiers, key) for device_id in DEVICES for modifiers in MODIFIERS for key in KEYS]
+    names = []
+    for number in range(PROFILE_COUNT):
+        # A trigger without deviceId lands in every device's table, so it may not also be a device's
+        chosen, seen = [], {}
+        for device_id, modifiers, key in rng.sample(triggers, len(triggers)):
+            devices = seen.setdefault((tuple(modifiers), key), set())
+            if None in devices or (devices and device_id is None):
+                continue
+            devices.add(device_id)
+            chosen.append(shortcut(rng, len(chosen), key, modifiers, device_id))
+            if len(chosen) == SHORTCUTS:
+                break
+        name = f"profile{number:02d}"
+        with open(os.path.join(directory, f"{name}.json"), "w") as f:
+            json.dump(chosen, f, indent=2)
+        names.append(name)
+    return names
+
+
+def load_all_ms(loader: ProfileLoader, names: list) -> float:
+    start = time.perf_counter()
+    for name in names:
+        loader.load(name)
+    return (time.perf_counter() - start) * 1000 / len(names)
+
+
+def main():
+    for module in (chords, core, profiles):
+        module.logger.handlers = [logging.NullHandler()]
+    rng = random.Random(1)
+    root = tempfile.mkdtemp()
+    directory, cache_dir = os.path.join(root, "profiles"), os.path.join(root, "cache")
+    os.makedirs(directory)
+    names = write_profiles(directory, rng)
+    size = sum(os.path.getsize(os.path.join(directory, f"{name}.json")) for name in names)
+    print(f"{PROFILE_COUNT} profiles x {SHORTCUTS} shortcuts, {size / PROFILE_COUNT / 1024:.0f} KiB JSON each")
+
+    print(f"parse + validate + compile: {load_all_ms(ProfileLoader(directory, cache_dir), names):.2f} ms/profile")
+    print(f"binary cache (new process):  {load_all_ms(ProfileLoader(directory, cache_dir), names):.2f} ms/profile")
+    for name in names:
+        os.utime(os.path.join(directory, f"{name}.json"))
+    print(f"cache after touch (hashed):  {load_all_ms(ProfileLoader(directory, cache_dir), names):.2f} ms/profile")
+
+    loader = ProfileLoader(directory, cache_dir)
+    load_all_ms(loader, names)
+    keymap = Keymap()
+    start = time.perf_counter()
+    for index in range(SWITCHES):
+        loader.switch(keymap, names[index % PROFILE_COUNT], DEVICES[index % 2])
+    print(f"switch (stat + table swap):  {(time.perf_counter() - start) * 1e6 / SWITCHES:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# benchmarks/bench_reactor.py
+# Run from the repository root: python3 -m benchmarks.bench_reactor
+import time
+
+from device_manager.fake import FakeBackend, keyboard_capabilities
+from input_handler.load_generator import LoadGenerator, typing_frames
+from input_handler.reactor import EventReactor
+
+FRAMES_PER_FILL = 650  # ~2000 events, below the 64 KiB default pipe capacity
+ROUNDS = 20
+
+
+def bench(device_count: int) -> float:
+    received = [0]
+
+    def handler(device, events):
+        received[0] += len(events)
+
+    backend = FakeBackend()
+    reactor = EventReactor(handler)
+    generator = LoadGenerator()
+    for i in range(device_count):
+        device = backend.add_device(f"bench-device-{i}", keyboard_capabilities())
+        reactor.add_device(device)
+        generator.add_stream(device, 1000, typing_frames())
+    reactor.poll(0)  # swallow the add_device wakeups
+
+    elapsed = 0.0
+    for _ in range(ROUNDS):
+        expected = generator.burst(FRAMES_PER_FILL)
+        received[0] = 0
+        start = time.perf_counter()
+        while received[0] < expected:
+            reactor.poll(0)
+        elapsed += time.perf_counter() - start
+
+    reactor.close()
+    backend.close()
+    return generator.stats()['events'] / elapsed
+
+
+def main():
+    print(f"{'devices':>8} {'events/s':>14}")
+    for count in (1, 2, 4, 8, 16, 32, 64):
+        print(f"{count:>8} {bench(count):>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
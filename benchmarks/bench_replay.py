@@ -0,0 +1,65 @@
+# benchmarks/bench_replay.py
+# Run from the repository root: python3 -m benchmarks.bench_replay [recording.ckrec]
+import logging
+import os
+import sys
+import tempfile
+
+from action_performer.linux import VIRTUAL_DEVICES
+from device_manager.fake import build_backend
+from input_handler import linux
+from input_handler.load_generator import LoadGenerator
+from input_handler.reactor import EventReactor
+from input_handler.recorder import EventRecorder, Recording
+
+CAPTURE_FRAMES = 2000
+
+
+def capture(path: str):
+    """Record a synthetic session: a typing keyboard, a 1000 Hz keyboard and an 8 kHz mouse"""
+    backend = build_backend(keyboards=2, mice=1)
+    devices = list(backend.devices.values())
+    generator = LoadGenerator()
+    generator.add_typing(backend.devices["/dev/input/event0"])
+    generator.add_keyboard(backend.devices["/dev/input/event2"])
+    generator.add_mouse(backend.devices["/dev/input/event4"])
+
+    with EventRecorder(path, devices) as recorder:
+        reactor = EventReactor(recorder.record)
+        for device in devices:
+            reactor.add_device(device)
+        for _ in range(CAPTURE_FRAMES // 100):
+            generator.burst(100)
+            while reactor.poll(0):
+                pass
+        reactor.close()
+    backend.close()
+
+
+def main():
+    # Keep record creation and formatting but drop the console/file I/O
+    linux.logger.handlers = [logging.NullHandler()]
+    # Keys a stream leaves held are released at exit; keep that off /dev/uinput
+    VIRTUAL_DEVICES.use_backend("fake")
+
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "synthetic.ckrec")
+        capture(path)
+
+    recording = Recording.load(path)
+    print(f"recording: {len(recording):,} events, {os.path.getsize(path):,} bytes, "
+          f"{len(recording.devices)} device(s)")
+
+    best = None
+    for _ in range(5):
+        stats = linux.replay_recording(path, speed=0)
+        if best is None or stats['seconds'] < best['seconds']:
+            best = stats
+    print(f"as fast as possible: {best['events'] / best['seconds']:,.0f} events/s "
+          f"({best['frames'] / best['seconds']:,.0f} frames/s)")
+
+
+if __name__ == "__main__":
+    main()
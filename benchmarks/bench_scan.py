@@ -0,0 +1,78 @@
+# benchmarks/bench_scan.py
+# Run from the repository root: python3 -m benchmarks.bench_scan
+import logging
+import os
+import tempfile
+import time
+
+from device_manager import capability_cache, linux
+from device_manager.capability_cache import CapabilityCache
+from device_manager.fake import build_backend, consumer_capabilities, keyboard_capabilities
+from device_manager.linux import InputDeviceDetector, key_mask
+from device_manager.sysfs import SysfsBackend, write_fixture_tree
+
+ROUNDS = 5
+CLASSIFY_BITMAPS = 10000
+
+
+def scan(backend, make_cache, scan_backend=None) -> tuple:
+    """Best-of-ROUNDS scan time in ms, with capability queries and opens per scan"""
+    best = None
+    for _ in range(ROUNDS):
+        for device in backend.devices.values():
+            device.ioctl_count = 0
+        backend.open_count = 0
+        detector = InputDeviceDetector(scan_backend or backend, cache=make_cache())
+        start = time.perf_counter()
+        detector.scan_all_devices()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    queries = sum(device.ioctl_count for device in backend.devices.values())
+    return best * 1000, queries, backend.open_count
+
+
+def classify_rate() -> float:
+    """Key bitmaps classified per second, as for cached device fingerprints"""
+    layouts = [keyboard_capabilities(layout)[1] for layout in ("full_size", "tkl", "60_percent", "macropad")]
+    bitmaps = [key_mask(keys) for keys in layouts + [consumer_capabilities()[1]]]
+    bitmaps = (bitmaps * (CLASSIFY_BITMAPS // len(bitmaps) + 1))[:CLASSIFY_BITMAPS]
+    detector = InputDeviceDetector(cache=CapabilityCache())
+    start = time.perf_counter()
+    for bits in bitmaps:
+        detector._keyboard_info("", bits)
+    return len(bitmaps) / (time.perf_counter() - start)
+
+
+def main():
+    # Keep record creation and formatting but drop the console/file I/O
+    for module in (linux, capability_cache):
+        module.logger.handlers = [logging.NullHandler()]
+
+    print(f"{'devices':>8} {'mode':<14} {'ms':>8} {'queries':>8} {'opens':>6}")
+    for count in (50, 100, 200):
+        # Keyboards bring a consumer-control sibling, so split the total three ways
+        third = count // 3
+        backend = build_backend(keyboards=third, mice=third, macropads=count - 3 * third)
+        path = os.path.join(tempfile.mkdtemp(), "capabilities.json")
+        InputDeviceDetector(backend, cache=CapabilityCache(path)).scan_all_devices()
+        root = write_fixture_tree(tempfile.mkdtemp(), backend.devices.values())
+
+        # Fake devices open for free; a real open is a syscall plus the
+        # device-info and capability ioctls, which the sysfs mode never does.
+        # A fresh cache per round: in-memory only (first scan), or reloaded
+        # from the file like a new process rescanning unchanged hardware
+        modes = [
+            ("open", CapabilityCache, None),
+            ("open + cache", lambda: CapabilityCache(path), None),
+            ("sysfs", CapabilityCache, SysfsBackend(root, opener=backend.open)),
+        ]
+        for mode, make_cache, scan_backend in modes:
+            ms, queries, opens = scan(backend, make_cache, scan_backend)
+            print(f"{len(backend.devices):>8} {mode:<14} {ms:>8.2f} {queries:>8} {opens:>6}")
+        backend.close()
+
+    print(f"classify: {classify_rate():,.0f} key bitmaps/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/bench_tap_hold.py
+# Run from the repository root: python3 -m benchmarks.bench_tap_hold
+import logging
+import random
+import time
+
+from keymap_handler import core, tap_hold
+from keymap_handler.core import KEY_DOWN, KEY_UP
+from keymap_handler.tap_hold import HOLD_TIME, TapHoldBinding, TapHoldEngine
+from utils.latency import LATENCY, TAP_DECISION
+from utils.timer_wheel import TimerWheel
+
+TICKS = 2000
+REALTIME_PRESSES = 300
+
+
+class Device:
+    def __init__(self, index: int):
+        self.path = f"/dev/input/event{index}"
+
+
+def action(device, code, value):
+    pass
+
+
+BINDING = TapHoldBinding(tap=action, hold=action, double_tap=action)
+
+
+def horizon(pending: int) -> float:
+    """Deadlines spread so about one is due per 1 ms tick, however many are pending"""
+    return pending / 1000
+
+
+def wheel_tick_ns(pending: int, rng: random.Random) -> float:
+    """Per 1 ms tick with `pending` keys down across 64 devices, most of them due in later rounds"""
+    wheel = TimerWheel(now=0.0)
+    engine = TapHoldEngine(wheel)
+    devices = [Device(index) for index in range(64)]
+    for index in range(pending):
+        binding = TapHoldBinding(hold=action, hold_time=1.0 + rng.random() * horizon(pending))
+        engine.feed(devices[index % 64], index // 64, KEY_DOWN, binding, 0.0)
+    start = time.perf_counter_ns()
+    for tick in range(1, TICKS + 1):
+        wheel.advance(tick * 0.001)
+    return (time.perf_counter_ns() - start) / TICKS
+
+
+def scan_tick_ns(pending: int, rng: random.Random) -> float:
+    """The same ticks checking every pending deadline, as a per-key deadline list would"""
+    deadlines = {(index % 64, index // 64): 1.0 + rng.random() * horizon(pending) for index in range(pending)}
+    start = time.perf_counter_ns()
+    for tick in range(1, TICKS // 20 + 1):
+        now = tick * 0.001
+        due = [key for key, deadline in deadlines.items() if deadline <= now]
+        for key in due:
+            del deadlines[key]
+    return (time.perf_counter_ns() - start) / (TICKS // 20)
+
+
+def realtime_lateness() -> dict:
+    """Holds decided by a loop that sleeps for next_timeout() between advances, like EventReactor.run()"""
+    LATENCY.reset()
+    LATENCY.enabled = True
+    wheel = TimerWheel()
+    engine = TapHoldEngine(wheel)
+    device = Device(0)
+    presses = []
+    start = time.time()
+    for index in range(REALTIME_PRESSES):
+        presses.append((start + index * 0.01, index % 200 + 1))
+    releases = []
+    while presses or releases or len(wheel):
+        now = time.time()
+        while presses and presses[0][0] <= now:
+            _, code = presses.pop(0)
+            engine.feed(device, code, KEY_DOWN, BINDING, now)
+            releases.append((now + HOLD_TIME * 1.5, code))
+        while releases and releases[0][0] <= now:
+            _, code = releases.pop(0)
+            engine.feed(device, code, KEY_UP, BINDING, now)
+        # Wake for the next timer or the next scripted key event, whichever is first
+        waits = [event[0] - now for event in presses[:1] + releases[:1]]
+        timeout = wheel.next_timeout()
+        if timeout is not None:
+            waits.append(timeout)
+        time.sleep(max(min(waits, default=0.0), 0.0))
+        wheel.advance(time.time())
+    return LATENCY.summary(TAP_DECISION).get(TAP_DECISION, {})
+
+
+def main():
+    for module in (core, tap_hold):
+        module.logger.handlers = [logging.NullHandler()]
+    rng = random.Random(1)
+
+    print(f"{'pending':>8} {'wheel ns/tick':>14} {'scan ns/tick':>13}")
+    for pending in (1000, 10000, 100000):
+        wheel = wheel_tick_ns(pending, rng)
+        scan = scan_tick_ns(pending, rng)
+        print(f"{pending:>8} {wheel:>14.0f} {scan:>13.0f}")
+
+    print(f"\nDecision lateness past the {HOLD_TIME * 1000:.0f} ms hold time ({REALTIME_PRESSES} holds):")
+    for decision, summary in realtime_lateness().items():
+        print(f"  {decision}: p50 {summary['p50_us']:.0f} us, p99 {summary['p99_us']:.0f} us, "
+              f"max {summary['max_us']:.0f} us over {summary['count']}")
+
+
+if __name__ == "__main__":
+    main()
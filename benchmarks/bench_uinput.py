@@ -0,0 +1,92 @@
+# benchmarks/bench_uinput.py
+# Run from the repository root: python3 -m benchmarks.bench_uinput
+import logging
+import os
+import time
+
+from evdev import ecodes
+from evdev.eventio import EventIO
+from action_performer import linux as performer
+
+KEYS = [ecodes.KEY_A + (i % 26) for i in range(20000)]
+
+
+class NullSink(EventIO):
+    """Stands in for the uinput fd so the benchmark never injects real keys"""
+
+    def __init__(self):
+        self.fd = os.open(os.devnull, os.O_RDWR)
+
+
+def write_syscalls() -> int:
+    with open("/proc/self/io") as f:
+        for line in f:
+            if line.startswith("syscw:"):
+                return int(line.split()[1])
+    return 0
+
+
+def legacy_per_key(sink):
+    """The original simulate_key body: write + syn + dict + log per event"""
+    log = performer.logger
+    for code in KEYS:
+        for value in (1, 0):
+            sink.write(ecodes.EV_KEY, code, value)
+            sink.syn()
+            state = {0: "KEY_UP", 1: "KEY_DOWN", 2: "KEY_HOLD"}.get(value, f"UNKNOWN({value})")
+            log.info(f"Simulated {state} for key code {code}")
+
+
+def simulate_key_pooled(sink):
+    """simulate_key through the virtual device pool (fake backend)"""
+    simulate = performer.simulate_key
+    for code in KEYS:
+        simulate(code, 1)
+        simulate(code, 0)
+
+
+def batched_per_frame(sink):
+    """One write per down/up frame, as passthrough of a typed key produces"""
+    key = ecodes.EV_KEY
+    for code in KEYS:
+        performer.write_events(((key, code, 1),), sink)
+        performer.write_events(((key, code, 0),), sink)
+
+
+def preencoded_macro(sink):
+    """A repeated macro encoded once and replayed as a single buffer"""
+    key = ecodes.EV_KEY
+    buffer = performer.encode_frames(
+        frame for code in KEYS[:100] for frame in (((key, code, 1),), ((key, code, 0),))
+    )
+    for _ in range(len(KEYS) // 100):
+        performer.write_encoded(buffer, sink)
+
+
+def bench(name, path, sink):
+    events = len(KEYS) * 2
+    before = write_syscalls()
+    start = time.perf_counter()
+    path(sink)
+    elapsed = time.perf_counter() - start
+    syscalls = write_syscalls() - before
+    print(f"{name:<18} {events / elapsed:>14,.0f} keys/s {syscalls / events:>8.3f} writes/key")
+
+
+def main():
+    # Keep record creation and formatting but drop the console/file I/O
+    performer.logger.handlers = [logging.NullHandler()]
+    performer.VIRTUAL_DEVICES.use_backend("fake")
+    sink = NullSink()
+
+    print("legacy path also issues one fcntl(F_GETFL) per write (not counted in syscw)")
+    bench("legacy write+syn", legacy_per_key, sink)
+    bench("simulate_key", simulate_key_pooled, sink)
+    bench("batched frames", batched_per_frame, sink)
+    bench("pre-encoded macro", preencoded_macro, sink)
+    os.close(sink.fd)
+    performer.VIRTUAL_DEVICES.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# device_manager/capability_cache.py
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from utils.logger import get_logger
+
+logger = get_logger("capability_cache")
+
+CACHE_VERSION = 1
+
+def default_cache_path() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "coldkeys", "capabilities.json")
+
+def device_key(device) -> str:
+    """
+    Identity of a device's hardware and port. Virtual devices (uinput, ours
+    included) share ids and phys, so the name is part of the key too.
+    """
+    info = device.info
+    return f"{info.bustype:04x}:{info.vendor:04x}:{info.product:04x}:{info.version:04x}:{device.phys or ''}:{device.name}"
+
+
+class CapabilityCache:
+    """
+    Persistent {device key: {type: [codes]}} store so rescans of unchanged
+    hardware skip the EVIOCGBIT ioctls. path=None keeps it in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Dict[int, List[int]]] = {}
+        self._dirty = False
+        # Probe workers look devices up concurrently
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable capability cache {self.path}: {e}")
+            return
+
+        if data.get('version') != CACHE_VERSION:
+            logger.info(f"Discarding capability cache {self.path} (version {data.get('version')})")
+            return
+        self._entries = {
+            key: {int(etype): codes for etype, codes in caps.items()}
+            for key, caps in data.get('devices', {}).items()
+        }
+        logger.debug(f"Loaded {len(self._entries)} cached device capabilities from {self.path}")
+
+    def get(self, device) -> Tuple[Dict[int, List[int]], bool]:
+        """(capabilities without absinfo, whether they came from the cache)"""
+        key = device_key(device)
+        with self._lock:
+            caps = self._entries.get(key)
+            if caps is not None:
+                self.hits += 1
+                return caps, True
+            self.misses += 1
+
+        # Queried outside the lock so one slow device doesn't stall the others
+        caps = {etype: [code[0] if isinstance(code, tuple) else code for code in codes]
+                for etype, codes in device.capabilities(absinfo=False).items()}
+        with self._lock:
+            self._entries[key] = caps
+            self._dirty = True
+        return caps, False
+
+    def invalidate(self, device=None):
+        """Forget one device, or everything"""
+        with self._lock:
+            if device is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(device_key(device), None)
+            self._dirty = True
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            data = {
+                'version': CACHE_VERSION,
+                'devices': {key: {str(etype): codes for etype, codes in caps.items()}
+                            for key, caps in self._entries.items()},
+            }
+            self._dirty = False
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+            logger.debug(f"Saved {len(data['devices'])} device capabilities to {self.path}")
+        except OSError as e:
+            self._dirty = True
+            logger.warning(f"Could not save capability cache {self.path}: {e}")
+
+
+# COLDKEYS_CAPABILITY_CACHE= (empty) keeps the cache in memory only
+CAPABILITY_CACHE = CapabilityCache(os.environ.get("COLDKEYS_CAPABILITY_CACHE", default_cache_path()) or None)
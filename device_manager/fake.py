@@ -0,0 +1,271 @@
+# device_manager/fake.py
+import asyncio
+import os
+import select
+import struct
+import time
+from typing import Dict, Iterable, List, Optional
+
+from evdev import InputEvent, _input, ecodes
+from evdev.device import DeviceInfo
+
+EVENT_STRUCT = struct.Struct("llHHi")
+EVENTS_PER_WRITE = 4096 // EVENT_STRUCT.size  # stay within PIPE_BUF so writes are atomic
+
+LETTER_KEYS = [getattr(ecodes, f'KEY_{chr(i)}') for i in range(ord('A'), ord('Z') + 1)]
+DIGIT_KEYS = [getattr(ecodes, f'KEY_{i}') for i in range(10)]
+MODIFIER_KEYS = [ecodes.KEY_LEFTCTRL, ecodes.KEY_LEFTSHIFT, ecodes.KEY_LEFTALT, ecodes.KEY_LEFTMETA,
+                 ecodes.KEY_RIGHTCTRL, ecodes.KEY_RIGHTSHIFT, ecodes.KEY_RIGHTALT, ecodes.KEY_RIGHTMETA]
+FUNCTION_KEYS = [getattr(ecodes, f'KEY_F{i}') for i in range(1, 13)]
+EXTENDED_FUNCTION_KEYS = [getattr(ecodes, f'KEY_F{i}') for i in range(13, 25)]
+NAV_KEYS = [ecodes.KEY_INSERT, ecodes.KEY_DELETE, ecodes.KEY_HOME, ecodes.KEY_END, ecodes.KEY_PAGEUP,
+            ecodes.KEY_PAGEDOWN, ecodes.KEY_UP, ecodes.KEY_DOWN, ecodes.KEY_LEFT, ecodes.KEY_RIGHT]
+NUMPAD_KEYS = [getattr(ecodes, f'KEY_KP{i}') for i in range(10)] + [ecodes.KEY_KPENTER, ecodes.KEY_KPPLUS,
+                                                                   ecodes.KEY_KPMINUS, ecodes.KEY_NUMLOCK]
+BASE_KEYS = [ecodes.KEY_ESC, ecodes.KEY_TAB, ecodes.KEY_CAPSLOCK, ecodes.KEY_SPACE, ecodes.KEY_ENTER,
+             ecodes.KEY_BACKSPACE, ecodes.KEY_MINUS, ecodes.KEY_EQUAL, ecodes.KEY_LEFTBRACE,
+             ecodes.KEY_RIGHTBRACE, ecodes.KEY_SEMICOLON, ecodes.KEY_APOSTROPHE, ecodes.KEY_GRAVE,
+             ecodes.KEY_BACKSLASH, ecodes.KEY_COMMA, ecodes.KEY_DOT, ecodes.KEY_SLASH]
+MEDIA_KEYS = [ecodes.KEY_MUTE, ecodes.KEY_VOLUMEDOWN, ecodes.KEY_VOLUMEUP, ecodes.KEY_PLAYPAUSE,
+              ecodes.KEY_NEXTSONG, ecodes.KEY_PREVIOUSSONG, ecodes.KEY_PLAY, ecodes.KEY_PAUSE]
+SYSTEM_KEYS = [ecodes.KEY_POWER, ecodes.KEY_SLEEP, ecodes.KEY_WAKEUP]
+MOUSE_BUTTONS = [ecodes.BTN_LEFT, ecodes.BTN_RIGHT, ecodes.BTN_MIDDLE, ecodes.BTN_SIDE, ecodes.BTN_EXTRA]
+
+def keyboard_capabilities(layout: str = "full_size") -> Dict[int, List[int]]:
+    """Capabilities of a typical keyboard: full_size, tkl, 60_percent or macropad"""
+    if layout == "macropad":
+        # Cheap macropads present as a keyboard and send letters, digits or F13-F24
+        keys = LETTER_KEYS[:12] + DIGIT_KEYS + EXTENDED_FUNCTION_KEYS + [ecodes.KEY_ENTER]
+    else:
+        keys = LETTER_KEYS + DIGIT_KEYS + MODIFIER_KEYS + BASE_KEYS
+        if layout in ("full_size", "tkl"):
+            keys += FUNCTION_KEYS + NAV_KEYS + [ecodes.KEY_SYSRQ, ecodes.KEY_SCROLLLOCK, ecodes.KEY_PAUSE]
+        if layout == "full_size":
+            keys += NUMPAD_KEYS + EXTENDED_FUNCTION_KEYS + [ecodes.KEY_102ND, ecodes.KEY_COMPOSE]
+    return {
+        ecodes.EV_SYN: [ecodes.SYN_REPORT, ecodes.EV_KEY, ecodes.EV_MSC, ecodes.EV_LED],
+        ecodes.EV_KEY: sorted(set(keys)),
+        ecodes.EV_MSC: [ecodes.MSC_SCAN],
+        ecodes.EV_LED: [ecodes.LED_NUML, ecodes.LED_CAPSL, ecodes.LED_SCROLLL],
+    }
+
+def consumer_capabilities() -> Dict[int, List[int]]:
+    return {
+        ecodes.EV_SYN: [ecodes.SYN_REPORT, ecodes.EV_KEY],
+        ecodes.EV_KEY: sorted(MEDIA_KEYS + SYSTEM_KEYS),
+    }
+
+def mouse_capabilities(buttons: int = 5) -> Dict[int, List[int]]:
+    return {
+        ecodes.EV_SYN: [ecodes.SYN_REPORT, ecodes.EV_KEY, ecodes.EV_REL],
+        ecodes.EV_KEY: MOUSE_BUTTONS[:buttons],
+        ecodes.EV_REL: [ecodes.REL_X, ecodes.REL_Y, ecodes.REL_WHEEL, ecodes.REL_HWHEEL],
+    }
+
+
+class FakeInputDevice:
+    """
+    Scriptable stand-in for evdev.InputDevice. Events injected with emit()
+    travel through a real pipe, so epoll, select and asyncio readers work.
+    """
+
+    def __init__(self, path: str, name: str, capabilities: Dict[int, List[int]],
+                 phys: str = "", uniq: str = "", info: Optional[DeviceInfo] = None):
+        self.path = path
+        self.name = name
+        self.phys = phys
+        self.uniq = uniq
+        self.info = info or DeviceInfo(bustype=0x03, vendor=0x1, product=0x1, version=0x1)
+        self.version = 0x10001
+        self._capabilities = capabilities
+        self._leds = set()
+        self.grabbed = False
+        self.ioctl_count = 0
+        self.write_count = 0
+        self.dropped_events = 0
+        self._overrun = False
+
+        self.fd, self._write_fd = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+
+    def __repr__(self) -> str:
+        return f"FakeInputDevice({self.path!r}, {self.name!r})"
+
+    def fileno(self) -> int:
+        return self.fd
+
+    # Device queries, counted so benchmarks can see ioctl savings
+    def capabilities(self, verbose: bool = False, absinfo: bool = True) -> Dict[int, List[int]]:
+        self.ioctl_count += 1
+        return {etype: list(codes) for etype, codes in self._capabilities.items()}
+
+    def leds(self, verbose: bool = False) -> List[int]:
+        self.ioctl_count += 1
+        return sorted(self._leds)
+
+    def set_led(self, led_num: int, value: int):
+        self.write(ecodes.EV_LED, led_num, value)
+
+    def write(self, etype: int, code: int, value: int):
+        self.write_count += 1
+        if etype != ecodes.EV_LED:
+            return
+        if value:
+            self._leds.add(code)
+        else:
+            self._leds.discard(code)
+
+    def syn(self):
+        self.write_count += 1
+
+    def grab(self):
+        if self.grabbed:
+            raise OSError(16, "Device or resource busy")
+        self.grabbed = True
+
+    def ungrab(self):
+        if not self.grabbed:
+            raise OSError(22, "Invalid argument")
+        self.grabbed = False
+
+    def close(self):
+        for fd in (self.fd, self._write_fd):
+            if fd is not None and fd >= 0:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.fd = self._write_fd = -1
+
+    # Producer side
+    def emit(self, events: Iterable[tuple], timestamp: Optional[float] = None) -> int:
+        """
+        Inject (type, code, value) tuples stamped with `timestamp` (default now).
+        Like the kernel's evdev buffer, a full pipe drops events and the
+        reader later sees SYN_DROPPED. Returns the number of events queued.
+        """
+        now = time.time() if timestamp is None else timestamp
+        sec = int(now)
+        usec = int((now - sec) * 1_000_000)
+        pack = EVENT_STRUCT.pack
+        packed = [pack(sec, usec, etype, code, value) for etype, code, value in events]
+        if self._overrun:
+            packed.insert(0, pack(sec, usec, ecodes.EV_SYN, ecodes.SYN_DROPPED, 0))
+
+        queued = 0
+        for start in range(0, len(packed), EVENTS_PER_WRITE):
+            chunk = packed[start:start + EVENTS_PER_WRITE]
+            try:
+                os.write(self._write_fd, b"".join(chunk))
+            except BlockingIOError:
+                self.dropped_events += len(packed) - start
+                self._overrun = True
+                return queued
+            queued += len(chunk)
+        self._overrun = False
+        return queued
+
+    def emit_frame(self, events: Iterable[tuple], timestamp: Optional[float] = None) -> int:
+        """Inject events followed by SYN_REPORT"""
+        return self.emit(list(events) + [(ecodes.EV_SYN, ecodes.SYN_REPORT, 0)], timestamp)
+
+    def unplug(self):
+        """Close the producer end; readers see EOF like a vanished device"""
+        if self._write_fd >= 0:
+            os.close(self._write_fd)
+            self._write_fd = -1
+
+    # Consumer side, mirroring evdev.eventio.EventIO
+    def read(self):
+        for event in _input.device_read_many(self.fd):
+            yield InputEvent(*event)
+
+    def read_one(self) -> Optional[InputEvent]:
+        try:
+            event = _input.device_read(self.fd)
+        except BlockingIOError:
+            return None
+        return InputEvent(*event) if event else None
+
+    def read_loop(self):
+        while True:
+            select.select([self.fd], [], [])
+            yield from self.read()
+
+    def async_read(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def ready():
+            loop.remove_reader(self.fd)
+            try:
+                future.set_result(self.read())
+            except Exception as e:
+                future.set_exception(e)
+
+        loop.add_reader(self.fd, ready)
+        return future
+
+
+class FakeBackend:
+    """In-process replacement for the evdev device listing and opening"""
+
+    def __init__(self):
+        self.devices: Dict[str, FakeInputDevice] = {}
+        self.open_count = 0
+        # Seconds open() blocks per path, like a Bluetooth device waking up
+        self.open_delays: Dict[str, float] = {}
+
+    def add_device(self, name: str, capabilities: Dict[int, List[int]], phys: str = "",
+                   uniq: str = "", info: Optional[DeviceInfo] = None,
+                   path: Optional[str] = None) -> FakeInputDevice:
+        path = path or f"/dev/input/event{len(self.devices)}"
+        device = FakeInputDevice(path, name, capabilities, phys=phys, uniq=uniq, info=info)
+        self.devices[path] = device
+        return device
+
+    def add_keyboard(self, name: str = "Fake Keyboard", layout: str = "full_size", **kwargs) -> FakeInputDevice:
+        return self.add_device(name, keyboard_capabilities(layout), **kwargs)
+
+    def add_mouse(self, name: str = "Fake Mouse", buttons: int = 5, **kwargs) -> FakeInputDevice:
+        return self.add_device(name, mouse_capabilities(buttons), **kwargs)
+
+    def remove_device(self, path: str):
+        device = self.devices.pop(path, None)
+        if device is not None:
+            device.unplug()
+
+    def list_devices(self) -> List[str]:
+        return list(self.devices)
+
+    def open(self, path: str) -> FakeInputDevice:
+        device = self.devices.get(path)
+        if device is None:
+            raise FileNotFoundError(2, "No such file or directory", path)
+        delay = self.open_delays.get(path)
+        if delay:
+            time.sleep(delay)
+        self.open_count += 1
+        return device
+
+    def close(self):
+        for device in self.devices.values():
+            device.close()
+        self.devices.clear()
+
+def build_backend(keyboards: int = 1, mice: int = 1, macropads: int = 0) -> FakeBackend:
+    """A backend pre-populated with realistic multi-interface devices"""
+    backend = FakeBackend()
+    for i in range(keyboards):
+        info = DeviceInfo(bustype=0x03, vendor=0x046d, product=0xc300 + i, version=0x111)
+        phys = f"usb-0000:00:14.0-{i + 1}/input"
+        backend.add_keyboard(f"Fake Keyboard {i}", phys=phys + "0", info=info)
+        backend.add_device(f"Fake Keyboard {i} Consumer Control", consumer_capabilities(),
+                           phys=phys + "1", info=info)
+    for i in range(mice):
+        info = DeviceInfo(bustype=0x03, vendor=0x1532, product=0x0080 + i, version=0x111)
+        backend.add_mouse(f"Fake Mouse {i}", phys=f"usb-0000:00:14.0-{keyboards + i + 1}/input0", info=info)
+    for i in range(macropads):
+        info = DeviceInfo(bustype=0x03, vendor=0x1209, product=0x0100 + i, version=0x1)
+        backend.add_keyboard(f"Fake Macropad {i}", layout="macropad",
+                             phys=f"usb-0000:00:14.0-{keyboards + mice + i + 1}/input0", info=info)
+    return backend
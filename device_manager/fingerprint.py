@@ -0,0 +1,155 @@
+# device_manager/fingerprint.py
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from evdev import ecodes
+from device_manager import topology
+from utils.logger import get_logger
+
+logger = get_logger("device_fingerprint")
+
+INDEX_VERSION = 1
+
+
+@dataclass(frozen=True)
+class DeviceFingerprint:
+    """
+    exact: vendor, product, uniq, port topology and capabilities, so it
+    survives event node renumbering across replugs and reboots.
+    loose: the same without topology, for a device moved to another port.
+    """
+    exact: str
+    loose: str
+
+    def __str__(self) -> str:
+        return self.exact
+
+
+def capability_hash(caps: Dict) -> str:
+    """Digest of the event types and codes (EV_SYN only repeats the types, so it is left out)"""
+    digest = hashlib.blake2b(digest_size=8)
+    for etype in sorted(caps):
+        if etype == ecodes.EV_SYN:
+            continue
+        codes = sorted(code[0] if isinstance(code, tuple) else code for code in caps[etype])
+        digest.update(f"{etype}:{','.join(map(str, codes))};".encode())
+    return digest.hexdigest()
+
+def device_topology(device, root: Optional[str] = None) -> str:
+    """Port path of this interface: phys (stable per port) or, without it, the sysfs parent"""
+    if device.phys:
+        return device.phys
+    return topology.physical_parent(topology.sysfs_path(device, root))
+
+def device_fingerprint(device, caps: Dict, root: Optional[str] = None) -> DeviceFingerprint:
+    info = device.info
+    ids = f"{info.vendor:04x}:{info.product:04x}"
+    caps_digest = capability_hash(caps)
+    uniq = device.uniq or ""
+
+    def digest(*parts) -> str:
+        return hashlib.blake2b("|".join(parts).encode(), digest_size=6).hexdigest()
+
+    return DeviceFingerprint(
+        exact=f"{ids}:{digest(uniq, device_topology(device, root), caps_digest)}",
+        loose=f"{ids}:{digest(uniq, caps_digest)}",
+    )
+
+
+def default_index_path() -> str:
+    base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(base, "coldkeys", "profile_index.json")
+
+
+class ProfileIndex:
+    """
+    Persistent fingerprint -> profile name bindings. lookup() is two dict
+    probes (exact, then loose if that is unambiguous), never a profile scan.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._bindings: Dict[str, Dict[str, str]] = {}
+        self._exact: Dict[str, str] = {}
+        self._loose: Dict[str, Optional[str]] = {}
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._bindings)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable profile index {self.path}: {e}")
+            return
+        if not isinstance(data, dict):
+            logger.warning(f"Ignoring unreadable profile index {self.path}: not a JSON object")
+            return
+        if data.get('version') != INDEX_VERSION:
+            logger.warning(f"Ignoring profile index {self.path} with version {data.get('version')}")
+            return
+        bindings = data.get('bindings', {})
+        if not isinstance(bindings, dict):
+            logger.warning(f"Ignoring unreadable profile index {self.path}: bindings is not a JSON object")
+            return
+        for exact, binding in list(bindings.items()):
+            if not isinstance(binding, dict) or not isinstance(binding.get('profile'), str) \
+                    or not isinstance(binding.get('loose') or "", str):
+                logger.warning(f"Ignoring malformed binding of {exact} in {self.path}: {binding!r}")
+                del bindings[exact]
+        self._bindings = bindings
+        self._rebuild()
+
+    def _rebuild(self):
+        self._exact = {}
+        self._loose = {}
+        for exact, binding in self._bindings.items():
+            profile = binding['profile']
+            self._exact[exact] = profile
+            loose = binding.get('loose')
+            if loose:
+                # Same model on two ports bound to different profiles: loose match is ambiguous
+                self._loose[loose] = profile if self._loose.get(loose, profile) == profile else None
+
+    def bind(self, fingerprint: DeviceFingerprint, profile: str, name: str = ""):
+        self._bindings[fingerprint.exact] = {'profile': profile, 'loose': fingerprint.loose, 'name': name}
+        self._rebuild()
+        self.save()
+        logger.info(f"Bound {name or fingerprint.exact} to profile '{profile}'")
+
+    def unbind(self, fingerprint: DeviceFingerprint):
+        if self._bindings.pop(fingerprint.exact, None) is not None:
+            self._rebuild()
+            self.save()
+
+    def lookup(self, fingerprint: Optional[DeviceFingerprint]) -> Optional[str]:
+        if fingerprint is None:
+            return None
+        profile = self._exact.get(fingerprint.exact)
+        if profile is None:
+            profile = self._loose.get(fingerprint.loose)
+        return profile
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump({'version': INDEX_VERSION, 'bindings': self._bindings}, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save profile index {self.path}: {e}")
+
+
+# COLDKEYS_PROFILE_INDEX= (empty) keeps bindings in memory only
+PROFILE_INDEX = ProfileIndex(os.environ.get("COLDKEYS_PROFILE_INDEX", default_index_path()) or None)
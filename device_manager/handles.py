@@ -0,0 +1,166 @@
+# device_manager/handles.py
+import threading
+import time
+from typing import Dict, List, Optional
+
+from device_manager.capability_cache import device_key
+from utils.logger import get_logger
+
+logger = get_logger("device_handles")
+
+IDLE_TIMEOUT = 30.0
+SWEEP_INTERVAL = 1.0
+
+
+class DeviceHandle:
+    """One open input node, shared by every user of that path"""
+    __slots__ = ("path", "device", "refs", "idle_since")
+
+    def __init__(self, path: str, device):
+        self.path = path
+        self.device = device
+        self.refs = 0
+        self.idle_since = time.monotonic()
+
+
+class HandleRegistry:
+    """
+    Opens each input node at most once and reference-counts its users.
+    Handles nobody holds are closed after idle_timeout seconds; name and
+    identity stay cached until the node is forgotten.
+    """
+
+    def __init__(self, backend=None, idle_timeout: float = IDLE_TIMEOUT):
+        # None follows device_manager.linux.INPUT_BACKEND, including set_input_backend()
+        self._backend = backend
+        self.idle_timeout = idle_timeout
+        self.open_count = 0
+        self.reuse_count = 0
+        self._handles: Dict[str, DeviceHandle] = {}
+        self._names: Dict[str, str] = {}
+        self._identities: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._last_sweep = time.monotonic()
+
+    @property
+    def backend(self):
+        if self._backend is not None:
+            return self._backend
+        from device_manager.linux import INPUT_BACKEND
+        return INPUT_BACKEND
+
+    def acquire(self, path: str):
+        """The shared device for path, opened on first use; pair with release()"""
+        with self._lock:
+            handle = self._handles.get(path)
+            if handle is not None:
+                self.reuse_count += 1
+                handle.refs += 1
+                self._maybe_sweep()
+                return handle.device
+
+        # Opened without the lock: a node that takes seconds to answer (a
+        # waking Bluetooth device) must not hold up opens of other paths
+        device = self.backend.open(path)
+        with self._lock:
+            handle = self._handles.get(path)
+            if handle is None:
+                handle = self._handles[path] = DeviceHandle(path, device)
+                self._names[path] = device.name
+                self._identities[path] = device_key(device)
+                self.open_count += 1
+            else:
+                # Another thread opened it meanwhile; share that handle
+                if device is not handle.device:
+                    device.close()
+                self.reuse_count += 1
+            handle.refs += 1
+            self._maybe_sweep()
+            return handle.device
+
+    def release(self, device_or_path):
+        with self._lock:
+            path = getattr(device_or_path, "path", device_or_path)
+            handle = self._handles.get(path)
+            if handle is None or handle.refs == 0:
+                return
+            handle.refs -= 1
+            if handle.refs == 0:
+                handle.idle_since = time.monotonic()
+            self._maybe_sweep()
+
+    def get(self, path: str):
+        """The device if it is open right now, without taking a reference"""
+        handle = self._handles.get(path)
+        return handle.device if handle else None
+
+    def open_devices(self) -> List[object]:
+        with self._lock:
+            return [handle.device for handle in self._handles.values()]
+
+    def name(self, path: str) -> str:
+        """Cached device name; opens (and releases) the node only if never seen"""
+        name = self._names.get(path)
+        if name is None:
+            device = self.acquire(path)
+            name = device.name
+            self.release(path)
+        return name
+
+    def identity(self, path: str) -> Optional[str]:
+        """capability_cache.device_key() of the node last seen at path"""
+        return self._identities.get(path)
+
+    def close_idle(self, max_idle: Optional[float] = None) -> int:
+        """Close handles without users for at least max_idle seconds"""
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        now = time.monotonic()
+        closed = 0
+        with self._lock:
+            for path, handle in list(self._handles.items()):
+                if handle.refs == 0 and now - handle.idle_since >= max_idle:
+                    self._close(handle)
+                    closed += 1
+            self._last_sweep = now
+        if closed:
+            logger.debug(f"Closed {closed} idle device handle(s)")
+        return closed
+
+    def forget(self, path: str):
+        """The node is gone: close it whoever holds it and drop cached details"""
+        with self._lock:
+            handle = self._handles.get(path)
+            if handle is not None:
+                self._close(handle)
+            self._names.pop(path, None)
+            self._identities.pop(path, None)
+
+    def close_all(self):
+        with self._lock:
+            for handle in list(self._handles.values()):
+                self._close(handle)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'open': len(self._handles),
+                'in_use': sum(1 for handle in self._handles.values() if handle.refs),
+                'opens': self.open_count,
+                'reuses': self.reuse_count,
+            }
+
+    def _close(self, handle: DeviceHandle):
+        del self._handles[handle.path]
+        try:
+            handle.device.close()
+        except Exception:
+            # Already closed or the node vanished
+            pass
+
+    def _maybe_sweep(self):
+        if time.monotonic() - self._last_sweep >= SWEEP_INTERVAL:
+            self.close_idle()
+
+
+# Handles for the default input backend, shared by the detector, open_device() and LED restore
+DEVICE_HANDLES = HandleRegistry()
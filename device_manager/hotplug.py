@@ -0,0 +1,502 @@
+# device_manager/hotplug.py
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from device_manager.capability_cache import device_key
+from device_manager.fingerprint import PROFILE_INDEX
+from device_manager.linux import InputDeviceDetector, grab_devices, ungrab_devices
+from input_handler.debounce import DEBOUNCE
+from input_handler.key_state import PRESSED_KEYS
+from keymap_handler.chords import CHORD_MATCHERS
+from keymap_handler.layers import LAYER_STATES
+from keymap_handler.profiles import CompiledProfile
+from keymap_handler.tap_hold import TAP_HOLD_ENGINE
+from utils.led_control import LED_STATES
+from utils.logger import get_logger
+
+logger = get_logger("device_hotplug")
+
+# Published to subscribers as callback(event, path, device)
+DEVICE_ADDED = "added"
+DEVICE_REMOVED = "removed"
+DEVICE_REGRABBED = "regrabbed"
+
+# Watcher actions
+ACTION_ADD = "add"
+ACTION_CHANGE = "change"
+ACTION_REMOVE = "remove"
+ACTION_RESCAN = "rescan"
+
+# <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+
+class InotifyWatcher:
+    """Reports event* nodes appearing in and leaving a /dev/input style directory"""
+
+    def __init__(self, directory: str = "/dev/input"):
+        self.directory = directory
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_CREATE | IN_DELETE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"Cannot watch {directory}: {os.strerror(error)}")
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def read(self) -> List[Tuple[str, str]]:
+        """Pending (action, path) changes; never blocks"""
+        changes = []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changes
+
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0").decode()
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                changes.append((ACTION_RESCAN, ""))
+                continue
+            if not name.startswith("event"):
+                continue
+            path = os.path.join(self.directory, name)
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                changes.append((ACTION_ADD, path))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                changes.append((ACTION_REMOVE, path))
+            elif mask & IN_ATTRIB:
+                # udev applies permissions/ACLs just after the node appears
+                changes.append((ACTION_CHANGE, path))
+        return changes
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class UdevWatcher:
+    """
+    udev netlink monitor for the input subsystem (needs pyudev). Events only
+    arrive once udev has finished with the node, so permissions are final.
+    """
+
+    def __init__(self):
+        import pyudev
+        self.monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+        self.monitor.filter_by("input")
+        self.monitor.start()
+
+    def fileno(self) -> int:
+        return self.monitor.fileno()
+
+    def read(self) -> List[Tuple[str, str]]:
+        changes = []
+        while True:
+            device = self.monitor.poll(timeout=0)
+            if device is None:
+                return changes
+            node = device.device_node
+            if not node or not os.path.basename(node).startswith("event"):
+                continue
+            if device.action == "add":
+                changes.append((ACTION_ADD, node))
+            elif device.action == "remove":
+                changes.append((ACTION_REMOVE, node))
+            elif device.action == "change":
+                changes.append((ACTION_CHANGE, node))
+
+    def close(self):
+        self.monitor = None
+
+def open_watcher(directory: str = "/dev/input", prefer_udev: bool = True):
+    """udev when pyudev is installed and the default directory is watched, else inotify"""
+    if prefer_udev and directory == "/dev/input":
+        try:
+            return UdevWatcher()
+        except ImportError:
+            pass
+        except Exception as e:
+            logger.warning(f"udev monitor unavailable, falling back to inotify: {e}")
+    return InotifyWatcher(directory)
+
+
+class DeviceRegistry:
+    """
+    Long-lived view of the input devices: one full scan, then incremental
+    updates from a hotplug watcher. Devices grabbed through grab() are
+    re-grabbed as soon as they reappear. Every device in devices holds a
+    handle reference, so the idle sweep never closes one it hands out.
+    """
+
+    def __init__(self, backend=None, watch_dir: str = "/dev/input", detector: Optional[InputDeviceDetector] = None,
+                 prefer_udev: bool = True):
+        self.detector = detector or InputDeviceDetector(backend)
+        self.watch_dir = watch_dir
+        self.prefer_udev = prefer_udev
+        self.devices: Dict[str, object] = {}
+        self._pending = set()      # nodes that appeared but could not be opened yet
+        self._regrab = set()       # device_key()s of devices grabbed through grab()
+        self._grabbed = set()      # paths currently grabbed (holding a handle reference)
+        self._late: List[str] = [] # slow devices that answered after the scan gave up on them
+        self._subscribers: List[Callable] = []
+        self._lock = threading.RLock()
+        self._watcher = None
+        self._thread: Optional[threading.Thread] = None
+        # Self-pipe waking the watch thread; open only while watching
+        self._wake_r = self._wake_w = -1
+        self._running = False
+        self.detector.late_probe_callback = self._probe_finished
+
+    # Snapshots: the watch thread keeps changing the detector's tables
+
+    @property
+    def keyboards(self):
+        with self._lock:
+            return dict(self.detector.keyboards)
+
+    @property
+    def mice(self):
+        with self._lock:
+            return dict(self.detector.mice)
+
+    @property
+    def device_groups(self):
+        with self._lock:
+            return dict(self.detector.device_groups)
+
+    def summary(self) -> str:
+        with self._lock:
+            return self.detector.generate_detection_summary()
+
+    def subscribe(self, callback: Callable) -> Callable:
+        """
+        callback(event, path, device) for DEVICE_ADDED/REMOVED/REGRABBED;
+        returns an unsubscribe function. Acquire a handle through
+        detector.handles to keep using an added device.
+        """
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def _publish(self, event: str, path: str, device):
+        for callback in list(self._subscribers):
+            try:
+                callback(event, path, device)
+            except Exception as e:
+                logger.error(f"Hotplug subscriber failed on {event} {path}: {e}")
+
+    def scan(self) -> Dict:
+        """Full scan; afterwards only changed nodes are looked at"""
+        with self._lock:
+            for table in (self.detector.keyboards, self.detector.mice, self.detector.device_groups):
+                table.clear()
+            results = self.detector.scan_all_devices()
+            handles = self.detector.handles
+            devices = {}
+            for path in results['raw_devices']:
+                try:
+                    devices[path] = handles.acquire(path)
+                except OSError as e:
+                    logger.warning(f"Device {path} went away during the scan: {e}")
+            # The previous scan's references go only after the new ones are held
+            for path in self.devices:
+                handles.release(path)
+            self.devices = devices
+            return results
+
+    def add_path(self, path: str):
+        """Open and classify one new node; returns the device or None"""
+        with self._lock:
+            if path in self.devices:
+                return self.devices[path]
+            try:
+                device = self.detector.handles.acquire(path)
+            except PermissionError:
+                # udev has not applied the ACL yet, retry on the attribute change
+                self._pending.add(path)
+                return None
+            except OSError as e:
+                logger.warning(f"Could not open hot-plugged device {path}: {e}")
+                return None
+
+            self._pending.discard(path)
+            # The registry keeps this reference while it lists the device
+            self.devices[path] = device
+            keyboard, mouse = self.detector.classify_device(path, device)
+            kind = "keyboard" if keyboard else "mouse" if mouse else "device"
+            logger.info(f"Hot-plugged {kind}: {device.name} ({path})")
+
+        self._publish(DEVICE_ADDED, path, device)
+        if device_key(device) in self._regrab and self.grab(path, siblings=False):
+            logger.info(f"Re-grabbed {device.name} ({path}) after reconnect")
+            self._publish(DEVICE_REGRABBED, path, self.detector.handles.get(path))
+        return device
+
+    def remove_path(self, path: str):
+        with self._lock:
+            self._pending.discard(path)
+            device = self.devices.pop(path, None)
+            if device is None:
+                return None
+            self.detector.forget_device(path)
+            self._grabbed.discard(path)
+            LED_STATES.forget(path)
+            # Before the key release: keys decided as held get their release first
+            TAP_HOLD_ENGINE.reset(path)
+            PRESSED_KEYS.release(path, forget=True)
+            DEBOUNCE.forget(path)
+            LAYER_STATES.forget(path)
+            CHORD_MATCHERS.forget(path)
+            self.detector.handles.forget(path)
+            logger.info(f"Device removed: {device.name} ({path})")
+
+        self._publish(DEVICE_REMOVED, path, device)
+        return device
+
+    def grab(self, path: str, siblings: bool = True) -> bool:
+        """
+        Grab a device together with its sibling interfaces, all or none, and
+        keep grabbing them whenever they reconnect
+        """
+        if path not in self.devices and self.add_path(path) is None:
+            return False
+        paths = self.detector.siblings(path) if siblings else [path]
+        paths = [member for member in paths if member not in self._grabbed]
+        if not paths:
+            return True
+
+        devices = []
+        try:
+            for member in paths:
+                devices.append(self.detector.handles.acquire(member))
+        except OSError as e:
+            logger.error(f"Could not open {member} to grab it: {e}")
+        if len(devices) != len(paths) or not grab_devices(devices):
+            for device in devices:
+                self.detector.handles.release(device)
+            return False
+
+        self._grabbed.update(paths)
+        self._regrab.update(device_key(device) for device in devices)
+        return True
+
+    def release(self, path: str, siblings: bool = True, forget: bool = True):
+        """Ungrab what grab() took, as one batch; forget=False keeps re-grabbing on reconnect"""
+        paths = self.detector.siblings(path) if siblings else [path]
+        paths = [member for member in paths if member in self._grabbed]
+        devices = [device for device in map(self.detector.handles.get, paths) if device is not None]
+        if forget:
+            self._regrab.difference_update(device_key(device) for device in devices)
+        ungrab_devices(devices)
+        for member in paths:
+            self._grabbed.discard(member)
+            self.detector.handles.release(member)
+
+    def _probe_finished(self, path: str):
+        # From a probe thread: classify on the watch thread, or at the next
+        # reconcile() when not watching
+        self._late.append(path)
+        try:
+            os.write(self._wake_w, b"\0")
+        except OSError:
+            # Pipe full (a wakeup is pending anyway) or not watching
+            pass
+
+    def reconcile(self):
+        """
+        Catch up with the backend's device list after missed notifications,
+        and with devices that answered after the scan gave up on them
+        """
+        current = set(self.detector.backend.list_devices())
+        for path in set(self.devices) - current:
+            self.remove_path(path)
+        while self._late:
+            path = self._late.pop(0)
+            if path in current:
+                self.add_path(path)
+        for path in sorted(current - set(self.devices)):
+            self.add_path(path)
+
+    def handle(self, changes: List[Tuple[str, str]]):
+        for action, path in changes:
+            if action == ACTION_ADD:
+                self.add_path(path)
+            elif action == ACTION_REMOVE:
+                self.remove_path(path)
+            elif action == ACTION_CHANGE:
+                if path in self._pending or path not in self.devices:
+                    self.add_path(path)
+            elif action == ACTION_RESCAN:
+                logger.warning("Hotplug queue overflowed, reconciling device list")
+                self.reconcile()
+
+    def start(self):
+        """Scan (if not done yet) and watch for hotplug in a background thread"""
+        if self._running:
+            return
+        if self._thread is not None:
+            # The watch thread died; take it down properly before starting over
+            self.stop()
+        self._watcher = open_watcher(self.watch_dir, self.prefer_udev)
+        if not self.devices:
+            self.scan()
+        else:
+            # Anything that changed between scan() and the watch starting
+            self.reconcile()
+        self._wake_r, self._wake_w = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="coldkeys-hotplug", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {self.watch_dir} for hotplug ({type(self._watcher).__name__})")
+
+    @property
+    def watching(self) -> bool:
+        return self._running
+
+    def refresh(self):
+        """Bring the view up to date: free when watching, a full scan otherwise"""
+        if not self._running:
+            self.scan()
+
+    def _run(self):
+        watcher = self._watcher
+        try:
+            while self._running:
+                try:
+                    readable, _, _ = select.select([watcher, self._wake_r], [], [],
+                                                   self.detector.handles.idle_timeout)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Hotplug watcher failed, devices are rescanned on refresh(): {e}")
+                    break
+                try:
+                    self._dispatch(watcher, readable)
+                except Exception as e:
+                    # One bad node or subscriber must not end hotplug tracking
+                    logger.error(f"Hotplug update failed: {e}")
+        finally:
+            self._running = False
+
+    def _dispatch(self, watcher, readable: list):
+        if not readable:
+            self.detector.handles.close_idle()
+            return
+        if self._wake_r in readable:
+            try:
+                os.read(self._wake_r, 512)
+            except BlockingIOError:
+                pass
+            while self._late:
+                self.add_path(self._late.pop(0))
+        if watcher in readable:
+            started = time.perf_counter()
+            changes = watcher.read()
+            self.handle(changes)
+            if changes:
+                logger.debug(f"Handled {len(changes)} hotplug change(s) in "
+                             f"{(time.perf_counter() - started) * 1000:.2f} ms")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._running = False
+        try:
+            os.write(self._wake_w, b"\0")
+        except OSError:
+            pass
+        self._thread.join()
+        self._thread = None
+        self._watcher.close()
+        self._watcher = None
+        wake_r, wake_w = self._wake_r, self._wake_w
+        self._wake_r = self._wake_w = -1
+        os.close(wake_r)
+        os.close(wake_w)
+
+
+class ProfileBinder:
+    """
+    Hotplug subscriber attaching each device's bound profile by fingerprint:
+    one index lookup and, per profile, one compile shared by all its devices.
+    compile_profile(name) returns a keymap_handler.core.KeymapTable, or a
+    keymap_handler.profiles.CompiledProfile whose table for the device's
+    node (mapper deviceId) is installed, e.g. PROFILES.compile_profile.
+    """
+
+    def __init__(self, detector: InputDeviceDetector, keymaps, compile_profile: Callable, index=None):
+        self.detector = detector
+        self.keymaps = keymaps
+        self.compile_profile = compile_profile
+        self.index = index if index is not None else PROFILE_INDEX
+        self._compiled: Dict[str, object] = {}
+
+    def __call__(self, event: str, path: str, device):
+        if event == DEVICE_ADDED:
+            self.attach(path)
+        elif event == DEVICE_REMOVED:
+            # The next device at this node number is unrelated
+            self.keymaps.install(path, self.keymaps.default)
+
+    def attach(self, path: str) -> Optional[str]:
+        """Install the keymap bound to the device at path; returns the profile name"""
+        profile = self.index.lookup(self.detector.fingerprints.get(path))
+        if profile is None:
+            return None
+        table = self._compiled.get(profile)
+        if table is None:
+            try:
+                table = self._compiled[profile] = self.compile_profile(profile)
+            except Exception as e:
+                logger.error(f"Could not compile profile '{profile}' for {path}: {e}")
+                return None
+        if isinstance(table, CompiledProfile):
+            table = table.table(os.path.basename(path))
+        self.keymaps.install(path, table)
+        return profile
+
+    def attach_all(self):
+        for path in list(self.detector.devices):
+            self.attach(path)
+
+    def invalidate(self, profile: Optional[str] = None):
+        """Drop compiled keymaps after a profile changed on disk"""
+        if profile is None:
+            self._compiled.clear()
+        else:
+            self._compiled.pop(profile, None)
+
+
+_DEFAULT_REGISTRY: Optional[DeviceRegistry] = None
+
+def device_registry() -> DeviceRegistry:
+    """The shared registry, scanned and watching after the first call"""
+    global _DEFAULT_REGISTRY
+    if _DEFAULT_REGISTRY is None:
+        registry = DeviceRegistry()
+        try:
+            registry.start()
+        except OSError as e:
+            logger.warning(f"Hotplug watching unavailable ({e}); devices are rescanned on refresh()")
+        _DEFAULT_REGISTRY = registry
+    return _DEFAULT_REGISTRY
@@ -1,13 +1,82 @@
 # device_manager/linux.py
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from evdev import InputDevice, list_devices, ecodes
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from utils.logger import get_logger
-from utils.led_control import save_led_state, restore_led_state_all
+from device_manager.capability_cache import CAPABILITY_CACHE
+from device_manager.handles import DEVICE_HANDLES, HandleRegistry
+from device_manager.sysfs import SysfsBackend, SysfsInputDevice
+from device_manager import topology
+from device_manager.fingerprint import device_fingerprint
+from input_handler.key_state import PRESSED_KEYS
+from utils.led_control import LED_STATES
 
 logger = get_logger("device_manager")
 
+class EvdevBackend:
+    """Real /dev/input access through python-evdev"""
+    sysfs_root = topology.SYSFS_ROOT
+
+    def list_devices(self) -> List[str]:
+        return list_devices()
+
+    def open(self, path: str) -> InputDevice:
+        return InputDevice(path)
+
+def _default_backend():
+    # COLDKEYS_INPUT_BACKEND=sysfs lists devices from /proc and sysfs and only
+    # opens /dev/input nodes once something is grabbed or read
+    if os.environ.get("COLDKEYS_INPUT_BACKEND", "evdev") == "sysfs":
+        return SysfsBackend(topology.SYSFS_ROOT)
+    return EvdevBackend()
+
+# Swapped for device_manager.fake.FakeBackend in tests and benchmarks
+INPUT_BACKEND = _default_backend()
+
+# Scans open and query devices on this many threads; a device still not
+# answering after PROBE_TIMEOUT seconds is reported as slow, not waited for
+PROBE_WORKERS = int(os.environ.get("COLDKEYS_PROBE_WORKERS", "8"))
+PROBE_TIMEOUT = float(os.environ.get("COLDKEYS_PROBE_TIMEOUT", "2.0"))
+
+def set_input_backend(backend):
+    """Route device listing and opening through another backend"""
+    global INPUT_BACKEND
+    INPUT_BACKEND = backend
+    logger.info(f"Using input backend: {type(backend).__name__}")
+
+def key_mask(codes) -> int:
+    """Bitmap over the key space with one bit set per code"""
+    mask = 0
+    for code in codes:
+        mask |= 1 << code
+    return mask
+
+def key_names_mask(names) -> int:
+    """key_mask() of ecodes names, skipping names this evdev build doesn't know"""
+    return key_mask(code for code in (getattr(ecodes, name, 0) for name in names) if code != 0)
+
+# Key codes the classifiers test against, compiled once into bitmaps so that
+# a check is an AND against the device's key bitmap
+KEYBOARD_INDICATOR_MASK = key_mask([ecodes.KEY_A, ecodes.KEY_SPACE, ecodes.KEY_ENTER,
+                                    ecodes.KEY_VOLUMEUP, ecodes.KEY_PLAY, ecodes.KEY_POWER])
+MOUSE_BUTTON_INDICATOR_MASK = key_mask([ecodes.BTN_LEFT, ecodes.BTN_RIGHT, ecodes.BTN_MIDDLE])
+PRIMARY_MOUSE_BUTTON_MASK = key_mask([ecodes.BTN_LEFT, ecodes.BTN_RIGHT])
+LETTER_KEY_MASK = key_mask(getattr(ecodes, f'KEY_{chr(i)}') for i in range(ord('A'), ord('Z')+1))
+NUMPAD_DIGIT_MASK = key_mask(getattr(ecodes, f'KEY_KP{i}') for i in range(10))
+FUNCTION_KEY_MASK = key_mask(getattr(ecodes, f'KEY_F{i}') for i in range(1, 13))
+ARROW_KEY_MASK = key_mask([ecodes.KEY_UP, ecodes.KEY_DOWN, ecodes.KEY_LEFT, ecodes.KEY_RIGHT])
+MEDIA_FEATURE_MASK = key_mask([ecodes.KEY_VOLUMEUP, ecodes.KEY_VOLUMEDOWN, ecodes.KEY_PLAY, ecodes.KEY_PAUSE])
+SYSTEM_FEATURE_MASK = key_mask([ecodes.KEY_POWER, ecodes.KEY_SLEEP, ecodes.KEY_BRIGHTNESSUP])
+MEDIA_DEVICE_MASK = MEDIA_FEATURE_MASK | key_mask([ecodes.KEY_MUTE])
+SYSTEM_DEVICE_MASK = SYSTEM_FEATURE_MASK | key_mask([ecodes.KEY_BRIGHTNESSDOWN])
+MOTION_AXES = frozenset([ecodes.REL_X, ecodes.REL_Y])
+EMULATED_KEYBOARD_KEYS = sorted(getattr(ecodes, f'KEY_{chr(i)}') for i in range(ord('A'), ord('Z')+1)) + \
+    [ecodes.KEY_LEFTCTRL, ecodes.KEY_LEFTALT, ecodes.KEY_LEFTSHIFT]
+
 @dataclass
 class KeyboardInfo:
     """Information about a detected keyboard device"""
@@ -96,53 +165,237 @@ class InputDeviceDetector:
         'BTN_9': 'Button 9'
     }
     
-    def __init__(self):
+    def __init__(self, backend=None, cache=None, handles=None,
+                 probe_workers: int = PROBE_WORKERS, probe_timeout: float = PROBE_TIMEOUT):
+        self.backend = backend or INPUT_BACKEND
+        if handles is None:
+            handles = DEVICE_HANDLES if self.backend is INPUT_BACKEND else HandleRegistry(self.backend)
+        self.handles = handles
+        self.cache = cache if cache is not None else CAPABILITY_CACHE
         self.devices = {}
+        self.capabilities = {}
+        self.key_bits = {}
         self.keyboards = {}
         self.mice = {}
         self.device_groups = defaultdict(list)
+        self.physical_ids = {}
+        self.physical_devices = {}
+        self.fingerprints = {}
+        # Fake backends have no sysfs; topology then comes from phys/uniq
+        self.sysfs_root = getattr(self.backend, 'sysfs_root', None)
+        self.probe_workers = max(1, probe_workers)
+        self.probe_timeout = probe_timeout
+        self.slow_devices = set()
+        # Called with the path, from a probe thread, when a slow device finally answers
+        self.late_probe_callback: Optional[Callable[[str], None]] = None
     
     def scan_all_devices(self) -> Dict:
         """Scan all input devices and categorize them"""
         logger.info("Starting comprehensive device scan...")
         
-        device_paths = list_devices()
-        raw_devices = {}
-        
-        # First pass: open all devices and get basic info
-        for path in device_paths:
-            try:
-                device = InputDevice(path)
-                raw_devices[path] = device
-                logger.info(f"Found device: {device.name} ({path})")
-            except Exception as e:
-                logger.warning(f"Could not open device {path}: {e}")
-        
-        # Second pass: analyze and categorize devices
+        device_paths = self.backend.list_devices()
+        self.key_bits.clear()
+        
+        # Devices are opened and queried in parallel and classified as they
+        # answer. Handles are released after classification; the handle
+        # registry closes them once idle unless someone acquires them (to
+        # grab, or the hotplug registry for the devices it lists)
+        raw_devices, queried = self._probe_devices(device_paths)
+        self.cache.save()
+        logger.info(f"Capabilities for {len(raw_devices)} device(s), {queried} queried from the device")
+        
+        # Completion order is arbitrary; keep the listing order callers index by
+        raw_devices = {path: raw_devices[path] for path in device_paths if path in raw_devices}
+        for table in (self.keyboards, self.mice):
+            ordered = {path: table[path] for path in device_paths if path in table}
+            table.clear()
+            table.update(ordered)
         self._group_related_devices(raw_devices)
-        self._analyze_keyboards(raw_devices)
-        self._analyze_mice(raw_devices)
+        self.devices = raw_devices
         
         return {
             'keyboards': self.keyboards,
             'mice': self.mice,
             'device_groups': dict(self.device_groups),
-            'raw_devices': raw_devices
+            'raw_devices': raw_devices,
+            'slow_devices': sorted(self.slow_devices),
         }
     
+    def _probe_devices(self, paths: List[str]) -> Tuple[Dict[str, InputDevice], int]:
+        """
+        Open and classify paths on a bounded thread pool. A probe running
+        longer than probe_timeout is abandoned: the device lands in
+        slow_devices and late_probe_callback hears when it answers.
+        """
+        raw_devices = {}
+        queried = 0
+        self.slow_devices = set()
+        if not paths:
+            return raw_devices, queried
+        
+        workers = min(self.probe_workers, len(paths))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="coldkeys-probe")
+        started: Dict[str, float] = {}
+        futures = {executor.submit(self._probe, path, started): path for path in paths}
+        pending = set(futures)
+        abandoned = []
+        try:
+            while pending:
+                now = time.monotonic()
+                for future in [f for f in pending if futures[f] in started and not f.done()]:
+                    path = futures[future]
+                    if now - started[path] >= self.probe_timeout:
+                        pending.discard(future)
+                        self._abandon_probe(path, future)
+                        abandoned.append(future)
+                if pending and sum(not f.done() for f in abandoned) >= workers:
+                    # Every worker is blocked in a device; the rest would never start
+                    for future in pending:
+                        future.cancel()
+                        self.slow_devices.add(futures[future])
+                        logger.warning(f"Not probed, all probe workers busy with slow devices: {futures[future]}")
+                    break
+                if not pending:
+                    break
+                
+                deadlines = [started[futures[f]] + self.probe_timeout for f in pending if futures[f] in started]
+                timeout = max(0.0, min(deadlines) - now) if deadlines else self.probe_timeout
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    path = futures[future]
+                    try:
+                        device, caps, key_bits, was_queried = future.result()
+                    except Exception as e:
+                        logger.warning(f"Could not open device {path}: {e}")
+                        continue
+                    raw_devices[path] = device
+                    queried += was_queried
+                    logger.info(f"Found device: {device.name} ({path})")
+                    self._store_capabilities(path, device, caps, key_bits)
+                    self._analyze_keyboard(path, device, caps)
+                    self._analyze_mouse(path, device, caps)
+                    self.handles.release(path)
+        finally:
+            # Abandoned probes keep their threads until the device answers
+            executor.shutdown(wait=False, cancel_futures=True)
+        return raw_devices, queried
+    
+    def _probe(self, path: str, started: Dict[str, float]):
+        """Open one node and read its capabilities, on a probe thread"""
+        started[path] = time.monotonic()
+        device = self.handles.acquire(path)
+        try:
+            return (device, *self._query_capabilities(device))
+        except Exception:
+            self.handles.release(path)
+            raise
+    
+    def _abandon_probe(self, path: str, future):
+        self.slow_devices.add(path)
+        logger.warning(f"Device {path} did not answer within {self.probe_timeout:.1f}s, continuing without it")
+        future.add_done_callback(lambda f: self._late_probe_done(path, f))
+    
+    def _late_probe_done(self, path: str, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        device = future.result()[0]
+        self.handles.release(path)
+        logger.info(f"Slow device answered after the scan: {device.name} ({path})")
+        if self.late_probe_callback is not None:
+            self.late_probe_callback(path)
+    
+    def classify_device(self, path: str, device: InputDevice) -> Tuple[Optional[KeyboardInfo], Optional[MouseInfo]]:
+        """Classify a single (e.g. hot-plugged) device without rescanning the rest"""
+        self.forget_device(path)
+        self.devices[path] = device
+        self._add_to_group(path, device)
+        self._load_capabilities(path, device)
+        self.cache.save()
+        caps = self.capabilities[path]
+        self._analyze_keyboard(path, device, caps)
+        self._analyze_mouse(path, device, caps)
+        return self.keyboards.get(path), self.mice.get(path)
+    
+    def forget_device(self, path: str):
+        """Drop everything known about a removed device"""
+        for table in (self.keyboards, self.mice, self.capabilities, self.key_bits, self.devices, self.fingerprints):
+            table.pop(path, None)
+        self._remove_from_group(path)
+    
+    def _load_capabilities(self, path: str, device: InputDevice) -> bool:
+        """Fill self.capabilities and the fingerprint for a device; True if it had to be queried"""
+        caps, key_bits, queried = self._query_capabilities(device)
+        self._store_capabilities(path, device, caps, key_bits)
+        return queried
+    
+    def _query_capabilities(self, device: InputDevice) -> Tuple[Dict, Optional[int], bool]:
+        """(capabilities, key bitmap if known already, whether the device was queried)"""
+        if isinstance(device, SysfsInputDevice):
+            # Published by the kernel already, nothing to save by caching
+            return device.capabilities(absinfo=False), device.record.bitmaps.get(ecodes.EV_KEY, 0), False
+        caps, hit = self.cache.get(device)
+        return caps, None, not hit
+    
+    def _store_capabilities(self, path: str, device: InputDevice, caps: Dict, key_bits: Optional[int]):
+        self.capabilities[path] = caps
+        if key_bits is not None:
+            self.key_bits[path] = key_bits
+        self.fingerprints[path] = device_fingerprint(device, caps, self.sysfs_root)
+    
     def _group_related_devices(self, devices: Dict[str, InputDevice]):
-        """Group devices that belong to the same physical device"""
-        device_names = defaultdict(list)
-        
+        """Group devices that belong to the same physical device, by topology, in one pass"""
+        self.physical_ids.clear()
+        self.physical_devices.clear()
         for path, device in devices.items():
-            # Group by similar names (often same device with multiple interfaces)
-            base_name = self._normalize_device_name(device.name)
-            device_names[base_name].append((path, device))
-        
-        for base_name, device_list in device_names.items():
-            if len(device_list) > 1:
-                self.device_groups[base_name] = device_list
-                logger.info(f"Grouped {len(device_list)} devices under '{base_name}'")
+            physical_id = self._group_key(device)
+            self.physical_ids[path] = physical_id
+            self.physical_devices.setdefault(physical_id, {})[path] = device
+        
+        for physical_id, members in self.physical_devices.items():
+            if len(members) > 1:
+                self.device_groups[physical_id] = list(members.items())
+                logger.info(f"Grouped {len(members)} devices under '{self.group_label(physical_id)}' ({physical_id})")
+    
+    def _add_to_group(self, path: str, device: InputDevice) -> str:
+        physical_id = self._group_key(device)
+        self.physical_ids[path] = physical_id
+        self.physical_devices.setdefault(physical_id, {})[path] = device
+        self._sync_group(physical_id)
+        return physical_id
+    
+    def _remove_from_group(self, path: str):
+        physical_id = self.physical_ids.pop(path, None)
+        if physical_id is None:
+            return
+        self.physical_devices.get(physical_id, {}).pop(path, None)
+        self._sync_group(physical_id)
+    
+    def _sync_group(self, physical_id: str):
+        members = self.physical_devices.get(physical_id, {})
+        if len(members) > 1:
+            self.device_groups[physical_id] = list(members.items())
+        else:
+            self.device_groups.pop(physical_id, None)
+            if not members:
+                self.physical_devices.pop(physical_id, None)
+    
+    def _group_key(self, device: InputDevice) -> str:
+        """Stable physical-device ID shared by the interfaces of one device"""
+        return topology.physical_id(topology.topology_key(device, self.sysfs_root))
+    
+    def siblings(self, path: str) -> List[str]:
+        """Every interface node of the physical device path belongs to, path included"""
+        physical_id = self.physical_ids.get(path)
+        members = self.physical_devices.get(physical_id) if physical_id else None
+        return list(members) if members else [path]
+    
+    def group_label(self, physical_id: str) -> str:
+        """Readable name for a physical device: its shortest interface name, minus suffixes"""
+        members = self.physical_devices.get(physical_id)
+        if not members:
+            return physical_id
+        return self._normalize_device_name(min((device.name for device in members.values()), key=len))
     
     def _normalize_device_name(self, name: str) -> str:
         """Normalize device names to group related devices"""
@@ -159,68 +412,71 @@ class InputDeviceDetector:
         
         return normalized.strip()
     
+    def _key_bits(self, device: InputDevice, caps: Dict) -> int:
+        """The device's EV_KEY capabilities as a bitmap, built once per scan"""
+        bits = self.key_bits.get(device.path)
+        if bits is None:
+            bits = self.key_bits[device.path] = key_mask(caps.get(ecodes.EV_KEY, ()))
+        return bits
+    
+    def _device_capabilities(self, device: InputDevice) -> Dict:
+        """Capabilities from this scan, falling back to the cache"""
+        caps = self.capabilities.get(device.path)
+        if caps is None:
+            caps = self.capabilities[device.path] = self.cache.get(device)[0]
+        return caps
+    
     def _analyze_keyboards(self, devices: Dict[str, InputDevice]):
         """Analyze keyboard devices and detect layouts"""
         for path, device in devices.items():
-            if not self._is_keyboard_device(device):
-                continue
-            
-            caps = device.capabilities()
-            keyboard_info = self._detect_keyboard_layout(device, caps)
-            
-            if keyboard_info:
-                self.keyboards[path] = keyboard_info
-                logger.info(f"Detected keyboard: {device.name} - {keyboard_info.layout} "
-                          f"({keyboard_info.key_count} keys, type: {keyboard_info.device_type})")
+            self._analyze_keyboard(path, device, self._device_capabilities(device))
     
     def _analyze_mice(self, devices: Dict[str, InputDevice]):
         """Analyze mouse devices and detect capabilities"""
         for path, device in devices.items():
-            if not self._is_mouse_device(device):
-                continue
-            
-            caps = device.capabilities()
-            mouse_info = self._detect_mouse_capabilities(device, caps)
-            
-            if mouse_info:
-                self.mice[path] = mouse_info
-                logger.info(f"Detected mouse: {device.name} - {mouse_info.button_count} buttons "
-                          f"(type: {mouse_info.device_type})")
-    
-    def _is_keyboard_device(self, device: InputDevice) -> bool:
+            self._analyze_mouse(path, device, self._device_capabilities(device))
+    
+    def _analyze_keyboard(self, path: str, device: InputDevice, caps: Dict):
+        if not self._is_keyboard_device(device, caps):
+            return
+        
+        keyboard_info = self._detect_keyboard_layout(device, caps)
+        
+        if keyboard_info:
+            self.keyboards[path] = keyboard_info
+            logger.info(f"Detected keyboard: {device.name} - {keyboard_info.layout} "
+                      f"({keyboard_info.key_count} keys, type: {keyboard_info.device_type})")
+    
+    def _analyze_mouse(self, path: str, device: InputDevice, caps: Dict):
+        if not self._is_mouse_device(device, caps):
+            return
+        
+        mouse_info = self._detect_mouse_capabilities(device, caps)
+        
+        if mouse_info:
+            self.mice[path] = mouse_info
+            logger.info(f"Detected mouse: {device.name} - {mouse_info.button_count} buttons "
+                      f"(type: {mouse_info.device_type})")
+    
+    def _is_keyboard_device(self, device: InputDevice, caps: Optional[Dict] = None) -> bool:
         """Check if device is a keyboard or keyboard sub-device"""
-        caps = device.capabilities()
+        if caps is None:
+            caps = self._device_capabilities(device)
         
-        # Must have key events
+        # Must have key events, including any keyboard-like key
         if ecodes.EV_KEY not in caps:
             return False
         
-        keys = caps[ecodes.EV_KEY]
-        
-        # Check for any keyboard-like keys
-        keyboard_indicators = [
-            ecodes.KEY_A, ecodes.KEY_SPACE, ecodes.KEY_ENTER,
-            ecodes.KEY_VOLUMEUP, ecodes.KEY_PLAY, ecodes.KEY_POWER
-        ]
-        
-        return any(key in keys for key in keyboard_indicators)
+        return bool(self._key_bits(device, caps) & KEYBOARD_INDICATOR_MASK)
     
-    def _is_mouse_device(self, device: InputDevice) -> bool:
+    def _is_mouse_device(self, device: InputDevice, caps: Optional[Dict] = None) -> bool:
         """Check if device is a mouse or mouse sub-device"""
-        caps = device.capabilities()
+        if caps is None:
+            caps = self._device_capabilities(device)
         
         # Must have button events or relative movement
-        has_buttons = ecodes.EV_KEY in caps and any(
-            btn in caps[ecodes.EV_KEY] for btn in [
-                ecodes.BTN_LEFT, ecodes.BTN_RIGHT, ecodes.BTN_MIDDLE
-            ]
-        )
-        
-        has_movement = ecodes.EV_REL in caps and any(
-            rel in caps[ecodes.EV_REL] for rel in [
-                ecodes.REL_X, ecodes.REL_Y
-            ]
-        )
+        has_buttons = ecodes.EV_KEY in caps and bool(self._key_bits(device, caps) & MOUSE_BUTTON_INDICATOR_MASK)
+        has_movement = ecodes.EV_REL in caps and not MOTION_AXES.isdisjoint(caps[ecodes.EV_REL])
         
         return has_buttons or has_movement
     
@@ -229,8 +485,11 @@ class InputDeviceDetector:
         if ecodes.EV_KEY not in caps:
             return None
         
-        keys = set(caps[ecodes.EV_KEY])
-        key_count = len(keys)
+        return self._keyboard_info(device.path, self._key_bits(device, caps))
+    
+    def _keyboard_info(self, path: str, keys: int) -> Optional[KeyboardInfo]:
+        """KeyboardInfo from a key bitmap; None for ghost devices"""
+        key_count = keys.bit_count()
         
         # Determine device type
         device_type = self._classify_keyboard_device_type(keys)
@@ -245,14 +504,11 @@ class InputDeviceDetector:
             layout = self._classify_keyboard_layout(keys, key_count)
         
         # Analyze key categories
-        has_numpad = any(getattr(ecodes, f'KEY_KP{i}', 0) in keys for i in range(10))
-        has_function_keys = any(getattr(ecodes, f'KEY_F{i}', 0) in keys for i in range(1, 13))
-        has_arrow_keys = all(getattr(ecodes, f'KEY_{arrow}', 0) in keys 
-                           for arrow in ['UP', 'DOWN', 'LEFT', 'RIGHT'])
-        has_media_keys = any(getattr(ecodes, f'KEY_{media}', 0) in keys 
-                           for media in ['VOLUMEUP', 'VOLUMEDOWN', 'PLAY', 'PAUSE'])
-        has_system_keys = any(getattr(ecodes, f'KEY_{sys}', 0) in keys 
-                            for sys in ['POWER', 'SLEEP', 'BRIGHTNESSUP'])
+        has_numpad = bool(keys & NUMPAD_DIGIT_MASK)
+        has_function_keys = bool(keys & FUNCTION_KEY_MASK)
+        has_arrow_keys = keys & ARROW_KEY_MASK == ARROW_KEY_MASK
+        has_media_keys = bool(keys & MEDIA_FEATURE_MASK)
+        has_system_keys = bool(keys & SYSTEM_FEATURE_MASK)
         
         return KeyboardInfo(
             layout=layout,
@@ -262,25 +518,16 @@ class InputDeviceDetector:
             has_arrow_keys=has_arrow_keys,
             has_media_keys=has_media_keys,
             has_system_keys=has_system_keys,
-            sub_devices=[device.path],
+            sub_devices=[path],
             device_type=device_type
         )
     
-    def _classify_keyboard_device_type(self, keys: Set[int]) -> str:
-        """Classify keyboard device type based on keys"""
-        # Check for primary keyboard keys (letters/numbers)
-        primary_keys = [getattr(ecodes, f'KEY_{chr(i)}', 0) for i in range(ord('A'), ord('Z')+1)]
-        has_primary = any(key in keys for key in primary_keys)
-        
-        # Check for media keys
-        media_keys = [getattr(ecodes, f'KEY_{media}', 0) for media in 
-                     ['VOLUMEUP', 'VOLUMEDOWN', 'PLAY', 'PAUSE', 'MUTE']]
-        has_media = any(key in keys for key in media_keys if key != 0)
-        
-        # Check for system keys
-        system_keys = [getattr(ecodes, f'KEY_{sys}', 0) for sys in 
-                      ['POWER', 'SLEEP', 'BRIGHTNESSUP', 'BRIGHTNESSDOWN']]
-        has_system = any(key in keys for key in system_keys if key != 0)
+    def _classify_keyboard_device_type(self, keys: int) -> str:
+        """Classify keyboard device type based on its key bitmap"""
+        # Check for primary keyboard keys (letters), media keys and system keys
+        has_primary = keys & LETTER_KEY_MASK
+        has_media = keys & MEDIA_DEVICE_MASK
+        has_system = keys & SYSTEM_DEVICE_MASK
         
         if has_primary:
             return "primary"
@@ -288,50 +535,42 @@ class InputDeviceDetector:
             return "media"
         elif has_system:
             return "system"
-        elif len(keys) < 5:  # Very few keys, likely ghost
+        elif keys.bit_count() < 5:  # Very few keys, likely ghost
             return "ghost"
         else:
             return "unknown"
     
-    def _classify_keyboard_layout(self, keys: Set[int], key_count: int) -> str:
+    def _classify_keyboard_layout(self, keys: int, key_count: int) -> str:
         """Classify keyboard layout based on key signatures"""
-        for layout_name, signature in self.LAYOUT_SIGNATURES.items():
-            if key_count < signature['min_keys']:
-                continue
-            
-            # Check required keys
-            required_present = all(
-                getattr(ecodes, req_key, 0) in keys 
-                for req_key in signature['required']
-                if getattr(ecodes, req_key, 0) != 0
-            )
-            
-            # Check forbidden keys
-            forbidden_present = any(
-                getattr(ecodes, forb_key, 0) in keys 
-                for forb_key in signature['forbidden']
-                if getattr(ecodes, forb_key, 0) != 0
-            )
-            
-            if required_present and not forbidden_present:
+        for layout_name, min_keys, required, forbidden in self._layout_masks():
+            if key_count >= min_keys and keys & required == required and not keys & forbidden:
                 return layout_name
         
         return "custom"
     
+    @classmethod
+    def _layout_masks(cls) -> List[Tuple[str, int, int, int]]:
+        """LAYOUT_SIGNATURES compiled to (name, min keys, required bitmap, forbidden bitmap) on first use"""
+        compiled = cls.__dict__.get('_compiled_layouts')
+        if compiled is None:
+            compiled = [(name, sig['min_keys'], key_names_mask(sig['required']), key_names_mask(sig['forbidden']))
+                        for name, sig in cls.LAYOUT_SIGNATURES.items()]
+            cls._compiled_layouts = compiled
+        return compiled
+    
     def _detect_mouse_capabilities(self, device: InputDevice, caps: Dict) -> Optional[MouseInfo]:
         """Detect mouse capabilities and button count"""
         if ecodes.EV_KEY not in caps:
             return None
         
-        keys = caps[ecodes.EV_KEY]
+        keys = set(caps[ecodes.EV_KEY])
         
         # Count mouse buttons
         detected_buttons = []
         button_count = 0
         
-        for btn_code, btn_name in self.MOUSE_BUTTONS.items():
-            btn_val = getattr(ecodes, btn_code, 0)
-            if btn_val != 0 and btn_val in keys:
+        for btn_val, btn_name in self._mouse_button_codes():
+            if btn_val in keys:
                 detected_buttons.append(btn_name)
                 button_count += 1
         
@@ -346,16 +585,13 @@ class InputDeviceDetector:
         # Check for emulated keyboard keys (gaming mice)
         emulated_keys = []
         has_emulated_keys = False
-        keyboard_keys = [getattr(ecodes, f'KEY_{chr(i)}', 0) for i in range(ord('A'), ord('Z')+1)]
-        keyboard_keys.extend([ecodes.KEY_LEFTCTRL, ecodes.KEY_LEFTALT, ecodes.KEY_LEFTSHIFT])
-        
-        for key in keyboard_keys:
-            if key != 0 and key in keys:
+        for key in EMULATED_KEYBOARD_KEYS:
+            if key in keys:
                 emulated_keys.append(f"KEY_{chr(key - ecodes.KEY_A + ord('A'))}" if key >= ecodes.KEY_A and key <= ecodes.KEY_Z else f"KEY_CODE_{key}")
                 has_emulated_keys = True
         
         # Determine device type
-        has_mouse_buttons = any(getattr(ecodes, btn, 0) in keys for btn in ['BTN_LEFT', 'BTN_RIGHT'])
+        has_mouse_buttons = bool(self._key_bits(device, caps) & PRIMARY_MOUSE_BUTTON_MASK)
         device_type = "mouse" if has_mouse_buttons else "keyboard_emulation"
         
         return MouseInfo(
@@ -368,6 +604,20 @@ class InputDeviceDetector:
             device_type=device_type
         )
     
+    @classmethod
+    def _mouse_button_codes(cls) -> List[Tuple[int, str]]:
+        """MOUSE_BUTTONS with names resolved to codes, built on first use"""
+        resolved = cls.__dict__.get('_resolved_mouse_buttons')
+        if resolved is None:
+            resolved = [(getattr(ecodes, name, 0), label) for name, label in cls.MOUSE_BUTTONS.items()]
+            resolved = [(code, label) for code, label in resolved if code != 0]
+            cls._resolved_mouse_buttons = resolved
+        return resolved
+    
+    def _device_name(self, path: str) -> str:
+        device = self.devices.get(path)
+        return device.name if device is not None else self.handles.name(path)
+    
     def generate_detection_summary(self) -> str:
         """Generate a human-readable summary of detected devices"""
         summary = ["🖥️  INPUT DEVICE DETECTION SUMMARY", "=" * 50]
@@ -376,7 +626,7 @@ class InputDeviceDetector:
         if self.keyboards:
             summary.append("\n⌨️  KEYBOARDS:")
             for path, kb_info in self.keyboards.items():
-                device_name = self.devices.get(path, InputDevice(path)).name
+                device_name = self._device_name(path)
                 summary.append(f"  📋 {device_name}")
                 summary.append(f"     Layout: {kb_info.layout.replace('_', ' ').title()} ({kb_info.key_count} keys)")
                 summary.append(f"     Type: {kb_info.device_type.title()}")
@@ -396,7 +646,7 @@ class InputDeviceDetector:
         if self.mice:
             summary.append("🖱️  MICE:")
             for path, mouse_info in self.mice.items():
-                device_name = self.devices.get(path, InputDevice(path)).name
+                device_name = self._device_name(path)
                 summary.append(f"  🖱️  {device_name}")
                 summary.append(f"     Buttons: {mouse_info.button_count} detected")
                 summary.append(f"     Type: {mouse_info.device_type.replace('_', ' ').title()}")
@@ -419,40 +669,79 @@ class InputDeviceDetector:
         # Device groups
         if self.device_groups:
             summary.append("🔗 DEVICE GROUPS:")
-            for group_name, devices in self.device_groups.items():
-                summary.append(f"  📦 {group_name} ({len(devices)} sub-devices)")
+            for physical_id, devices in self.device_groups.items():
+                summary.append(f"  📦 {self.group_label(physical_id)} [{physical_id}] ({len(devices)} sub-devices)")
         
         return "\n".join(summary)
 
 # Keep original functions for backward compatibility
 def open_device(path):
     try:
-        device = InputDevice(path)
+        device = DEVICE_HANDLES.acquire(path)
         logger.info(f"Opened device: {device.name} ({path})")
         return device
     except Exception as e:
         logger.error(f"Failed to open device {path}: {e}")
         return None
 
+def close_device(device):
+    """Give back a device from open_device(); it is closed once nobody uses it"""
+    DEVICE_HANDLES.release(device)
+
 def grab_device(device):
-    try:
-        save_led_state(device)
-        device.grab()
+    return grab_devices([device])
+
+def grab_devices(devices) -> bool:
+    """
+    Grab all of devices or none. Each device's LED state is saved first;
+    after a failure the ones already grabbed are ungrabbed again and get
+    their own LED state back.
+    """
+    devices = list(devices)
+    for device in devices:
+        LED_STATES.save(device)
+    grabbed = []
+    for device in devices:
+        try:
+            device.grab()
+        except Exception as e:
+            logger.error(f"Failed to grab device {device.name} ({device.path}): {e}")
+            for done in reversed(grabbed):
+                try:
+                    done.ungrab()
+                except Exception as e:
+                    logger.warning(f"Failed to roll back grab of {done.name} ({done.path}): {e}")
+            LED_STATES.restore(devices)
+            return False
+        grabbed.append(device)
         logger.info(f"Grabbed device: {device.name} ({device.path})")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to grab device: {e}")
-        return False
+    return True
 
 def ungrab_device(device):
-    try:
-        device.ungrab()
-        restore_led_state_all()
-        logger.info(f"Ungrabbed device: {device.name} ({device.path})")
-        return True
-    except Exception as e:
-        logger.warning(f"Failed to ungrab device: {e}")
-        return False
+    return ungrab_devices([device])
+
+def ungrab_devices(devices) -> bool:
+    """
+    Ungrab every device, then restore the LED state saved at grab time on
+    just these devices, one batch of writes each, and release any key still
+    held on them. A device that fails to ungrab (usually because it is gone)
+    doesn't stop the others; False then.
+    """
+    devices = list(devices)
+    released = []
+    ok = True
+    for device in devices:
+        try:
+            device.ungrab()
+            released.append(device)
+            logger.info(f"Ungrabbed device: {device.name} ({device.path})")
+        except Exception as e:
+            logger.warning(f"Failed to ungrab device {device.name} ({device.path}): {e}")
+            LED_STATES.forget(device.path)
+            ok = False
+    LED_STATES.restore(released)
+    PRESSED_KEYS.release_devices(device.path for device in devices)
+    return ok
 
 # New enhanced functions
 def detect_all_input_devices() -> Dict:
@@ -462,21 +751,24 @@ def detect_all_input_devices() -> Dict:
 
 def print_device_summary():
     """Print a comprehensive summary of all detected devices"""
-    detector = InputDeviceDetector()
-    results = detector.scan_all_devices()
-    print(detector.generate_detection_summary())
+    from device_manager.hotplug import device_registry
+    registry = device_registry()
+    registry.refresh()
+    print(registry.summary())
 
 def get_keyboards() -> Dict[str, KeyboardInfo]:
-    """Get all detected keyboards with detailed information"""
-    detector = InputDeviceDetector()
-    detector.scan_all_devices()
-    return detector.keyboards
+    """Get all detected keyboards with detailed information (a snapshot)"""
+    from device_manager.hotplug import device_registry
+    registry = device_registry()
+    registry.refresh()
+    return registry.keyboards
 
 def get_mice() -> Dict[str, MouseInfo]:
-    """Get all detected mice with detailed information"""
-    detector = InputDeviceDetector()
-    detector.scan_all_devices()
-    return detector.mice
+    """Get all detected mice with detailed information (a snapshot)"""
+    from device_manager.hotplug import device_registry
+    registry = device_registry()
+    registry.refresh()
+    return registry.mice
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,303 @@
+# device_manager/sysfs.py
+import os
+import re
+import struct
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from evdev import ecodes
+from evdev.device import DeviceInfo
+from utils.logger import get_logger
+
+logger = get_logger("device_sysfs")
+
+# Kernel bitmaps are printed as space separated hex longs, most significant first
+LONG_BITS = struct.calcsize("l") * 8
+
+# Capability bitmap names as they appear in /proc ("B: KEY=") and sysfs (capabilities/key)
+BITMAP_TYPES = {
+    'ev': ecodes.EV_SYN,  # the EV bitmap lists event types; evdev reports it under EV_SYN
+    'key': ecodes.EV_KEY,
+    'rel': ecodes.EV_REL,
+    'abs': ecodes.EV_ABS,
+    'msc': ecodes.EV_MSC,
+    'led': ecodes.EV_LED,
+    'snd': ecodes.EV_SND,
+    'ff': ecodes.EV_FF,
+    'sw': ecodes.EV_SW,
+}
+
+def parse_bitmap(text: str) -> int:
+    """'1000000000007 ff9f207ac14057ff ...' -> int with bit N set for code N"""
+    value = 0
+    for word in text.split():
+        value = (value << LONG_BITS) | int(word, 16)
+    return value
+
+def bitmap_codes(bitmap: int) -> List[int]:
+    bits = bin(bitmap)[:1:-1]  # least significant first, without the 0b prefix
+    return [code for code, bit in enumerate(bits) if bit == "1"]
+
+def format_bitmap(codes) -> str:
+    """Inverse of parse_bitmap, in the kernel's format"""
+    value = 0
+    for code in codes:
+        value |= 1 << code
+    words = []
+    while True:
+        words.append(f"{value & ((1 << LONG_BITS) - 1):x}")
+        value >>= LONG_BITS
+        if not value:
+            break
+    return " ".join(reversed(words))
+
+
+@dataclass
+class InputDeviceRecord:
+    """What the kernel publishes about an input device, without opening it"""
+    path: str
+    name: str
+    phys: str
+    uniq: str
+    info: DeviceInfo
+    sysfs: str = ""
+    bitmaps: Dict[int, int] = field(default_factory=dict)
+
+    def capabilities(self) -> Dict[int, List[int]]:
+        return {etype: bitmap_codes(bitmap) for etype, bitmap in self.bitmaps.items() if bitmap}
+
+
+def parse_proc_devices(text: str, dev_dir: str = "/dev/input") -> List[InputDeviceRecord]:
+    """Records for every block of /proc/bus/input/devices that has an event handler"""
+    records = []
+    for block in text.split("\n\n"):
+        fields = {'bitmaps': {}}
+        for line in block.splitlines():
+            if len(line) < 3 or line[1] != ":":
+                continue
+            tag, rest = line[0], line[3:]
+            if tag == "I":
+                ids = dict(part.split("=", 1) for part in rest.split())
+                fields['info'] = DeviceInfo(*(int(ids.get(k, "0"), 16) for k in ("Bus", "Vendor", "Product", "Version")))
+            elif tag == "N":
+                fields['name'] = rest.partition("=")[2].strip('"')
+            elif tag == "P":
+                fields['phys'] = rest.partition("=")[2]
+            elif tag == "U":
+                fields['uniq'] = rest.partition("=")[2]
+            elif tag == "S":
+                fields['sysfs'] = rest.partition("=")[2]
+            elif tag == "H":
+                handlers = rest.partition("=")[2].split()
+                fields['event'] = next((h for h in handlers if h.startswith("event")), None)
+            elif tag == "B":
+                kind, _, bitmap = rest.partition("=")
+                etype = BITMAP_TYPES.get(kind.lower())
+                if etype is not None:
+                    fields['bitmaps'][etype] = parse_bitmap(bitmap)
+
+        if not fields.get('event') or 'info' not in fields:
+            continue
+        records.append(InputDeviceRecord(
+            path=os.path.join(dev_dir, fields['event']),
+            name=fields.get('name', ""),
+            phys=fields.get('phys', ""),
+            uniq=fields.get('uniq', ""),
+            info=fields['info'],
+            sysfs=fields.get('sysfs', ""),
+            bitmaps=fields['bitmaps'],
+        ))
+    return records
+
+def strip_sys_dir(path: str, sys_dir: str) -> str:
+    """'<root>/sys/devices/...' -> '/devices/...'"""
+    sys_dir = os.path.realpath(sys_dir)
+    return path[len(sys_dir):] if path.startswith(sys_dir + "/") else path
+
+def _read(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+def read_sysfs_devices(class_dir: str, dev_dir: str = "/dev/input") -> List[InputDeviceRecord]:
+    """Records built from /sys/class/input/event*/device attributes"""
+    records = []
+    try:
+        entries = sorted(entry for entry in os.listdir(class_dir) if entry.startswith("event"))
+    except OSError:
+        return records
+
+    for entry in entries:
+        device_dir = os.path.join(class_dir, entry, "device")
+        ids = [_read(os.path.join(device_dir, "id", name)) or "0" for name in ("bustype", "vendor", "product", "version")]
+        bitmaps = {}
+        for kind, etype in BITMAP_TYPES.items():
+            text = _read(os.path.join(device_dir, "capabilities", kind))
+            if text:
+                bitmaps[etype] = parse_bitmap(text)
+        records.append(InputDeviceRecord(
+            path=os.path.join(dev_dir, entry),
+            name=_read(os.path.join(device_dir, "name")),
+            phys=_read(os.path.join(device_dir, "phys")),
+            uniq=_read(os.path.join(device_dir, "uniq")),
+            info=DeviceInfo(*(int(value, 16) for value in ids)),
+            sysfs=strip_sys_dir(os.path.realpath(device_dir), os.path.dirname(os.path.dirname(class_dir))),
+            bitmaps=bitmaps,
+        ))
+    return records
+
+
+class SysfsInputDevice:
+    """
+    InputDevice stand-in answering name/phys/uniq/info/capabilities from the
+    kernel's published data. Anything else (grab, fd, leds, read...) opens
+    the real device on first use.
+    """
+
+    def __init__(self, record: InputDeviceRecord, opener):
+        self.record = record
+        self.path = record.path
+        self.name = record.name
+        self.phys = record.phys
+        self.uniq = record.uniq
+        self.info = record.info
+        self._opener = opener
+        self._device = None
+
+    def __repr__(self) -> str:
+        return f"SysfsInputDevice({self.path!r}, {self.name!r})"
+
+    @property
+    def opened(self) -> bool:
+        return self._device is not None
+
+    def open(self):
+        if self._device is None:
+            self._device = self._opener(self.path)
+            logger.debug(f"Opened {self.name} ({self.path}) on first use")
+        return self._device
+
+    def capabilities(self, verbose: bool = False, absinfo: bool = True) -> Dict:
+        if verbose or (absinfo and self.record.bitmaps.get(ecodes.EV_ABS)):
+            # Axis ranges and names are only available from the device itself
+            return self.open().capabilities(verbose=verbose, absinfo=absinfo)
+        return self.record.capabilities()
+
+    def close(self):
+        if self._device is not None:
+            self._device.close()
+            self._device = None
+
+    def __getattr__(self, name):
+        # Only reached for attributes not set in __init__
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.open(), name)
+
+
+class SysfsBackend:
+    """
+    Device listing from /proc/bus/input/devices (or /sys/class/input when
+    /proc is unavailable) under `root`, so scans need no permissions on
+    /dev/input and open nothing. A fixture tree works as root.
+    """
+
+    def __init__(self, root: str = "/", dev_dir: str = "/dev/input", opener=None):
+        self.root = root
+        self.sysfs_root = root
+        self.dev_dir = dev_dir
+        if opener is None:
+            from evdev import InputDevice
+            opener = InputDevice
+        self._opener = opener
+        self._records: Dict[str, InputDeviceRecord] = {}
+
+    def refresh(self) -> List[InputDeviceRecord]:
+        proc_path = os.path.join(self.root, "proc/bus/input/devices")
+        try:
+            with open(proc_path) as f:
+                records = parse_proc_devices(f.read(), self.dev_dir)
+        except OSError:
+            records = read_sysfs_devices(os.path.join(self.root, "sys/class/input"), self.dev_dir)
+        self._records = {record.path: record for record in records}
+        return records
+
+    def list_devices(self) -> List[str]:
+        return [record.path for record in self.refresh()]
+
+    def open(self, path: str) -> SysfsInputDevice:
+        record = self._records.get(path)
+        if record is None:
+            self.refresh()
+            record = self._records.get(path)
+            if record is None:
+                raise FileNotFoundError(f"No input device {path} under {self.root}")
+        return SysfsInputDevice(record, self._opener)
+
+USB_PHYS = re.compile(r"^usb-(?P<controller>[0-9a-f]{4}:[0-9a-f]{2}:[0-9a-f]{2}\.\d)-(?P<port>[\d.]+)/input(?P<interface>\d+)$")
+
+def fixture_sysfs_path(device, index: int) -> str:
+    """A plausible /devices/... path: USB phys gets a USB/HID parent chain, anything else is virtual"""
+    match = USB_PHYS.match(device.phys or "")
+    if match is None:
+        return f"/devices/virtual/input/input{index}"
+    info = device.info
+    controller, port, interface = match.group("controller", "port", "interface")
+    usb_device = f"1-{port}"
+    hid = f"{info.bustype:04X}:{info.vendor:04X}:{info.product:04X}.{index + 1:04X}"
+    return (f"/devices/pci0000:00/{controller}/usb1/{usb_device}/{usb_device}:1.{interface}/"
+            f"{hid}/input/input{index}")
+
+def write_fixture_tree(root: str, devices) -> str:
+    """
+    Write /proc/bus/input/devices and /sys/class/input/event*/device for
+    devices (InputDevice-like: path, name, phys, uniq, info, capabilities())
+    under root, e.g. to exercise SysfsBackend without hardware.
+    """
+    blocks = []
+    for index, device in enumerate(devices):
+        event = os.path.basename(device.path)
+        caps = {etype: [code[0] if isinstance(code, tuple) else code for code in codes]
+                for etype, codes in device.capabilities(absinfo=False).items()}
+        info = device.info
+        sysfs = fixture_sysfs_path(device, index)
+        bitmaps = {kind: format_bitmap(caps[etype]) for kind, etype in BITMAP_TYPES.items() if caps.get(etype)}
+
+        lines = [
+            f"I: Bus={info.bustype:04x} Vendor={info.vendor:04x} Product={info.product:04x} Version={info.version:04x}",
+            f'N: Name="{device.name}"',
+            f"P: Phys={device.phys or ''}",
+            f"S: Sysfs={sysfs}",
+            f"U: Uniq={device.uniq or ''}",
+            f"H: Handlers={event}",
+        ]
+        lines += [f"B: {kind.upper()}={bitmap}" for kind, bitmap in bitmaps.items()]
+        blocks.append("\n".join(lines) + "\n")
+
+        # Laid out like the kernel: the input device under its USB/HID parents,
+        # the event node inside it, and class/input/eventN linking to that
+        device_dir = os.path.join(root, "sys", sysfs.lstrip("/"))
+        os.makedirs(os.path.join(device_dir, "id"), exist_ok=True)
+        os.makedirs(os.path.join(device_dir, "capabilities"), exist_ok=True)
+        os.makedirs(os.path.join(device_dir, event), exist_ok=True)
+        os.symlink("..", os.path.join(device_dir, event, "device"))
+        class_dir = os.path.join(root, "sys/class/input")
+        os.makedirs(class_dir, exist_ok=True)
+        os.symlink(os.path.join(device_dir, event), os.path.join(class_dir, event))
+        for name, value in (("name", device.name), ("phys", device.phys or ""), ("uniq", device.uniq or "")):
+            with open(os.path.join(device_dir, name), "w") as f:
+                f.write(value + "\n")
+        for name, value in zip(("bustype", "vendor", "product", "version"), info):
+            with open(os.path.join(device_dir, "id", name), "w") as f:
+                f.write(f"{value:04x}\n")
+        for kind in BITMAP_TYPES:
+            with open(os.path.join(device_dir, "capabilities", kind), "w") as f:
+                f.write(bitmaps.get(kind, "0") + "\n")
+
+    proc_dir = os.path.join(root, "proc/bus/input")
+    os.makedirs(proc_dir, exist_ok=True)
+    with open(os.path.join(proc_dir, "devices"), "w") as f:
+        f.write("\n".join(blocks))
+    return root
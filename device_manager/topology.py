@@ -0,0 +1,86 @@
+# device_manager/topology.py
+import hashlib
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from device_manager.sysfs import SysfsInputDevice, strip_sys_dir
+
+# USB device directories are "<bus>-<port>[.<port>...]"; their interfaces add ":<config>.<interface>"
+USB_DEVICE_DIR = re.compile(r"^\d+-\d+(\.\d+)*$")
+# HID device directories: "<bus>:<vendor>:<product>.<instance>"
+HID_DEVICE_DIR = re.compile(r"^[0-9A-Fa-f]{4}:[0-9A-Fa-f]{4}:[0-9A-Fa-f]{4}\.[0-9A-Fa-f]{4}$")
+# HID bus of USB HID devices (BUS_USB); any other bus is its own physical device
+HID_BUS_USB = "0003"
+
+SYSFS_ROOT = os.environ.get("COLDKEYS_SYSFS_ROOT", "/")
+
+def sysfs_path(device, root: Optional[str] = None) -> str:
+    """
+    The device's /devices/... path (as /proc/bus/input/devices prints it),
+    from its sysfs record or the event node's class link under root
+    """
+    if isinstance(device, SysfsInputDevice):
+        return device.record.sysfs
+    if root is None:
+        # Not a kernel device (fake backends), nothing to look up
+        return ""
+    sys_dir = os.path.join(root, "sys")
+    link = os.path.join(sys_dir, "class/input", os.path.basename(device.path), "device")
+    try:
+        return strip_sys_dir(os.path.realpath(link, strict=True), sys_dir)
+    except OSError:
+        return ""
+
+def physical_parent(sysfs: str) -> str:
+    """
+    The sysfs directory of the physical device an input node belongs to: the
+    USB device for USB interfaces, else the HID device (Bluetooth, uhid). A
+    non-USB HID device is its own parent even behind a USB adapter, as with
+    .../usb1/1-14/1-14:1.0/bluetooth/hci0/hci0:512/0005:046D:B35B.0003/...
+    """
+    parts = sysfs.split("/")
+    hid_index = None
+    for index in range(len(parts) - 1, -1, -1):
+        part = parts[index]
+        if USB_DEVICE_DIR.match(part):
+            return "/".join(parts[:index + 1])
+        if hid_index is None and HID_DEVICE_DIR.match(part):
+            if part[:4] != HID_BUS_USB:
+                return "/".join(parts[:index + 1])
+            hid_index = index
+    if hid_index is not None:
+        return "/".join(parts[:hid_index + 1])
+    return ""
+
+def phys_parent(phys: str) -> str:
+    """'usb-0000:00:14.0-1/input0' -> 'usb-0000:00:14.0-1'"""
+    base, _, last = (phys or "").rpartition("/")
+    return base if base and last.startswith("input") else (phys or "")
+
+def topology_key(device, root: Optional[str] = None) -> str:
+    """
+    What the interfaces of one physical device share, most reliable first:
+    the sysfs USB/HID parent, then phys minus the interface suffix plus uniq
+    (Bluetooth phys is the adapter, uniq the device), then the name.
+    """
+    info = device.info
+    ids = f"{info.bustype:04x}:{info.vendor:04x}:{info.product:04x}"
+    parent = physical_parent(sysfs_path(device, root))
+    if parent:
+        return f"{ids}|sysfs:{parent}"
+    phys = phys_parent(device.phys)
+    if phys or device.uniq:
+        return f"{ids}|phys:{phys}|uniq:{device.uniq or ''}"
+    return f"{ids}|name:{device.name}"
+
+def physical_id(key: str) -> str:
+    """Short stable ID for a topology key, the same across rescans and reboots"""
+    return hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
+
+def group_by_topology(devices: Dict[str, object], root: Optional[str] = None) -> Dict[str, List[Tuple[str, object]]]:
+    """{physical id: [(path, device), ...]} in one pass over the devices"""
+    groups: Dict[str, List[Tuple[str, object]]] = {}
+    for path, device in devices.items():
+        groups.setdefault(physical_id(topology_key(device, root)), []).append((path, device))
+    return groups
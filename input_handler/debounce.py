@@ -0,0 +1,180 @@
+# input_handler/debounce.py
+import os
+import threading
+from array import array
+from typing import Dict, Optional
+
+from input_handler.key_state import KEY_SLOTS, key_name
+from utils.logger import get_logger
+
+logger = get_logger("debounce")
+
+# Default window for every device, the mapper's "Key Debounce Time"; 0 disables
+DEBOUNCE_MS = float(os.environ.get("COLDKEYS_DEBOUNCE_MS", "0"))
+
+
+class Debouncer:
+    """
+    Eager per-key debounce for one device: a press or release goes through
+    at once, then further changes of that key within the window are chatter
+    and dropped. The last dropped value is kept, and once the window closes
+    the key's settled state goes out if it differs from the accepted one,
+    so a real release inside the window is late, never lost. Works on
+    kernel timestamps (microseconds), so read delays never turn real
+    keystrokes into chatter.
+    """
+
+    __slots__ = ('path', 'window_us', 'last_change', 'state', 'pending', 'due', 'filtered')
+
+    def __init__(self, path: str = "", window_ms: float = DEBOUNCE_MS):
+        self.path = path
+        self.window_us = int(window_ms * 1000)
+        # Kernel time of each key's last accepted change; far enough back
+        # that a key's first event always passes
+        self.last_change = array('q', [-(1 << 62)]) * KEY_SLOTS
+        # Accepted value per key; 0xff (unknown) lets the first event through
+        self.state = bytearray(b'\xff') * KEY_SLOTS
+        # Last raw value of keys whose raw state differs from the accepted one
+        self.pending: Dict[int, int] = {}
+        # Kernel times windows with a pending key close at, for the caller to
+        # arm a settle() timer with; it clears the list
+        self.due = []
+        self.filtered = array('I', bytes(4 * KEY_SLOTS))
+
+    def accept(self, code: int, value: int, stamp_us: int) -> bool:
+        """False for chatter: a change of the key within the window of its last one"""
+        if value == 2:
+            # Autorepeat comes from the kernel, never from the switch
+            return True
+        if self.state[code] == value:
+            # Back where it was accepted: whatever was pending bounced back
+            self.pending.pop(code, None)
+        elif stamp_us - self.last_change[code] >= self.window_us:
+            self.last_change[code] = stamp_us
+            self.state[code] = value
+            self.pending.pop(code, None)
+            return True
+        else:
+            # A change inside the window: held back until it closes
+            if code not in self.pending:
+                self.due.append(self.last_change[code] + self.window_us)
+            self.pending[code] = value
+        self.filtered[code] += 1
+        return False
+
+    def settle(self, stamp_us: int) -> list:
+        """
+        (code, value) of pending keys whose window closed by stamp_us, now
+        accepted as of their window's end
+        """
+        window_us = self.window_us
+        last_change = self.last_change
+        state = self.state
+        settled = []
+        for code, value in list(self.pending.items()):
+            closed = last_change[code] + window_us
+            if closed <= stamp_us:
+                del self.pending[code]
+                last_change[code] = closed
+                state[code] = value
+                settled.append((code, value))
+        return settled
+
+    def filter(self, keys, stamp_us: int):
+        """
+        A frame's (code, value) key events minus chatter, after any keys that
+        settled since the last frame. accept() inlined: frames without
+        chatter cost one pass and come back as they are.
+        """
+        settled = self.settle(stamp_us) if self.pending else None
+        last_change = self.last_change
+        state = self.state
+        horizon = stamp_us - self.window_us
+        index = 0
+        for code, value in keys:
+            if value != 2:
+                if last_change[code] > horizon or state[code] == value:
+                    rest = self._filter_rest(keys, index, stamp_us)
+                    return settled + rest if settled else rest
+                last_change[code] = stamp_us
+                state[code] = value
+            index += 1
+        return settled + list(keys) if settled else keys
+
+    def _filter_rest(self, keys, index: int, stamp_us: int) -> list:
+        """Slow path from the frame's first chatter event on"""
+        accept = self.accept
+        return list(keys[:index]) + [key for key in keys[index:] if accept(key[0], key[1], stamp_us)]
+
+    def chatter(self) -> Dict[str, int]:
+        """Filtered events per key name, keys without chatter left out"""
+        return {key_name(code): count for code, count in enumerate(self.filtered) if count}
+
+    def reset(self):
+        self.last_change = array('q', [-(1 << 62)]) * KEY_SLOTS
+        self.state = bytearray(b'\xff') * KEY_SLOTS
+        self.pending.clear()
+        self.due.clear()
+
+
+class DebounceRegistry:
+    """Debouncer per device path, with per-device windows over a default"""
+
+    def __init__(self, window_ms: float = DEBOUNCE_MS):
+        self.window_ms = window_ms
+        self._windows: Dict[str, float] = {}
+        self._debouncers: Dict[str, Optional[Debouncer]] = {}
+        self._lock = threading.Lock()
+        # Bumped whenever a device's debouncer may be replaced, for callers that cache get()
+        self.epoch = 0
+
+    def get(self, path: str) -> Optional[Debouncer]:
+        """The device's debouncer, or None when debounce is off for it (the hot path's check)"""
+        try:
+            return self._debouncers[path]
+        except KeyError:
+            pass
+        with self._lock:
+            window = self._windows.get(path, self.window_ms)
+            debouncer = Debouncer(path, window) if window > 0 else None
+            return self._debouncers.setdefault(path, debouncer)
+
+    def set_window(self, path: Optional[str], window_ms: float):
+        """Window for one device, or the default for all (path None); 0 turns it off"""
+        if window_ms < 0:
+            raise ValueError(f"Debounce window must not be negative: {window_ms}")
+        with self._lock:
+            if path is None:
+                self.window_ms = window_ms
+                stale = [p for p in self._debouncers if p not in self._windows]
+            else:
+                self._windows[path] = window_ms
+                stale = [path]
+            for p in stale:
+                debouncer = self._debouncers.get(p)
+                if debouncer is not None and window_ms > 0:
+                    # Keep the key history and stats, only the window moves
+                    debouncer.window_us = int(window_ms * 1000)
+                else:
+                    self._debouncers.pop(p, None)
+            self.epoch += 1
+        logger.info(f"Debounce window for {path or 'all devices'}: {window_ms} ms")
+
+    def forget(self, path: str):
+        with self._lock:
+            self._debouncers.pop(path, None)
+            self.epoch += 1
+
+    def chatter(self) -> Dict[str, Dict[str, int]]:
+        """{device path: {key name: filtered events}} for devices that chattered"""
+        stats = {}
+        for path, debouncer in list(self._debouncers.items()):
+            if debouncer is not None:
+                counts = debouncer.chatter()
+                if counts:
+                    stats[path] = counts
+        return stats
+
+
+# Debounce state of every device read through input_handler
+DEBOUNCE = DebounceRegistry()
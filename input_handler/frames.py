@@ -0,0 +1,171 @@
+# input_handler/frames.py
+import select
+import time
+from operator import itemgetter
+from typing import Iterator, List, Optional
+
+from evdev import _input, ecodes
+
+EV_SYN = ecodes.EV_SYN
+EV_KEY = ecodes.EV_KEY
+SYN_REPORT = ecodes.SYN_REPORT
+SYN_DROPPED = ecodes.SYN_DROPPED
+
+_TYPE = itemgetter(2)
+_KEY = itemgetter(3, 4)
+_SYN_BYTE = bytes([EV_SYN])
+_KEY_BYTE = bytes([EV_KEY])
+
+# A frame is everything the kernel reported between two SYN_REPORTs:
+# (sec, usec, ((type, code, value), ...)) with the SYN_REPORT timestamp.
+# A key frame keeps only the EV_KEY events: (sec, usec, ((code, value), ...))
+
+
+class FrameAssembler:
+    """
+    Groups raw (sec, usec, type, code, value) reads into SYN_REPORT frames.
+    With keys_only, frames are key frames, (sec, usec, ((code, value), ...))
+    holding a frame's EV_KEY events, and frames without any are skipped:
+    reads are scanned by C-level byte searches, so mouse motion and other
+    key-less traffic costs no Python work per event.
+    """
+
+    __slots__ = ('keys_only', '_pending', '_dropping', 'dropped_frames')
+
+    def __init__(self, keys_only: bool = False):
+        self.keys_only = keys_only
+        self._pending = []
+        self._dropping = False
+        self.dropped_frames = 0
+
+    def feed(self, events) -> List[tuple]:
+        """Consume one bulk read and return every frame it completed"""
+        if self.keys_only:
+            return self._feed_keys(events)
+        frames = []
+        pending = self._pending
+        append = pending.append
+
+        for sec, usec, etype, code, value in events:
+            if etype != EV_SYN:
+                append((etype, code, value))
+                continue
+
+            if code == SYN_REPORT:
+                if self._dropping:
+                    # First report after SYN_DROPPED resynchronises the stream
+                    self._dropping = False
+                elif pending:
+                    frames.append((sec, usec, tuple(pending)))
+                pending.clear()
+            elif code == SYN_DROPPED:
+                # Kernel buffer overran: the partial frame cannot be trusted
+                pending.clear()
+                self._dropping = True
+                self.dropped_frames += 1
+
+        return frames
+
+    def _feed_keys(self, events) -> List[tuple]:
+        """
+        feed() for keys_only. Only the SYN events around key frames are looked
+        at: the last SYN_REPORT / SYN_DROPPED before a key frame decides
+        whether it is dropped, so a SYN_DROPPED is counted when a key frame follows it
+        """
+        frames = []
+        types = bytes(map(_TYPE, events))
+        find, rfind = types.find, types.rfind
+        pending = self._pending
+        dropping = self._dropping
+        pos = 0
+        while True:
+            if pending:
+                # A frame carried over from the previous read
+                start = 0
+            else:
+                start = find(_KEY_BYTE, pos)
+                if start < 0:
+                    break
+                index = rfind(_SYN_BYTE, pos, start)
+                while index >= 0:
+                    code = events[index][3]
+                    if code == SYN_REPORT:
+                        dropping = False
+                        break
+                    if code == SYN_DROPPED:
+                        dropping = True
+                        self.dropped_frames += 1
+                        break
+                    index = rfind(_SYN_BYTE, pos, index)
+
+            # The frame ends at the next SYN_REPORT / SYN_DROPPED
+            end = find(_SYN_BYTE, start)
+            while end >= 0:
+                code = events[end][3]
+                if code == SYN_REPORT or code == SYN_DROPPED:
+                    break
+                end = find(_SYN_BYTE, end + 1)
+            stop = len(events) if end < 0 else end
+            if not dropping:
+                if types.count(_KEY_BYTE, start, stop) == stop - start:
+                    pending += map(_KEY, events[start:stop])
+                else:
+                    pending += [(code, value) for _, _, etype, code, value in events[start:stop]
+                                if etype == EV_KEY]
+            if end < 0:
+                self._dropping = dropping
+                return frames
+
+            if code == SYN_REPORT:
+                if dropping:
+                    # First report after SYN_DROPPED resynchronises the stream
+                    dropping = False
+                else:
+                    boundary = events[end]
+                    frames.append((boundary[0], boundary[1], tuple(pending)))
+            else:
+                dropping = True
+                self.dropped_frames += 1
+            pending.clear()
+            pos = end + 1
+
+        index = rfind(_SYN_BYTE, pos)
+        while index >= 0:
+            code = events[index][3]
+            if code == SYN_REPORT:
+                dropping = False
+                break
+            if code == SYN_DROPPED:
+                dropping = True
+                self.dropped_frames += 1
+                break
+            index = rfind(_SYN_BYTE, pos, index)
+        self._dropping = dropping
+        return frames
+
+    def reset(self):
+        self._pending.clear()
+        self._dropping = False
+
+
+def read_frames(device, timers=None, assembler: Optional[FrameAssembler] = None) -> Iterator[tuple]:
+    """
+    Blocking generator over a device's frames, like read_loop() but batched.
+    timers (a utils.timer_wheel.TimerWheel) is advanced between reads.
+    """
+    if assembler is None:
+        assembler = FrameAssembler()
+    fd = device.fd
+    while True:
+        if timers is None:
+            select.select([fd], [], [])
+        else:
+            readable, _, _ = select.select([fd], [], [], timers.next_timeout())
+            timers.advance(time.time())
+            if not readable:
+                continue
+        try:
+            events = _input.device_read_many(fd)
+        except BlockingIOError:
+            continue
+        yield from assembler.feed(events)
@@ -0,0 +1,149 @@
+# input_handler/key_state.py
+import atexit
+import threading
+from typing import Dict, Iterable, List
+
+from evdev import ecodes
+from action_performer.linux import write_events
+from utils.logger import get_logger
+
+logger = get_logger("key_state")
+
+KEY_SLOTS = ecodes.KEY_MAX + 1
+
+# Modifier mask bits, left hand in the low nibble and right hand in the high one
+MOD_LEFTCTRL, MOD_LEFTSHIFT, MOD_LEFTALT, MOD_LEFTMETA = 0x01, 0x02, 0x04, 0x08
+MOD_RIGHTCTRL, MOD_RIGHTSHIFT, MOD_RIGHTALT, MOD_RIGHTMETA = 0x10, 0x20, 0x40, 0x80
+MOD_CTRL = MOD_LEFTCTRL | MOD_RIGHTCTRL
+MOD_SHIFT = MOD_LEFTSHIFT | MOD_RIGHTSHIFT
+MOD_ALT = MOD_LEFTALT | MOD_RIGHTALT
+MOD_META = MOD_LEFTMETA | MOD_RIGHTMETA
+
+MODIFIER_KEYS = {
+    ecodes.KEY_LEFTCTRL: MOD_LEFTCTRL,
+    ecodes.KEY_LEFTSHIFT: MOD_LEFTSHIFT,
+    ecodes.KEY_LEFTALT: MOD_LEFTALT,
+    ecodes.KEY_LEFTMETA: MOD_LEFTMETA,
+    ecodes.KEY_RIGHTCTRL: MOD_RIGHTCTRL,
+    ecodes.KEY_RIGHTSHIFT: MOD_RIGHTSHIFT,
+    ecodes.KEY_RIGHTALT: MOD_RIGHTALT,
+    ecodes.KEY_RIGHTMETA: MOD_RIGHTMETA,
+}
+
+# Key code -> its modifier bit (0 for everything else), so the hot path is one index
+MODIFIER_BITS = bytes(MODIFIER_KEYS.get(code, 0) for code in range(KEY_SLOTS))
+
+def key_name(code: int) -> str:
+    name = ecodes.KEY.get(code, f"KEY_{code}")
+    # Aliased codes map to a list of names
+    return name[0] if isinstance(name, list) else name
+
+def either_side(mask: int) -> int:
+    """Fold right-hand modifiers onto the left ones: Ctrl is Ctrl whichever was pressed"""
+    return (mask | mask >> 4) & 0x0F
+
+
+class KeyState:
+    """
+    Keys held on one device: one byte per key code and the modifier mask,
+    updated once per frame
+    """
+
+    __slots__ = ('path', 'pressed', 'modifiers')
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self.pressed = bytearray(KEY_SLOTS)
+        self.modifiers = 0
+
+    def apply(self, keys):
+        """Update from a frame's (code, value) key events"""
+        pressed = self.pressed
+        modifiers = self.modifiers
+        for code, value in keys:
+            if value == 2:
+                # Autorepeat of a key already down
+                continue
+            pressed[code] = value
+            bit = MODIFIER_BITS[code]
+            if bit:
+                modifiers = modifiers | bit if value else modifiers & ~bit
+        self.modifiers = modifiers
+
+    def update(self, code: int, value: int):
+        self.apply(((code, value),))
+
+    def is_pressed(self, code: int) -> bool:
+        return bool(self.pressed[code])
+
+    def any_pressed(self) -> bool:
+        return self.pressed.find(1) != -1
+
+    def held(self) -> List[int]:
+        """Codes currently down, lowest first"""
+        codes = []
+        find = self.pressed.find
+        code = find(1)
+        while code != -1:
+            codes.append(code)
+            code = find(1, code + 1)
+        return codes
+
+    def clear(self) -> List[int]:
+        """Forget every held key; returns the ones that were down"""
+        codes = self.held()
+        for code in codes:
+            self.pressed[code] = 0
+        self.modifiers = 0
+        return codes
+
+
+class KeyStateRegistry:
+    """Per-device KeyState keyed by device path, with stuck-key recovery"""
+
+    def __init__(self):
+        self._states: Dict[str, KeyState] = {}
+        self._lock = threading.Lock()
+
+    def for_device(self, path: str) -> KeyState:
+        state = self._states.get(path)
+        if state is None:
+            with self._lock:
+                state = self._states.setdefault(path, KeyState(path))
+        return state
+
+    def get(self, path: str):
+        return self._states.get(path)
+
+    def modifiers(self, path: str) -> int:
+        state = self._states.get(path)
+        return state.modifiers if state else 0
+
+    def release(self, path: str, forget: bool = False) -> int:
+        """
+        Send a synthetic release through the action performer for every key
+        still held on the device, so nothing stays stuck once we stop reading
+        it; returns the number of releases sent
+        """
+        with self._lock:
+            state = self._states.pop(path, None) if forget else self._states.get(path)
+        if state is None or not state.any_pressed():
+            return 0
+        codes = state.clear()
+        write_events([(ecodes.EV_KEY, code, 0) for code in codes])
+        logger.info(f"Released {len(codes)} held key(s) on {path}: {', '.join(map(key_name, codes))}")
+        return len(codes)
+
+    def release_devices(self, paths: Iterable[str], forget: bool = False) -> int:
+        return sum(self.release(path, forget) for path in paths)
+
+    def release_all(self) -> int:
+        """Shutdown: release whatever is held on any device"""
+        return self.release_devices(list(self._states))
+
+
+# Pressed keys of every device read through input_handler
+PRESSED_KEYS = KeyStateRegistry()
+# Registered after action_performer's own atexit hook, so it runs while the
+# virtual devices are still open
+atexit.register(PRESSED_KEYS.release_all)
@@ -1,9 +1,29 @@
 # input_handler/linux.py
+import logging
+import time
+
 from evdev import ecodes
-from utils.logger import get_logger
-from action_performer.linux import simulate_key
+from utils.logger import EVENT_JOURNAL, LogGate, get_logger
+from action_performer.linux import write_events
+from input_handler.debounce import DEBOUNCE
+from input_handler.frames import FrameAssembler, read_frames
+from input_handler.key_state import PRESSED_KEYS
+from keymap_handler.chords import CHORD_MATCHERS
+from keymap_handler.core import PASSTHROUGH, SWALLOW, Keymap, compile_keymap
+from keymap_handler.layers import LAYER_STATES
+from keymap_handler.tap_hold import TAP_HOLD_ENGINE, TapHoldEngine
+from utils.latency import KERNEL_TO_READ, LATENCY, MAPPED_TO_ACTION, READ_TO_MAPPED, action_label
+from utils.timer_wheel import TIMERS, TimerWheel
 
 logger = get_logger("input_handler")
+frame_log = LogGate(logger, logging.DEBUG)
+
+ACTION_PASSTHROUGH = EVENT_JOURNAL.action_id("passthrough")
+ACTION_SWALLOW = EVENT_JOURNAL.action_id("swallow")
+ACTION_HANDLER = EVENT_JOURNAL.action_id("handler")
+ACTION_CHORD = EVENT_JOURNAL.action_id("chord")
+ACTION_TAP_HOLD = EVENT_JOURNAL.action_id("tap_hold")
+PASSTHROUGH_LABEL = action_label(PASSTHROUGH)
 
 # Define a placeholder for mapped keys
 # In real case, fetch this from user config or keymap handler
@@ -14,26 +34,299 @@ CUSTOM_MAPPED_KEYS = {
 
 }
 
-def read_key_events(device, simulate_unmapped=True):
-    logger.info(f"Started reading events from {device.name} ({device.path})")
+# Compiled once; swap ACTIVE_KEYMAP.table to remap without locking
+ACTIVE_KEYMAP = Keymap(compile_keymap({code: SWALLOW for code in CUSTOM_MAPPED_KEYS}, name="placeholder"))
 
-    try:
-        for event in device.read_loop():  # This blocks until an event is available
-            if event.type == ecodes.EV_KEY:
-                key_code = event.code
-                key_value = event.value
-                key_timestamp = event.timestamp()
+KEY_STATES = {0: "KEY_UP", 1: "KEY_DOWN", 2: "KEY_HOLD"}
+EV_KEY = ecodes.EV_KEY
+
+# Longest the asyncio front end's timer ticker sleeps (seconds)
+TICKER_WAIT = 0.02
+
+class _DeviceInput:
+    """
+    A device's state on the frame path, looked up once per device rather
+    than per frame. The debouncer is looked up again when DEBOUNCE changes
+    """
 
-                key_state = {0: "KEY_UP", 1: "KEY_DOWN", 2: "KEY_HOLD"}.get(key_value, "UNKNOWN")
-                key_name = ecodes.KEY.get(key_code, f"KEY_{key_code}")
+    __slots__ = ('device', 'path', 'device_id', 'key_state', 'matcher', 'layer_state',
+                 'debouncer', 'debounce_epoch', 'assembler')
 
-                logger.info(f"{key_state}: {key_name} ({key_code}) at {key_timestamp:.4f}")
+    def __init__(self, device):
+        path = device.path
+        self.device = device
+        self.path = path
+        self.device_id = EVENT_JOURNAL.device_id(path)
+        self.key_state = PRESSED_KEYS.for_device(path)
+        self.matcher = CHORD_MATCHERS.for_device(path)
+        self.layer_state = LAYER_STATES.for_device(path)
+        self.debounce_epoch = DEBOUNCE.epoch
+        self.debouncer = DEBOUNCE.get(path)
+        self.assembler = FrameAssembler(keys_only=True)
 
-                # Only simulate if device is grabbed and key is unmapped
-                # if simulate_unmapped and key_code not in CUSTOM_MAPPED_KEYS:
-                    # simulate_key(key_code, key_value)
+    def refresh_debouncer(self):
+        self.debounce_epoch = DEBOUNCE.epoch
+        self.debouncer = DEBOUNCE.get(self.path)
+
+def read_key_events(device, simulate_unmapped=True, keymap=ACTIVE_KEYMAP):
+    logger.info(f"Started reading events from {device.name} ({device.path})")
+
+    # One thread per device: TIMERS and TAP_HOLD_ENGINE belong to the reactor /
+    # asyncio loop, so this thread decides its tap/hold keys on its own wheel
+    engine = TapHoldEngine(TimerWheel())
+    source = _DeviceInput(device)
+    try:
+        # Blocks until a SYN_REPORT frame with keys is complete or a timer is due
+        for frame in read_frames(device, engine.wheel, source.assembler):
+            _handle_frame(source, frame, simulate_unmapped, keymap, engine)
 
     except KeyboardInterrupt:
         logger.info("Stopped input reading | KeyboardInterrupt received. Exiting.")
     except Exception as e:
         logger.error(f"Error reading events: {e}")
+    finally:
+        engine.reset(device.path)
+        PRESSED_KEYS.release(device.path)
+
+def _describe_keys(keys):
+    return ", ".join(
+        f"{KEY_STATES.get(key_value, 'UNKNOWN')}: {ecodes.KEY.get(key_code, f'KEY_{key_code}')} ({key_code})"
+        for key_code, key_value in keys
+    )
+
+def _settle_keys(now, source, debouncer, stamp_us, simulate_unmapped, keymap, engine):
+    """Timer: dispatch keys whose debounce window closed without a later frame to carry them"""
+    keys = debouncer.settle(stamp_us)
+    if keys:
+        sec, usec = divmod(stamp_us, 1_000_000)
+        _handle_frame(source, (sec, usec, keys), simulate_unmapped, keymap, engine, debounce=False)
+
+def _handle_frame(source, frame, simulate_unmapped=True, keymap=ACTIVE_KEYMAP, engine=TAP_HOLD_ENGINE,
+                  debounce=True):
+    """
+    Dispatch one key frame of a _DeviceInput: (sec, usec, ((code, value), ...)),
+    as FrameAssembler(keys_only=True) builds them. engine's wheel must be
+    advanced by the calling loop.
+    """
+    sec, usec, keys = frame
+    if debounce:
+        if source.debounce_epoch != DEBOUNCE.epoch:
+            source.refresh_debouncer()
+        debouncer = source.debouncer
+        if debouncer is not None:
+            # Chatter never reaches key state, the journal or the keymap
+            keys = debouncer.filter(keys, sec * 1_000_000 + usec)
+            if debouncer.due:
+                # Held-back changes go out when their window closes, unless a
+                # frame of this device comes first and carries them
+                for stamp_us in debouncer.due:
+                    engine.wheel.schedule(stamp_us / 1e6, _settle_keys, source, debouncer, stamp_us,
+                                          simulate_unmapped, keymap, engine)
+                debouncer.due.clear()
+            if not keys:
+                return
+    device = source.device
+    # Before dispatch, so handlers and chords see this frame's modifiers
+    key_state = source.key_state
+    key_state.apply(keys)
+
+    measure = LATENCY.enabled
+    if measure:
+        read_ns = time.perf_counter_ns()
+        LATENCY.record(KERNEL_TO_READ, source.path, time.time_ns() - (sec * 1_000_000_000 + usec * 1000))
+
+    timestamp = sec + usec / 1e6
+    if frame_log.enabled:
+        logger.debug(f"{_describe_keys(keys)} at {timestamp:.4f} on {source.path}")
+
+    device_id = source.device_id
+
+    # One table read per frame; a concurrent swap takes effect on the next frame
+    table = keymap.table
+    slots = table.slots
+    chords = table.chords
+    tap_hold = table.tap_hold
+    layers = table.layers
+    matcher = source.matcher if chords is not None else None
+    layer_state = source.layer_state if layers is not None else None
+    # The frame's journal records, written with one pack once it is mapped
+    journal = []
+    passthrough = [] if simulate_unmapped else None
+    actions = []
+    for key_code, key_value in keys:
+        if matcher is not None:
+            handler = matcher.feed(chords, key_code, key_value, key_state.modifiers, timestamp)
+            if handler is SWALLOW:
+                journal += (timestamp, device_id, EV_KEY, key_code, ACTION_SWALLOW, key_value)
+                continue
+            if handler is not None:
+                journal += (timestamp, device_id, EV_KEY, key_code, ACTION_CHORD, key_value)
+                actions.append((handler, key_code, key_value))
+                continue
+        if tap_hold is not None:
+            binding = tap_hold[key_code]
+            if binding is not None:
+                # Actions run once the press is classified, maybe from a timer
+                journal += (timestamp, device_id, EV_KEY, key_code, ACTION_TAP_HOLD, key_value)
+                engine.feed(device, key_code, key_value, binding, timestamp)
+                continue
+        if layer_state is None:
+            handler = slots[key_code * 3 + key_value]
+        else:
+            handler = layer_state.resolve(layers, key_code, key_value)
+        if handler is PASSTHROUGH:
+            journal += (timestamp, device_id, EV_KEY, key_code, ACTION_PASSTHROUGH, key_value)
+            if passthrough is not None:
+                passthrough.append((EV_KEY, key_code, key_value))
+        elif handler is SWALLOW:
+            journal += (timestamp, device_id, EV_KEY, key_code, ACTION_SWALLOW, key_value)
+        else:
+            journal += (timestamp, device_id, EV_KEY, key_code, ACTION_HANDLER, key_value)
+            actions.append((handler, key_code, key_value))
+    EVENT_JOURNAL.record_frame(journal)
+
+    if measure:
+        LATENCY.record(READ_TO_MAPPED, source.path, time.perf_counter_ns() - read_ns)
+
+    for handler, key_code, key_value in actions:
+        if measure:
+            start_ns = time.perf_counter_ns()
+        try:
+            handler(device, key_code, key_value)
+        except Exception as e:
+            # One failing action must not end the read loop of every device
+            logger.error(f"Action failed for key {key_code} on {source.path}: {e}")
+        if measure:
+            LATENCY.record(MAPPED_TO_ACTION, action_label(handler), time.perf_counter_ns() - start_ns)
+
+    # Only simulate if device is grabbed and key is unmapped; the whole
+    # frame's passthrough goes out as one uinput write
+    if passthrough:
+        if measure:
+            start_ns = time.perf_counter_ns()
+        write_events(passthrough)
+        if measure:
+            LATENCY.record(MAPPED_TO_ACTION, PASSTHROUGH_LABEL, time.perf_counter_ns() - start_ns)
+
+def frame_handler(simulate_unmapped=True, keymap=ACTIVE_KEYMAP, engine=TAP_HOLD_ENGINE):
+    """Reactor handler that assembles each device's reads into key frames and dispatches them"""
+    sources = {}
+
+    def on_events(device, events):
+        source = sources.get(device.path)
+        if source is None or source.device is not device:
+            # First read, or a new device object after a reconnect
+            source = sources[device.path] = _DeviceInput(device)
+        for frame in source.assembler.feed(events):
+            _handle_frame(source, frame, simulate_unmapped, keymap, engine)
+
+    return on_events
+
+def read_key_events_all(devices, simulate_unmapped=True, keymap=ACTIVE_KEYMAP, recorder=None):
+    """Read every device from a single epoll loop instead of one thread each"""
+    from input_handler.reactor import EventReactor
+
+    handler = frame_handler(simulate_unmapped, keymap)
+    if recorder is not None:
+        handler = recorder.wrap(handler)
+
+    # Tap/hold decisions are timers advanced by the reactor between polls
+    reactor = EventReactor(handler, timers=TIMERS)
+    for device in devices:
+        reactor.add_device(device)
+
+    try:
+        reactor.run()
+    except Exception as e:
+        logger.error(f"Error reading events: {e}")
+    finally:
+        reactor.close()
+        for device in devices:
+            TAP_HOLD_ENGINE.reset(device.path)
+        PRESSED_KEYS.release_devices(device.path for device in devices)
+        if recorder is not None:
+            recorder.close()
+
+def replay_recording(path, speed=1.0, simulate_unmapped=True, keymap=ACTIVE_KEYMAP):
+    """Run a recording from input_handler.recorder through the frame -> keymap -> action path"""
+    from input_handler.recorder import Recording, replay
+
+    recording = Recording.load(path)
+    logger.info(f"Replaying {len(recording)} events from {path} on {len(recording.devices)} device(s)")
+
+    # Tap/hold timers run on the replayed clock, so decisions come out the
+    # same at any speed; pending ones are decided once the recording ends
+    engine = TapHoldEngine(TimerWheel())
+    timers = engine.wheel
+    handler = frame_handler(simulate_unmapped, keymap, engine)
+
+    def on_events(device, events):
+        sec, usec = events[0][:2]
+        timers.advance(sec + usec / 1e6)
+        handler(device, events)
+
+    stats = replay(recording, on_events, speed=speed)
+    deadline = timers.next_deadline()
+    while deadline is not None:
+        timers.advance(deadline)
+        deadline = timers.next_deadline()
+    for recorded in recording.devices:
+        engine.reset(recorded.path)
+    return stats
+
+async def read_key_events_async(devices, simulate_unmapped=True, stage_config=None, pipeline=None,
+                                keymap=ACTIVE_KEYMAP):
+    """asyncio front end: reading never waits on action execution"""
+    import asyncio
+    from input_handler.pipeline import InputPipeline
+    from action_performer.linux import simulate_key
+
+    def resolve(device, key_code, key_value):
+        key_state = PRESSED_KEYS.for_device(device.path)
+        key_state.update(key_code, key_value)
+        table = keymap.table
+        if table.chords is not None:
+            handler = CHORD_MATCHERS.for_device(device.path).feed(table.chords, key_code, key_value,
+                                                                  key_state.modifiers, time.time())
+            if handler is not None:
+                return None if handler is SWALLOW else handler
+        if table.tap_hold is not None:
+            binding = table.tap_hold[key_code]
+            if binding is not None:
+                TAP_HOLD_ENGINE.feed(device, key_code, key_value, binding, time.time())
+                return None
+        if table.layers is None:
+            handler = table.slots[key_code * 3 + key_value]
+        else:
+            handler = LAYER_STATES.for_device(device.path).resolve(table.layers, key_code, key_value)
+        if handler is SWALLOW or (handler is PASSTHROUGH and not simulate_unmapped):
+            return None
+        return handler
+
+    def perform(item):
+        device, etype, key_code, key_value, key_timestamp, action = item
+        if action is PASSTHROUGH:
+            simulate_key(key_code, key_value)
+        else:
+            action(device, key_code, key_value)
+
+    async def tick():
+        # Tap/hold timers fire on the loop, next to resolve(). resolve() may
+        # arm earlier timers while this sleeps, so waits stay well under any hold time
+        while True:
+            timeout = TIMERS.next_timeout()
+            await asyncio.sleep(TICKER_WAIT if timeout is None else min(timeout, TICKER_WAIT))
+            TIMERS.advance(time.time())
+
+    if pipeline is None:
+        pipeline = InputPipeline(resolve, perform, stage_config)
+    logger.info(f"Started async reading from {len(devices)} device(s)")
+
+    ticker = asyncio.get_running_loop().create_task(tick())
+    try:
+        await pipeline.run(devices)
+    except Exception as e:
+        logger.error(f"Error reading events: {e}")
+    finally:
+        ticker.cancel()
+        logger.info(f"Pipeline stage stats: {pipeline.stats()}")
@@ -0,0 +1,131 @@
+# input_handler/load_generator.py
+import itertools
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from evdev import ecodes
+from utils.logger import get_logger
+
+logger = get_logger("load_generator")
+
+SYN = (ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+SCAN_BASE = 0x70000  # HID usage page 7, what MSC_SCAN reports for keyboards
+
+def typing_frames(text: str = "the quick brown fox jumps over the lazy dog ") -> List[List[tuple]]:
+    """Press/release frames (with MSC_SCAN, like real HID keyboards) for text"""
+    frames = []
+    for char in text.upper():
+        code = ecodes.KEY_SPACE if char == " " else getattr(ecodes, f"KEY_{char}", None)
+        if code is None:
+            continue
+        for value in (1, 0):
+            frames.append([(ecodes.EV_MSC, ecodes.MSC_SCAN, SCAN_BASE + code), (ecodes.EV_KEY, code, value)])
+    return frames
+
+def keyboard_report_frames(keys: Iterable[int] = (ecodes.KEY_W, ecodes.KEY_A, ecodes.KEY_S, ecodes.KEY_D)) -> List[List[tuple]]:
+    """Rolling n-key chords as a 1000 Hz NKRO keyboard reports them"""
+    keys = list(keys)
+    frames = []
+    for value in (1, 0):
+        frames.append([(ecodes.EV_KEY, code, value) for code in keys])
+    return frames
+
+def mouse_motion_frames(dx: int = 1, dy: int = -1) -> List[List[tuple]]:
+    return [[(ecodes.EV_REL, ecodes.REL_X, dx), (ecodes.EV_REL, ecodes.REL_Y, dy)]]
+
+
+class LoadStream:
+    """Frames cycled onto one device at a fixed report rate"""
+
+    def __init__(self, device, rate_hz: float, frames: List[List[tuple]], name: str = ""):
+        self.device = device
+        self.rate_hz = rate_hz
+        self.name = name or f"{device.path}@{rate_hz:g}Hz"
+        self._frames: Iterator[List[tuple]] = itertools.cycle(frames)
+        self.sent_frames = 0
+        self.sent_events = 0
+
+    def next_events(self, count: int) -> List[tuple]:
+        """`count` frames flattened into one batch, each ending in SYN_REPORT"""
+        events = []
+        for _ in range(count):
+            events.extend(next(self._frames))
+            events.append(SYN)
+        self.sent_frames += count
+        return events
+
+
+class LoadGenerator:
+    """Replays typing, 1000 Hz keyboards and 8 kHz mice across fake devices"""
+
+    def __init__(self, tick: float = 0.001):
+        self.tick = tick
+        self.streams: List[LoadStream] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_stream(self, device, rate_hz: float, frames: List[List[tuple]], name: str = "") -> LoadStream:
+        stream = LoadStream(device, rate_hz, frames, name)
+        self.streams.append(stream)
+        return stream
+
+    def add_typing(self, device, wpm: float = 120, text: Optional[str] = None) -> LoadStream:
+        # 5 characters per word, a press and a release frame per character
+        return self.add_stream(device, wpm * 5 * 2 / 60.0, typing_frames(text) if text else typing_frames())
+
+    def add_keyboard(self, device, rate_hz: float = 1000) -> LoadStream:
+        return self.add_stream(device, rate_hz, keyboard_report_frames())
+
+    def add_mouse(self, device, rate_hz: float = 8000) -> LoadStream:
+        return self.add_stream(device, rate_hz, mouse_motion_frames())
+
+    def burst(self, frames_per_stream: int) -> int:
+        """Emit frames as fast as possible, ignoring rates; returns events queued"""
+        queued = 0
+        for stream in self.streams:
+            events = stream.next_events(frames_per_stream)
+            sent = stream.device.emit(events)
+            stream.sent_events += sent
+            queued += sent
+        return queued
+
+    def run(self, duration: float) -> Dict[str, int]:
+        """Emit every stream at its rate for `duration` seconds, batching per tick"""
+        self._stop.clear()
+        logger.info(f"Generating load on {len(self.streams)} stream(s) for {duration:g}s")
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < duration and not self._stop.is_set():
+            for stream in self.streams:
+                due = int(elapsed * stream.rate_hz) - stream.sent_frames
+                if due > 0:
+                    stream.sent_events += stream.device.emit(stream.next_events(due))
+            next_tick = start + (int(elapsed / self.tick) + 1) * self.tick
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elapsed = time.perf_counter() - start
+        return self.stats()
+
+    def start(self, duration: float = float("inf")):
+        self._thread = threading.Thread(target=self.run, args=(duration,), name="coldkeys-load", daemon=True)
+        self._thread.start()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, int]:
+        devices = {id(stream.device): stream.device for stream in self.streams}
+        return {
+            'frames': sum(stream.sent_frames for stream in self.streams),
+            'events': sum(stream.sent_events for stream in self.streams),
+            'dropped': sum(getattr(device, 'dropped_events', 0) for device in devices.values()),
+        }
@@ -0,0 +1,270 @@
+# input_handler/pipeline.py
+import asyncio
+import errno
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from evdev import ecodes
+from input_handler.debounce import DEBOUNCE
+from utils.latency import KERNEL_TO_READ, LATENCY, MAPPED_TO_ACTION, READ_TO_MAPPED, action_label
+from utils.logger import get_logger
+from utils.timer_wheel import TIMERS
+
+logger = get_logger("input_pipeline")
+
+# Overflow policies for a full stage
+POLICY_BLOCK = "block"              # reader waits (backpressure)
+POLICY_DROP_OLDEST = "drop_oldest"  # oldest pending item is discarded
+POLICY_COALESCE = "coalesce"        # merge into a pending item, else block
+
+STAGES = ("decode", "keymap", "action")
+
+# Event type of the decode items a debounce timer queues to flush a device's
+# settled keys; never a real evdev type
+EV_SETTLE = -1
+
+# Every stage carries the same tuple shape:
+# (device, type, code, value, timestamp, action)
+
+
+@dataclass
+class StageConfig:
+    """Queue bound and overflow policy for one pipeline stage"""
+    maxsize: int = 256
+    policy: str = POLICY_BLOCK
+
+
+def coalesce_repeats(old: tuple, new: tuple) -> Optional[tuple]:
+    """Merge key autorepeats and relative motion; never presses or releases"""
+    if old[0] is not new[0] or old[1] != new[1] or old[2] != new[2]:
+        return None
+    if new[1] == ecodes.EV_KEY and new[3] == 2 and old[3] == 2:
+        return new
+    if new[1] == ecodes.EV_REL:
+        return old[:3] + (old[3] + new[3],) + new[4:]
+    return None
+
+
+class StageQueue(asyncio.Queue):
+    """Bounded asyncio queue with an overflow policy and depth metrics"""
+
+    def __init__(self, name: str, config: StageConfig,
+                 coalesce: Callable[[tuple, tuple], Optional[tuple]] = coalesce_repeats,
+                 coalesce_window: int = 32):
+        if config.policy not in (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_COALESCE):
+            raise ValueError(f"Unknown overflow policy: {config.policy}")
+        super().__init__(config.maxsize)
+        self.name = name
+        self.policy = config.policy
+        self.coalesce = coalesce
+        self.coalesce_window = coalesce_window
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.blocked = 0
+        self.high_watermark = 0
+
+    async def offer(self, item: tuple):
+        """Enqueue item, applying the overflow policy when the stage is full"""
+        if self.full():
+            if self.policy == POLICY_DROP_OLDEST:
+                self.get_nowait()
+                self.dropped += 1
+            elif self.policy == POLICY_COALESCE and self._coalesce_into(item):
+                self.coalesced += 1
+                return
+            else:
+                self.blocked += 1
+
+        await self.put(item)
+        self.enqueued += 1
+        depth = self.qsize()
+        if depth > self.high_watermark:
+            self.high_watermark = depth
+
+    def _coalesce_into(self, item: tuple) -> bool:
+        # self._queue is the deque asyncio.Queue._init creates for subclasses
+        pending = self._queue
+        stop = max(len(pending) - self.coalesce_window, 0)
+        for i in range(len(pending) - 1, stop - 1, -1):
+            merged = self.coalesce(pending[i], item)
+            if merged is not None:
+                pending[i] = merged
+                return True
+        return False
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'depth': self.qsize(),
+            'maxsize': self.maxsize,
+            'high_watermark': self.high_watermark,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'blocked': self.blocked,
+        }
+
+
+class InputPipeline:
+    """asyncio front end: read -> decode -> keymap -> action, each stage bounded"""
+
+    def __init__(self, resolve: Callable[[object, int, int], object],
+                 perform: Callable[[tuple], None],
+                 stage_config: Optional[Dict[str, StageConfig]] = None):
+        """
+        resolve(device, code, value) returns the action for a key event or
+        None to swallow it; perform(item) runs on a worker thread so slow
+        actions never block the event loop that is reading devices.
+        """
+        stage_config = stage_config or {}
+        self.queues = {
+            name: StageQueue(name, stage_config.get(name, StageConfig()))
+            for name in STAGES
+        }
+        self.resolve = resolve
+        self.perform = perform
+
+        # Keyed by path: evdev's InputDevice defines __eq__ but is unhashable
+        self._readers: Dict[str, asyncio.Task] = {}
+        self._workers = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="coldkeys-action")
+        self._stopped = None
+
+    def add_device(self, device):
+        """Start reading a device; requires a running event loop"""
+        if device.path in self._readers:
+            return
+        self._readers[device.path] = asyncio.get_running_loop().create_task(self._read(device))
+        logger.info(f"Pipeline reading {device.name} ({device.path})")
+
+    def remove_device(self, device):
+        task = self._readers.pop(device.path, None)
+        if task is not None:
+            task.cancel()
+            logger.info(f"Pipeline released {device.name} ({device.path})")
+
+    async def run(self, devices=()):
+        """Run until stop() is called"""
+        self._stopped = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._decode()),
+            asyncio.create_task(self._map()),
+            asyncio.create_task(self._act()),
+        ]
+        for device in devices:
+            self.add_device(device)
+
+        try:
+            await self._stopped.wait()
+        finally:
+            for task in list(self._readers.values()) + self._workers:
+                task.cancel()
+            await asyncio.gather(*self._readers.values(), *self._workers, return_exceptions=True)
+            self._readers.clear()
+            self._executor.shutdown(wait=False)
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Queue-depth metrics per stage"""
+        return {name: queue.stats() for name, queue in self.queues.items()}
+
+    async def _read(self, device):
+        decode = self.queues['decode']
+        try:
+            while True:
+                events = await device.async_read()
+                # async_read() hands back a generator: one pass over it
+                read_ns = time.time_ns() if LATENCY.enabled else 0
+                for event in events:
+                    if read_ns:
+                        LATENCY.record(KERNEL_TO_READ, device.path,
+                                       read_ns - (event.sec * 1_000_000_000 + event.usec * 1000))
+                    await decode.offer((device, event.type, event.code, event.value,
+                                        event.timestamp(), None))
+        except asyncio.CancelledError:
+            raise
+        except OSError as e:
+            if e.errno != errno.ENODEV:
+                logger.error(f"Error reading events from {device.path}: {e}")
+            else:
+                logger.warning(f"Device disappeared: {device.path}")
+        self._readers.pop(device.path, None)
+
+    async def _decode(self):
+        source, sink = self.queues['decode'], self.queues['keymap']
+        ev_key = ecodes.EV_KEY
+        debounce = DEBOUNCE.get
+        while True:
+            item = await source.get()
+            etype = item[1]
+            if etype != ev_key and etype != EV_SETTLE:
+                continue
+            device = item[0]
+            debouncer = debounce(device.path)
+            if debouncer is None:
+                if etype == ev_key:
+                    await sink.offer(item)
+                continue
+            stamp_us = round(item[4] * 1e6)
+            if debouncer.pending:
+                # Keys whose window closed go out before anything newer
+                for code, value in debouncer.settle(stamp_us):
+                    await sink.offer((device, ev_key, code, value, item[4], None))
+            if etype == ev_key and debouncer.accept(item[2], item[3], stamp_us):
+                await sink.offer(item)
+            if debouncer.due:
+                # Nothing may follow on this device to flush a held-back
+                # change: queue a settle item for when its window closes
+                for due_us in debouncer.due:
+                    TIMERS.schedule(due_us / 1e6, self._settle, device, due_us)
+                debouncer.due.clear()
+
+    def _settle(self, now: float, device, due_us: int):
+        """Timer: flush a device's settled keys through the decode stage, in order"""
+        asyncio.get_running_loop().create_task(
+            self.queues['decode'].offer((device, EV_SETTLE, 0, 0, due_us / 1e6, None)))
+
+    async def _map(self):
+        source, sink = self.queues['keymap'], self.queues['action']
+        resolve = self.resolve
+        while True:
+            item = await source.get()
+            measure = LATENCY.enabled
+            if measure:
+                start_ns = time.perf_counter_ns()
+            try:
+                action = resolve(item[0], item[2], item[3])
+            except Exception as e:
+                logger.error(f"Keymap failed for code {item[2]}: {e}")
+                continue
+            if measure:
+                LATENCY.record(READ_TO_MAPPED, item[0].path, time.perf_counter_ns() - start_ns)
+            if action is not None:
+                await sink.offer(item[:5] + (action,))
+
+    async def _act(self):
+        source = self.queues['action']
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await source.get()
+            try:
+                await loop.run_in_executor(self._executor, self._perform, item)
+            except Exception as e:
+                logger.error(f"Action failed for code {item[2]}: {e}")
+
+    def _perform(self, item: tuple):
+        """perform(item) on the worker thread, timed from when it starts there"""
+        if not LATENCY.enabled:
+            self.perform(item)
+            return
+        start_ns = time.perf_counter_ns()
+        try:
+            self.perform(item)
+        finally:
+            LATENCY.record(MAPPED_TO_ACTION, action_label(item[5]), time.perf_counter_ns() - start_ns)
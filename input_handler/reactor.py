@@ -0,0 +1,172 @@
+# input_handler/reactor.py
+import errno
+import os
+import select
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from evdev import _input
+from keymap_handler.tap_hold import TAP_HOLD_ENGINE
+from utils.logger import get_logger
+
+logger = get_logger("input_reactor")
+
+# handler(device, events) where events is a tuple of raw
+# (sec, usec, type, code, value) tuples drained from one device
+EventHandler = Callable[[object, tuple], None]
+
+
+class EventReactor:
+    """Single-threaded epoll loop that drains every registered input device"""
+
+    def __init__(self, handler: EventHandler, max_reads_per_wakeup: int = 16, timers=None):
+        self.handler = handler
+        self.max_reads_per_wakeup = max_reads_per_wakeup
+        self.event_count = 0
+        # utils.timer_wheel.TimerWheel fired from this loop, so timer
+        # callbacks run on the same thread as the handler
+        self.timers = timers
+
+        self._epoll = select.epoll()
+        self._devices: Dict[int, object] = {}
+        self._running = False
+        self._lock = threading.Lock()
+
+        # Self-pipe so stop() and runtime add/remove can interrupt a blocking poll
+        self._wake_r, self._wake_w = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+        self._epoll.register(self._wake_r, select.EPOLLIN)
+
+    @property
+    def devices(self) -> List[object]:
+        return list(self._devices.values())
+
+    def add_device(self, device, grab: bool = False) -> bool:
+        """Register a device opened through device_manager.linux.open_device"""
+        if grab:
+            from device_manager.linux import grab_device
+            if not grab_device(device):
+                return False
+
+        fd = device.fd
+        with self._lock:
+            if fd in self._devices:
+                return True
+            self._devices[fd] = device
+            self._epoll.register(fd, select.EPOLLIN)
+
+        logger.info(f"Reactor watching {device.name} ({device.path})")
+        self._wakeup()
+        return True
+
+    def remove_device(self, device, ungrab: bool = False) -> bool:
+        """Stop watching a device; safe to call from any thread"""
+        fd = device.fd
+        with self._lock:
+            if self._devices.pop(fd, None) is None:
+                return False
+            try:
+                self._epoll.unregister(fd)
+            except (OSError, ValueError):
+                # fd already closed (device unplugged)
+                pass
+
+        if ungrab:
+            from device_manager.linux import ungrab_device
+            ungrab_device(device)
+
+        logger.info(f"Reactor released {device.name} ({device.path})")
+        self._wakeup()
+        return True
+
+    def _device_gone(self, device):
+        logger.warning(f"Device disappeared: {device.path}")
+        self.remove_device(device)
+        # Its pending tap/hold decisions must not fire for a device that is gone
+        TAP_HOLD_ENGINE.reset(device.path)
+
+    def poll(self, timeout: Optional[float] = None) -> int:
+        """Wait for readable devices once and drain them; returns events handled"""
+        handled = 0
+        devices = self._devices
+        read_many = _input.device_read_many
+        max_reads = self.max_reads_per_wakeup
+
+        for fd, mask in self._epoll.poll(-1 if timeout is None else timeout):
+            if fd == self._wake_r:
+                self._drain_wakeups()
+                continue
+
+            device = devices.get(fd)
+            if device is None:
+                continue
+
+            # Drain in bulk, but cap reads so one flooding device cannot
+            # starve the others; epoll is level-triggered and will come back
+            for _ in range(max_reads):
+                try:
+                    events = read_many(fd)
+                except BlockingIOError:
+                    break
+                except OSError as e:
+                    if e.errno == errno.ENODEV:
+                        self._device_gone(device)
+                        break
+                    raise
+
+                if not events:
+                    # EOF: the node is gone but the fd reports hang-up, not ENODEV
+                    if mask & (select.EPOLLHUP | select.EPOLLERR):
+                        self._device_gone(device)
+                    break
+                handled += len(events)
+                try:
+                    self.handler(device, events)
+                except Exception as e:
+                    logger.error(f"Handler failed for {device.path}: {e}")
+
+        self.event_count += handled
+        return handled
+
+    def run(self):
+        """Block in the epoll loop until stop() is called"""
+        self._running = True
+        logger.info(f"Reactor started with {len(self._devices)} device(s)")
+        timers = self.timers
+        try:
+            while self._running:
+                if timers is None:
+                    self.poll()
+                    continue
+                self.poll(timers.next_timeout())
+                timers.advance(time.time())
+        except KeyboardInterrupt:
+            logger.info("Stopped input reactor | KeyboardInterrupt received. Exiting.")
+        finally:
+            self._running = False
+
+    def stop(self):
+        self._running = False
+        self._wakeup()
+
+    def close(self):
+        self.stop()
+        for device in self.devices:
+            self.remove_device(device)
+        self._epoll.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def _wakeup(self):
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            # Pipe already full, a wakeup is pending anyway
+            pass
+
+    def _drain_wakeups(self):
+        try:
+            while os.read(self._wake_r, 512):
+                pass
+        except BlockingIOError:
+            pass
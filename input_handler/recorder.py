@@ -0,0 +1,280 @@
+# input_handler/recorder.py
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from evdev import ecodes
+from evdev.device import DeviceInfo
+from utils.logger import get_logger
+
+logger = get_logger("input_recorder")
+
+MAGIC = b"CKREC\x00"
+VERSION = 2
+TRAILER_MAGIC = b"CKDEV\x00"
+
+# File layout (little endian):
+#   magic, u16 version, u16 device count
+#   per device: u16 id, 4 x u16 info, 4 x (u16 length + utf-8) name/path/phys/uniq,
+#               u16 type count, per type: u16 type, u16 code count, u16 codes...
+#   records: u16 device id, i64 timestamp (us), u16 type, u16 code, i32 value
+#   version 2 trailer, written on close: entries of devices first seen after
+#   the header, as above, then u32 entries size, u16 device count, trailer magic
+HEADER = struct.Struct("<6sHH")
+DEVICE_INFO = struct.Struct("<HHHHH")
+U16 = struct.Struct("<H")
+RECORD = struct.Struct("<HqHHi")
+TRAILER = struct.Struct("<IH6s")
+
+FLUSH_BYTES = 64 * 1024
+
+
+@dataclass
+class RecordedDevice:
+    """Identity and capabilities of a device as captured in a recording"""
+    device_id: int
+    name: str
+    path: str
+    phys: str
+    uniq: str
+    info: DeviceInfo
+    capabilities: Dict[int, List[int]] = field(default_factory=dict)
+
+
+def _pack_str(value: str) -> bytes:
+    data = (value or "").encode("utf-8")
+    return U16.pack(len(data)) + data
+
+def _unpack_str(data: bytes, offset: int) -> Tuple[str, int]:
+    (length,) = U16.unpack_from(data, offset)
+    offset += U16.size
+    return data[offset:offset + length].decode("utf-8"), offset + length
+
+def _plain_capabilities(device) -> Dict[int, List[int]]:
+    caps = {}
+    for etype, codes in device.capabilities(absinfo=False).items():
+        caps[etype] = [code[0] if isinstance(code, tuple) else code for code in codes]
+    return caps
+
+def _pack_device(device_id: int, device) -> bytes:
+    info = device.info
+    entry = [DEVICE_INFO.pack(device_id, info.bustype, info.vendor, info.product, info.version)]
+    for text in (device.name, device.path, device.phys, device.uniq):
+        entry.append(_pack_str(text))
+    caps = _plain_capabilities(device)
+    entry.append(U16.pack(len(caps)))
+    for etype, codes in sorted(caps.items()):
+        entry.append(U16.pack(etype) + U16.pack(len(codes)))
+        entry.append(struct.pack(f"<{len(codes)}H", *codes))
+    return b"".join(entry)
+
+def _unpack_device(data: bytes, offset: int) -> Tuple[RecordedDevice, int]:
+    device_id, bustype, vendor, product, version = DEVICE_INFO.unpack_from(data, offset)
+    offset += DEVICE_INFO.size
+    name, offset = _unpack_str(data, offset)
+    dev_path, offset = _unpack_str(data, offset)
+    phys, offset = _unpack_str(data, offset)
+    uniq, offset = _unpack_str(data, offset)
+    (type_count,) = U16.unpack_from(data, offset)
+    offset += U16.size
+    caps = {}
+    for _ in range(type_count):
+        etype, code_count = struct.unpack_from("<HH", data, offset)
+        offset += 4
+        caps[etype] = list(struct.unpack_from(f"<{code_count}H", data, offset))
+        offset += 2 * code_count
+    recorded = RecordedDevice(device_id, name, dev_path, phys, uniq,
+                              DeviceInfo(bustype, vendor, product, version), caps)
+    return recorded, offset
+
+
+class EventRecorder:
+    """
+    Captures raw (sec, usec, type, code, value) reads of grabbed devices to a
+    file. Devices first seen after it was created (hotplug) get the next id
+    and go in the trailer written on close.
+    """
+
+    def __init__(self, path: str, devices):
+        self.path = path
+        self.event_count = 0
+        self._ids: Dict[str, int] = {}
+        self._late: List[bytes] = []
+        self._buffer = bytearray()
+        self._file = open(path, "wb")
+
+        header = [HEADER.pack(MAGIC, VERSION, len(devices))]
+        for device_id, device in enumerate(devices):
+            self._ids[device.path] = device_id
+            header.append(_pack_device(device_id, device))
+        self._file.write(b"".join(header))
+        logger.info(f"Recording {len(devices)} device(s) to {path}")
+
+    def _add_device(self, device) -> int:
+        device_id = self._ids[device.path] = len(self._ids)
+        self._late.append(_pack_device(device_id, device))
+        logger.info(f"Recording {device.name} ({device.path}) as device {device_id}")
+        return device_id
+
+    def record(self, device, events):
+        device_id = self._ids.get(device.path)
+        if device_id is None:
+            device_id = self._add_device(device)
+        pack = RECORD.pack
+        self._buffer += b"".join(
+            [pack(device_id, sec * 1_000_000 + usec, etype, code, value)
+             for sec, usec, etype, code, value in events]
+        )
+        self.event_count += len(events)
+        if len(self._buffer) >= FLUSH_BYTES:
+            self.flush()
+
+    def wrap(self, handler: Callable) -> Callable:
+        """Reactor handler that records each read before passing it on"""
+        def recording_handler(device, events):
+            self.record(device, events)
+            handler(device, events)
+        return recording_handler
+
+    def flush(self):
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._buffer.clear()
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            entries = b"".join(self._late)
+            self._buffer += entries + TRAILER.pack(len(entries), len(self._late), TRAILER_MAGIC)
+            self.flush()
+            self._file.close()
+            logger.info(f"Recorded {self.event_count} events to {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recording:
+    """A loaded recording: device headers plus the packed record stream"""
+
+    def __init__(self, devices: List[RecordedDevice], records: bytes):
+        self.devices = devices
+        self.records = records
+
+    def __len__(self) -> int:
+        return len(self.records) // RECORD.size
+
+    @classmethod
+    def load(cls, path: str) -> "Recording":
+        with open(path, "rb") as f:
+            data = f.read()
+
+        magic, version, device_count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a ColdKeys recording")
+        if version not in (1, VERSION):
+            raise ValueError(f"Unsupported recording version {version} in {path}")
+
+        offset = HEADER.size
+        devices = []
+        for _ in range(device_count):
+            recorded, offset = _unpack_device(data, offset)
+            devices.append(recorded)
+
+        end = len(data)
+        if version >= 2:
+            if data.endswith(TRAILER_MAGIC) and end - offset >= TRAILER.size:
+                size, late_count, _ = TRAILER.unpack_from(data, end - TRAILER.size)
+                end -= TRAILER.size + size
+                late = end
+                for _ in range(late_count):
+                    recorded, late = _unpack_device(data, late)
+                    devices.append(recorded)
+            else:
+                logger.warning(f"No device trailer in {path}: recording was not closed, "
+                               f"devices that appeared during it cannot be replayed")
+
+        records = data[offset:end]
+        usable = len(records) - len(records) % RECORD.size
+        if usable != len(records):
+            logger.warning(f"Ignoring truncated trailing record in {path}")
+        return cls(devices, records[:usable])
+
+    def iter_records(self) -> Iterator[tuple]:
+        """(device id, timestamp us, type, code, value) in recorded order"""
+        return RECORD.iter_unpack(self.records)
+
+    def iter_frames(self) -> Iterator[Tuple[int, int, List[tuple]]]:
+        """
+        (device id, SYN timestamp us, raw events) per device frame, in the
+        order each frame completed. Raw events end with their SYN_REPORT.
+        """
+        pending: Dict[int, list] = {}
+        ev_syn, syn_report = ecodes.EV_SYN, ecodes.SYN_REPORT
+        for device_id, timestamp, etype, code, value in self.iter_records():
+            events = pending.setdefault(device_id, [])
+            events.append((timestamp // 1_000_000, timestamp % 1_000_000, etype, code, value))
+            if etype == ev_syn and code == syn_report:
+                yield device_id, timestamp, events
+                pending[device_id] = []
+
+
+def replay(recording: Recording, sink: Callable, speed: float = 1.0,
+           devices: Optional[Dict[int, object]] = None) -> Dict[str, float]:
+    """
+    Feed a recording's frames to sink(device, raw_events), as the reactor would.
+
+    speed=1.0 replays at the original pace, N > 1 is N times faster and
+    speed=0 goes as fast as possible. Timestamps are rebased onto the replay
+    start but keep their recorded spacing (scaled by speed when paced), so
+    time-dependent logic behaves as it did when recording.
+    """
+    backend = None
+    if devices is None:
+        from device_manager.fake import FakeBackend
+        backend = FakeBackend()
+        devices = {
+            recorded.device_id: backend.add_device(recorded.name, recorded.capabilities, phys=recorded.phys,
+                                                   uniq=recorded.uniq, info=recorded.info, path=recorded.path)
+            for recorded in recording.devices
+        }
+
+    try:
+        scale = speed if speed > 0 else 1.0
+        first = None
+        frames = events = 0
+        start_wall = time.time()
+        start = time.perf_counter()
+
+        for device_id, timestamp, raw in recording.iter_frames():
+            if first is None:
+                first = timestamp
+            offset = (timestamp - first) / 1_000_000 / scale
+            if speed > 0:
+                delay = offset - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            device = devices.get(device_id)
+            if device is None:
+                # Appeared during an unclosed recording: no trailer entry
+                continue
+            rebased = start_wall + offset
+            sec = int(rebased)
+            usec = int((rebased - sec) * 1_000_000)
+            sink(device, tuple((sec, usec, etype, code, value) for _, _, etype, code, value in raw))
+            frames += 1
+            events += len(raw)
+
+        elapsed = time.perf_counter() - start
+    finally:
+        if backend is not None:
+            # Each fake device owns a pipe
+            backend.close()
+
+    logger.info(f"Replayed {events} events in {frames} frames in {elapsed:.3f}s (speed={speed:g})")
+    return {'frames': frames, 'events': events, 'seconds': elapsed}
@@ -0,0 +1,252 @@
+# keymap_handler/chords.py
+import re
+import threading
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from evdev import ecodes
+from input_handler.key_state import (KEY_SLOTS, MOD_LEFTALT, MOD_LEFTCTRL, MOD_LEFTMETA, MOD_LEFTSHIFT,
+                                     MODIFIER_BITS, either_side)
+from keymap_handler.core import KEY_DOWN, KEY_UP, SWALLOW, KeyHandler, resolve_key_code
+from utils.logger import get_logger
+
+logger = get_logger("keymap_chords")
+
+# A chord is (modifier mask, key code) with the mask folded by either_side();
+# the trie is keyed by both packed into one int
+KEY_BITS = 10  # KEY_MAX is 0x2ff
+SEQUENCE_TIMEOUT = 1.0
+
+# Modifier names as the mapper stores them ("Ctrl", "Alt", ...)
+MODIFIER_NAMES = {
+    'ctrl': MOD_LEFTCTRL, 'control': MOD_LEFTCTRL,
+    'shift': MOD_LEFTSHIFT,
+    'alt': MOD_LEFTALT, 'option': MOD_LEFTALT,
+    'meta': MOD_LEFTMETA, 'super': MOD_LEFTMETA, 'win': MOD_LEFTMETA, 'cmd': MOD_LEFTMETA,
+}
+
+# Browser KeyboardEvent.key names the mapper records, beyond letters, digits and F-keys
+KEY_ALIASES = {
+    'arrowup': ecodes.KEY_UP, 'arrowdown': ecodes.KEY_DOWN,
+    'arrowleft': ecodes.KEY_LEFT, 'arrowright': ecodes.KEY_RIGHT,
+    'enter': ecodes.KEY_ENTER, 'return': ecodes.KEY_ENTER,
+    'escape': ecodes.KEY_ESC, 'esc': ecodes.KEY_ESC,
+    'space': ecodes.KEY_SPACE, ' ': ecodes.KEY_SPACE,
+    'tab': ecodes.KEY_TAB, 'backspace': ecodes.KEY_BACKSPACE,
+    'delete': ecodes.KEY_DELETE, 'del': ecodes.KEY_DELETE, 'insert': ecodes.KEY_INSERT,
+    'home': ecodes.KEY_HOME, 'end': ecodes.KEY_END,
+    'pageup': ecodes.KEY_PAGEUP, 'pagedown': ecodes.KEY_PAGEDOWN,
+    'capslock': ecodes.KEY_CAPSLOCK, 'printscreen': ecodes.KEY_SYSRQ,
+    '-': ecodes.KEY_MINUS, '=': ecodes.KEY_EQUAL, '[': ecodes.KEY_LEFTBRACE, ']': ecodes.KEY_RIGHTBRACE,
+    '\\': ecodes.KEY_BACKSLASH, ';': ecodes.KEY_SEMICOLON, "'": ecodes.KEY_APOSTROPHE,
+    '`': ecodes.KEY_GRAVE, ',': ecodes.KEY_COMMA, '.': ecodes.KEY_DOT, '/': ecodes.KEY_SLASH,
+    # The main row's '+' is Shift+'='; keypad plus is the key that types it alone
+    '+': ecodes.KEY_KPPLUS,
+}
+
+Chord = Tuple[int, int]
+ChordSpec = Union[str, Sequence[Chord]]
+
+# One key name and the delimiter after it. A "+" or "," where a key name
+# is expected is the name, looked up in KEY_ALIASES: "Ctrl+," and "Ctrl++"
+CHORD_TOKEN = re.compile(r"\s*([^+,\s](?:[^+,]*[^+,\s])?|[+,])\s*([+,]|\Z)")
+
+def parse_key_name(name: str) -> int:
+    """'K', 'ArrowUp', 'F13' or an ecodes name such as 'KEY_K' -> key code"""
+    alias = KEY_ALIASES.get(name.lower()) if len(name) > 1 else KEY_ALIASES.get(name)
+    if alias is not None:
+        return alias
+    if len(name) == 1 and name.isalnum():
+        return resolve_key_code(f"KEY_{name.upper()}")
+    if re.fullmatch(r"[Ff]\d{1,2}", name):
+        return resolve_key_code(f"KEY_F{name[1:]}")
+    return resolve_key_code(name)
+
+def modifier_mask(names) -> int:
+    mask = 0
+    for name in names:
+        bit = MODIFIER_NAMES.get(name.strip().lower())
+        if bit is None:
+            raise ValueError(f"Unknown modifier: {name}")
+        mask |= bit
+    return mask
+
+def _split_sequence(text: str) -> List[List[str]]:
+    """'Ctrl+K, Ctrl+,' -> [['Ctrl', 'K'], ['Ctrl', ',']]"""
+    chords, names, pos = [], [], 0
+    while pos < len(text):
+        match = CHORD_TOKEN.match(text, pos)
+        if match is None:
+            raise ValueError(f"Invalid key sequence: {text!r}")
+        names.append(match[1])
+        if match[2] != "+":
+            chords.append(names)
+            names = []
+        pos = match.end()
+    if names:
+        raise ValueError(f"Key sequence ends in '+': {text!r}")
+    return chords
+
+def _chord(names: List[str]) -> Chord:
+    *modifiers, key = names
+    return modifier_mask(modifiers), parse_key_name(key)
+
+def parse_chord(text: str) -> Chord:
+    """'Ctrl+Alt+M' -> (modifier mask, key code)"""
+    chords = _split_sequence(text)
+    if len(chords) != 1:
+        raise ValueError(f"Expected a single chord: {text!r}")
+    return _chord(chords[0])
+
+def parse_sequence(spec: ChordSpec) -> Tuple[Chord, ...]:
+    """'Ctrl+K, Ctrl+C' or [(mask, code), ...] -> tuple of chords"""
+    if isinstance(spec, str):
+        return tuple(_chord(names) for names in _split_sequence(spec))
+    return tuple((either_side(mask), int(code)) for mask, code in spec)
+
+def describe_chord(chord: Chord) -> str:
+    mask, code = chord
+    names = [name.capitalize() for name, bit in (('ctrl', MOD_LEFTCTRL), ('alt', MOD_LEFTALT),
+                                                 ('shift', MOD_LEFTSHIFT), ('meta', MOD_LEFTMETA)) if mask & bit]
+    key = ecodes.KEY.get(code, f"KEY_{code}")
+    key = key[0] if isinstance(key, list) else key
+    return "+".join(names + [key[4:] if key.startswith("KEY_") else key])
+
+
+class ChordNode:
+    """Trie node: the next chords of a sequence, or the action it ends in"""
+
+    __slots__ = ('children', 'action', 'sequence')
+
+    def __init__(self, sequence: Tuple[Chord, ...] = ()):
+        self.children: Dict[int, ChordNode] = {}
+        self.action: Optional[KeyHandler] = None
+        self.sequence = sequence
+
+
+class ChordTable:
+    """Compiled chord bindings; immutable once built, shared by every device"""
+
+    __slots__ = ('name', 'root', 'timeout', 'count')
+
+    def __init__(self, name: str, root: ChordNode, timeout: float, count: int):
+        self.name = name
+        self.root = root
+        self.timeout = timeout
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+
+def compile_chords(bindings: Mapping[ChordSpec, KeyHandler], timeout: float = SEQUENCE_TIMEOUT,
+                   name: str = "chords") -> ChordTable:
+    """
+    Compile {"Ctrl+Alt+M": handler, "Ctrl+K, Ctrl+C": handler, ...} into a
+    trie. A binding may not also be the start of a longer sequence: that
+    would need a timeout to tell them apart.
+    """
+    root = ChordNode()
+    for spec, action in bindings.items():
+        sequence = parse_sequence(spec)
+        if not sequence:
+            raise ValueError(f"Empty chord: {spec!r}")
+        if not callable(action):
+            raise TypeError(f"Invalid action for chord {spec!r}: {action!r}")
+        node = root
+        for depth, (mask, code) in enumerate(sequence):
+            if MODIFIER_BITS[code]:
+                raise ValueError(f"Chord {spec!r} uses a modifier as its key")
+            if node.action is not None:
+                raise ValueError(f"Chord {spec!r} extends the bound chord {_describe(node.sequence)}")
+            node = node.children.setdefault(mask << KEY_BITS | code, ChordNode(sequence[:depth + 1]))
+        if node.children:
+            raise ValueError(f"Chord {spec!r} is also the start of a longer sequence")
+        if node.action is not None:
+            raise ValueError(f"Chord {spec!r} is bound twice")
+        node.action = action
+
+    table = ChordTable(name, root, timeout, len(bindings))
+    logger.debug(f"Compiled {len(bindings)} chords into '{name}'")
+    return table
+
+def _describe(sequence) -> str:
+    return ", ".join(map(describe_chord, sequence))
+
+
+class ChordMatcher:
+    """
+    Sequence progress on one device. feed() is a dict probe per key down;
+    keys that took part in a chord have their hold and release swallowed.
+    """
+
+    __slots__ = ('table', 'node', 'deadline', 'consumed')
+
+    def __init__(self):
+        self.table: Optional[ChordTable] = None
+        self.node: Optional[ChordNode] = None
+        self.deadline = 0.0
+        self.consumed = bytearray(KEY_SLOTS)
+
+    def feed(self, table: ChordTable, code: int, value: int, modifiers: int, now: float):
+        """
+        The chord's action when a binding completes, SWALLOW while a sequence
+        is under way (or for the hold/release of a consumed key), None if the
+        key has nothing to do with any chord
+        """
+        if value != KEY_DOWN:
+            if self.consumed[code]:
+                if value == KEY_UP:
+                    self.consumed[code] = 0
+                return SWALLOW
+            return None
+        if MODIFIER_BITS[code]:
+            # Modifiers only shape chords, they never break a sequence
+            return None
+
+        root = table.root
+        node = self.node
+        if node is None or self.table is not table or now > self.deadline:
+            node = root
+        key = either_side(modifiers) << KEY_BITS | code
+        step = node.children.get(key)
+        if step is None and node is not root:
+            # Sequence broken; the key may still start another one
+            step = root.children.get(key)
+
+        if step is None:
+            self.node = None
+            return None
+        self.consumed[code] = 1
+        if step.action is not None:
+            self.node = None
+            return step.action
+        self.table = table
+        self.node = step
+        self.deadline = now + table.timeout
+        return SWALLOW
+
+    def reset(self):
+        self.node = None
+
+
+class ChordMatcherRegistry:
+    """Per-device ChordMatcher keyed by device path"""
+
+    def __init__(self):
+        self._matchers: Dict[str, ChordMatcher] = {}
+        self._lock = threading.Lock()
+
+    def for_device(self, path: str) -> ChordMatcher:
+        matcher = self._matchers.get(path)
+        if matcher is None:
+            with self._lock:
+                matcher = self._matchers.setdefault(path, ChordMatcher())
+        return matcher
+
+    def forget(self, path: str):
+        with self._lock:
+            self._matchers.pop(path, None)
+
+
+# Chord sequence progress of every device read through input_handler
+CHORD_MATCHERS = ChordMatcherRegistry()
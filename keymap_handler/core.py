@@ -0,0 +1,143 @@
+# keymap_handler/core.py
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Mapping, Optional, Union
+
+from evdev import ecodes
+from utils.logger import get_logger
+
+logger = get_logger("keymap_handler")
+
+KEY_UP, KEY_DOWN, KEY_HOLD = 0, 1, 2
+KEY_VALUES = 3
+TABLE_SIZE = (ecodes.KEY_MAX + 1) * KEY_VALUES
+
+
+class _Sentinel:
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return self.name
+
+    def __reduce__(self):
+        # Keep identity across pickling so compiled tables can be cached
+        return self.name
+
+
+PASSTHROUGH = _Sentinel("PASSTHROUGH")  # not mapped: hand the event back to the OS
+SWALLOW = _Sentinel("SWALLOW")          # mapped but nothing to run for this value
+
+# handler(device, code, value)
+KeyHandler = Callable[[object, int, int], None]
+BindingSpec = Union[KeyHandler, _Sentinel, Mapping[int, Union[KeyHandler, _Sentinel]]]
+
+
+@dataclass(frozen=True)
+class KeymapTable:
+    """
+    Immutable keycode-indexed dispatch table; slot = code * 3 + value.
+    chords (a keymap_handler.chords.ChordTable) are matched before the slots;
+    keys with a tap_hold entry (keymap_handler.tap_hold) bypass the slots.
+    With layers (a keymap_handler.layers.LayerStack) the slots are layer 0's
+    and keys resolve through the device's active layers.
+    """
+    name: str
+    slots: tuple
+    mapped: FrozenSet[int]
+    chords: Optional[object] = None
+    tap_hold: Optional[tuple] = None
+    layers: Optional[object] = None
+
+    def lookup(self, code: int, value: int):
+        return self.slots[code * KEY_VALUES + value]
+
+
+def resolve_key_code(key: Union[int, str]) -> int:
+    """Accept raw codes or ecodes names such as 'KEY_F1'"""
+    if isinstance(key, str):
+        code = ecodes.ecodes.get(key)
+        if code is None:
+            raise ValueError(f"Unknown key name: {key}")
+        return code
+    return int(key)
+
+
+def compile_keymap(bindings: Mapping[Union[int, str], BindingSpec], name: str = "default",
+                   chords=None, tap_hold=None) -> KeymapTable:
+    """
+    Compile bindings into a flat table. A binding is a handler (fires on key
+    down, up/hold are swallowed), SWALLOW, or a {value: handler} dict.
+    chords is a compiled ChordTable to match ahead of the table, tap_hold
+    the output of compile_tap_hold().
+    """
+    slots = [PASSTHROUGH] * TABLE_SIZE
+    mapped = set()
+
+    for key, spec in bindings.items():
+        code = resolve_key_code(key)
+        if not 0 <= code <= ecodes.KEY_MAX:
+            raise ValueError(f"Key code out of range: {code}")
+
+        if isinstance(spec, Mapping):
+            per_value = {KEY_UP: SWALLOW, KEY_DOWN: SWALLOW, KEY_HOLD: SWALLOW}
+            for value, handler in spec.items():
+                if value not in per_value:
+                    raise ValueError(f"Unknown key value {value} for code {code}")
+                per_value[value] = handler
+        elif spec is SWALLOW or spec is PASSTHROUGH:
+            per_value = {KEY_UP: spec, KEY_DOWN: spec, KEY_HOLD: spec}
+        elif callable(spec):
+            per_value = {KEY_UP: SWALLOW, KEY_DOWN: spec, KEY_HOLD: SWALLOW}
+        else:
+            raise TypeError(f"Invalid binding for code {code}: {spec!r}")
+
+        base = code * KEY_VALUES
+        for value, handler in per_value.items():
+            slots[base + value] = handler
+        if any(handler is not PASSTHROUGH for handler in per_value.values()):
+            mapped.add(code)
+
+    if tap_hold is not None:
+        mapped.update(code for code, binding in enumerate(tap_hold) if binding is not None)
+    table = KeymapTable(name=name, slots=tuple(slots), mapped=frozenset(mapped), chords=chords, tap_hold=tap_hold)
+    logger.debug(f"Compiled keymap '{name}' with {len(mapped)} mapped keys")
+    return table
+
+
+EMPTY_KEYMAP = compile_keymap({}, name="empty")
+
+
+class Keymap:
+    """
+    Live holder for a device's compiled table. Readers fetch .table once per
+    frame; swap() rebinds it, which is atomic, so remapping never locks.
+    """
+
+    __slots__ = ('table',)
+
+    def __init__(self, table: KeymapTable = EMPTY_KEYMAP):
+        self.table = table
+
+    def swap(self, table: KeymapTable) -> KeymapTable:
+        previous, self.table = self.table, table
+        logger.info(f"Keymap switched: '{previous.name}' -> '{table.name}'")
+        return previous
+
+
+class KeymapRegistry:
+    """Per-device Keymap holders keyed by device path"""
+
+    def __init__(self, default: KeymapTable = EMPTY_KEYMAP):
+        self.default = default
+        self._keymaps: Dict[str, Keymap] = {}
+
+    def for_device(self, path: str) -> Keymap:
+        keymap = self._keymaps.get(path)
+        if keymap is None:
+            keymap = self._keymaps.setdefault(path, Keymap(self.default))
+        return keymap
+
+    def install(self, path: str, table: KeymapTable) -> KeymapTable:
+        return self.for_device(path).swap(table)
@@ -0,0 +1,235 @@
+# keymap_handler/layers.py
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from evdev import ecodes
+from keymap_handler.core import (KEY_DOWN, KEY_HOLD, KEY_UP, KEY_VALUES, PASSTHROUGH, SWALLOW, TABLE_SIZE,
+                                 KeymapTable, compile_keymap)
+from utils.logger import get_logger
+
+logger = get_logger("keymap_layers")
+
+# Active layers are bits of one int, as in QMK's layer_state
+MAX_LAYERS = 32
+
+# Layer switch kinds, after QMK's MO / TG / OSL / DF keycodes
+MOMENTARY, TOGGLE, ONE_SHOT, DEFAULT = "momentary", "toggle", "one_shot", "default"
+
+LayerRef = Union[int, str]
+
+
+@dataclass(frozen=True)
+class LayerAction:
+    """A key binding that switches layers instead of running a handler"""
+    kind: str
+    layer: LayerRef
+
+def momentary(layer: LayerRef) -> LayerAction:
+    """Layer on while the key is held (MO)"""
+    return LayerAction(MOMENTARY, layer)
+
+def toggle(layer: LayerRef) -> LayerAction:
+    """Layer on/off on each press (TG)"""
+    return LayerAction(TOGGLE, layer)
+
+def one_shot(layer: LayerRef) -> LayerAction:
+    """Layer on for the next key press only (OSL)"""
+    return LayerAction(ONE_SHOT, layer)
+
+def default_layer(layer: LayerRef) -> LayerAction:
+    """Make the layer the base everything else falls through to (DF)"""
+    return LayerAction(DEFAULT, layer)
+
+
+class LayerStack:
+    """
+    Compiled layers: one flat slot table per layer plus, per slot, the mask
+    of layers that bind it. Unbound (PASSTHROUGH) slots are transparent, so
+    resolving a slot under an active-layer mask is one AND: the highest set
+    bit of mask & owners[slot] is the layer that answers. Immutable.
+    """
+
+    __slots__ = ('names', 'tables', 'owners')
+
+    def __init__(self, names: Tuple[str, ...], tables: Tuple[tuple, ...], owners: tuple):
+        self.names = names
+        self.tables = tables
+        self.owners = owners
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def index(self, layer: LayerRef) -> int:
+        if isinstance(layer, str):
+            if layer not in self.names:
+                raise ValueError(f"Unknown layer: {layer}")
+            return self.names.index(layer)
+        if not 0 <= layer < len(self.tables):
+            raise ValueError(f"Layer out of range: {layer}")
+        return layer
+
+
+def compile_layers(layers: Union[Sequence[Mapping], Mapping[str, Mapping]], name: str = "layers",
+                   chords=None, tap_hold=None) -> KeymapTable:
+    """
+    Compile a bottom-to-top list of binding dicts (or {layer name: bindings},
+    in order) into a KeymapTable carrying a LayerStack. Bindings are as for
+    compile_keymap, plus LayerActions from momentary()/toggle()/one_shot()/
+    default_layer(). The table's own slots are layer 0's.
+    """
+    if isinstance(layers, Mapping):
+        names, specs = tuple(layers), list(layers.values())
+    else:
+        specs = list(layers)
+        names = tuple(f"layer{index}" for index in range(len(specs)))
+    if not specs:
+        raise ValueError("A layer stack needs at least one layer")
+    if len(specs) > MAX_LAYERS:
+        raise ValueError(f"At most {MAX_LAYERS} layers, got {len(specs)}")
+
+    tables = []
+    mapped = set()
+    owners = [0] * TABLE_SIZE
+    for index, bindings in enumerate(specs):
+        table = compile_keymap(_layer_bindings(bindings, names), name=f"{name}/{names[index]}")
+        bit = 1 << index
+        for slot, handler in enumerate(table.slots):
+            if handler is not PASSTHROUGH:
+                owners[slot] |= bit
+        tables.append(table.slots)
+        mapped |= table.mapped
+
+    stack = LayerStack(names, tuple(tables), tuple(owners))
+    if tap_hold is not None:
+        mapped.update(code for code, binding in enumerate(tap_hold) if binding is not None)
+    logger.debug(f"Compiled {len(tables)} layers into '{name}' with {len(mapped)} mapped keys")
+    return KeymapTable(name=name, slots=tables[0], mapped=frozenset(mapped), chords=chords,
+                       tap_hold=tap_hold, layers=stack)
+
+def _layer_bindings(bindings: Mapping, names: Tuple[str, ...]) -> Dict:
+    """Layer switches take the key's down and up, with their layer resolved to its index"""
+    resolved = {}
+    for key, spec in bindings.items():
+        if isinstance(spec, LayerAction):
+            layer = spec.layer
+            if isinstance(layer, str):
+                if layer not in names:
+                    raise ValueError(f"Binding for {key!r} switches to unknown layer {layer!r}")
+                layer = names.index(layer)
+            elif not 0 <= layer < len(names):
+                raise ValueError(f"Binding for {key!r} switches to missing layer {layer}")
+            spec = LayerAction(spec.kind, layer)
+            spec = {KEY_DOWN: spec, KEY_UP: spec, KEY_HOLD: SWALLOW}
+        resolved[key] = spec
+    return resolved
+
+
+class LayerState:
+    """
+    Active layers of one device. mask holds the default layer's bit OR'd with
+    every momentary/toggled/one-shot layer; switching layers rebinds it, an
+    atomic int swap, so nothing is recompiled and readers never lock.
+    A key's release (and autorepeat) resolves on the layer its press did.
+    """
+
+    __slots__ = ('stack', 'mask', 'default', 'layers', 'one_shot', 'source')
+
+    def __init__(self, stack: Optional[LayerStack] = None):
+        self.stack = stack
+        self.default = 1
+        self.layers = 0
+        self.one_shot = 0
+        self.mask = 1
+        # Layer index + 1 each held key was pressed on (0: not held)
+        self.source = bytearray(ecodes.KEY_MAX + 1)
+
+    def resolve(self, stack: LayerStack, code: int, value: int):
+        """The handler for a key event; layer switches are applied here and come back SWALLOW"""
+        if stack is not self.stack:
+            # The device's keymap changed: start over on its base layer
+            self.reset(stack)
+        slot = code * KEY_VALUES + value
+        if value == KEY_DOWN:
+            layer = (self.mask & stack.owners[slot]).bit_length() - 1
+            self.source[code] = layer + 1
+        else:
+            layer = self.source[code] - 1
+            if layer < 0:
+                layer = (self.mask & stack.owners[slot]).bit_length() - 1
+            if value == KEY_UP:
+                self.source[code] = 0
+        if layer < 0:
+            handler = PASSTHROUGH
+        else:
+            handler = stack.tables[layer][slot]
+            if type(handler) is LayerAction:
+                self._switch(handler, value)
+                return SWALLOW
+        if self.one_shot and value == KEY_DOWN:
+            # The one key the one-shot layer was waiting for, bound or not
+            self.layers &= ~self.one_shot
+            self.one_shot = 0
+            self.mask = self.default | self.layers
+        return handler
+
+    def _switch(self, action: LayerAction, value: int):
+        bit = 1 << action.layer
+        kind = action.kind
+        if kind == MOMENTARY:
+            self.layers = self.layers | bit if value == KEY_DOWN else self.layers & ~bit
+        elif value != KEY_DOWN:
+            return
+        elif kind == TOGGLE:
+            self.layers ^= bit
+        elif kind == ONE_SHOT:
+            self.one_shot |= bit
+            self.layers |= bit
+        elif kind == DEFAULT:
+            self.default = bit
+        self.mask = self.default | self.layers
+
+    def set_layers(self, *layers: LayerRef):
+        """Replace the momentary/toggled layers at once (e.g. from the GUI)"""
+        mask = 0
+        for layer in layers:
+            mask |= 1 << self.stack.index(layer)
+        self.layers = mask
+        self.one_shot = 0
+        self.mask = self.default | mask
+
+    def active(self) -> List[str]:
+        """Active layer names, bottom first"""
+        if self.stack is None:
+            return []
+        return [name for index, name in enumerate(self.stack.names) if self.mask >> index & 1]
+
+    def reset(self, stack: Optional[LayerStack] = None):
+        self.stack = stack
+        self.default = 1
+        self.layers = self.one_shot = 0
+        self.mask = 1
+        self.source = bytearray(ecodes.KEY_MAX + 1)
+
+
+class LayerStateRegistry:
+    """Per-device LayerState keyed by device path"""
+
+    def __init__(self):
+        self._states: Dict[str, LayerState] = {}
+        self._lock = threading.Lock()
+
+    def for_device(self, path: str) -> LayerState:
+        state = self._states.get(path)
+        if state is None:
+            with self._lock:
+                state = self._states.setdefault(path, LayerState())
+        return state
+
+    def forget(self, path: str):
+        with self._lock:
+            self._states.pop(path, None)
+
+
+# Layer state of every device read through input_handler
+LAYER_STATES = LayerStateRegistry()
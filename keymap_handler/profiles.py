@@ -0,0 +1,372 @@
+# keymap_handler/profiles.py
+import hashlib
+import json
+import os
+import stat
+import struct
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from action_performer import actions
+from action_performer.actions import MEDIA_KEYS, VOLUME_KEYS, KeyTapAction, LaunchAction
+from input_handler.key_state import MODIFIER_KEYS
+from keymap_handler import chords as chords_module, core as core_module
+from keymap_handler.chords import compile_chords, modifier_mask, parse_key_name, parse_sequence
+from keymap_handler.core import EMPTY_KEYMAP, Keymap, KeymapTable, compile_keymap
+from utils.logger import get_logger
+
+logger = get_logger("keymap_profiles")
+
+# The mapper's shortcut action types
+ACTION_TYPES = ("launch", "hotkey", "volume", "media", "script")
+
+# Binary cache: header, then the validated profile as JSON plain data,
+# {"actions": [[actionType, argv or key taps], ...], "shortcuts": [[id, code,
+# modifiers, deviceId, action index], ...]}; each distinct action is rebuilt
+# once and the tables compiled on load, nothing is unpickled
+#   6s magic, u16 version, 8s code digest, i64 source mtime (ns), i64 source size, 32s source sha256
+CACHE_MAGIC = b"CKPROF"
+CACHE_VERSION = 2
+CACHE_HEADER = struct.Struct("<6sH8sqq32s")
+CACHE_SUFFIX = ".ckprof"
+
+def _code_digest() -> bytes:
+    """
+    Caches written by other versions of the parser, the key name / chord
+    parsing, the table compiler or the actions are stale
+    """
+    digest = hashlib.sha256()
+    for path in (__file__, chords_module.__file__, core_module.__file__, actions.__file__):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.digest()[:8]
+
+CACHE_CODE = _code_digest()
+
+# Modifier bit -> the key a hotkey presses for it
+MODIFIER_CODES = {bit: code for code, bit in MODIFIER_KEYS.items()}
+
+def default_profile_dir() -> str:
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "profiles")
+
+def default_cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "coldkeys", "profiles")
+
+
+class ProfileError(ValueError):
+    """A profile file that does not parse or validate"""
+
+
+@dataclass(frozen=True)
+class Shortcut:
+    """One validated mapper shortcut: trigger key and modifier mask, target device, action"""
+    id: str
+    code: int
+    modifiers: int
+    device_id: Optional[str]
+    action_type: str
+    action: object
+
+
+@dataclass(frozen=True)
+class CompiledProfile:
+    """
+    A profile's dispatch tables keyed by mapper deviceId (the device node's
+    basename, e.g. "event9"); None holds the shortcuts without a deviceId,
+    which every device's table includes too
+    """
+    name: str
+    tables: Dict[Optional[str], KeymapTable] = field(default_factory=dict, repr=False)
+    shortcuts: int = 0
+
+    def table(self, device_id: Optional[str] = None) -> KeymapTable:
+        table = self.tables.get(device_id)
+        if table is None:
+            table = self.tables.get(None, EMPTY_KEYMAP)
+        return table
+
+
+def parse_profile(data, name: str = "profile") -> List[Shortcut]:
+    """
+    Validate a profile's JSON: a list of mapper shortcuts or {"shortcuts": [...]};
+    an empty file is an empty profile. Disabled shortcuts (status false) are left out.
+    """
+    if data is None:
+        return []
+    if isinstance(data, dict):
+        data = data.get('shortcuts', [])
+    if not isinstance(data, list):
+        raise ProfileError(f"Profile '{name}': expected a list of shortcuts, got {type(data).__name__}")
+    shortcuts = []
+    for index, entry in enumerate(data):
+        label = entry.get('id', index) if isinstance(entry, dict) else index
+        try:
+            shortcut = _parse_shortcut(entry, str(label))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ProfileError(f"Profile '{name}', shortcut {label}: {e}") from None
+        if shortcut is not None:
+            shortcuts.append(shortcut)
+    return shortcuts
+
+def _parse_shortcut(entry, label: str) -> Optional[Shortcut]:
+    if not isinstance(entry, dict):
+        raise TypeError(f"expected an object, got {type(entry).__name__}")
+    status = entry.get('status', True)
+    if not isinstance(status, bool):
+        raise TypeError("'status' must be true or false")
+    if not status:
+        return None
+
+    key = entry['key']
+    if not isinstance(key, str) or not key:
+        raise TypeError("'key' must be a non-empty string")
+    modifiers = entry.get('modifiers') or []
+    if not isinstance(modifiers, list) or not all(isinstance(name, str) for name in modifiers):
+        raise TypeError("'modifiers' must be a list of names")
+    device_id = entry.get('deviceId') or None
+    if device_id is not None and not isinstance(device_id, str):
+        raise TypeError("'deviceId' must be a string")
+    action_type = entry['actionType']
+    if action_type not in ACTION_TYPES:
+        raise ValueError(f"unknown actionType {action_type!r}")
+    action = entry.get('action')
+    if not isinstance(action, dict):
+        raise TypeError("'action' must be an object")
+
+    return Shortcut(id=label, code=parse_key_name(key), modifiers=modifier_mask(modifiers),
+                    device_id=device_id, action_type=action_type, action=build_action(action_type, action))
+
+def _text(action: dict, name: str) -> str:
+    value = action.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"action needs a non-empty '{name}'")
+    return value.strip()
+
+def build_action(action_type: str, action: dict):
+    """The handler for a mapper action, from action_performer.actions"""
+    if action_type in ("launch", "script"):
+        args = action.get('args') or ""
+        if not isinstance(args, str):
+            raise TypeError("'args' must be a string")
+        return LaunchAction(action_type, _text(action, 'path'), args)
+    if action_type == "hotkey":
+        taps = []
+        for mask, code in parse_sequence(_text(action, 'keys')):
+            taps.append([MODIFIER_CODES[bit] for bit in sorted(MODIFIER_CODES) if mask & bit] + [code])
+        return KeyTapAction(action_type, taps)
+    keys = VOLUME_KEYS if action_type == "volume" else MEDIA_KEYS
+    command = _text(action, 'command')
+    if command not in keys:
+        raise ValueError(f"unknown {action_type} command {command!r}")
+    return KeyTapAction(action_type, [[keys[command]]])
+
+def _action_data(action) -> tuple:
+    """(actionType, argv or key taps): what _action_from_data() rebuilds the handler from"""
+    if isinstance(action, LaunchAction):
+        return action.action_type, action.argv
+    return action.action_type, action.taps
+
+def _action_from_data(data: list):
+    action_type, args = data
+    if action_type in ("launch", "script"):
+        action = LaunchAction(action_type, args[0])
+        action.argv = tuple(args)
+        return action
+    if action_type not in ACTION_TYPES:
+        raise ValueError(f"unknown actionType {action_type!r}")
+    return KeyTapAction(action_type, args)
+
+
+def compile_profile(shortcuts: List[Shortcut], name: str = "profile") -> CompiledProfile:
+    """One table per deviceId; plain keys go into the slots, modified ones into the chord trie"""
+    device_ids = {shortcut.device_id for shortcut in shortcuts} | {None}
+    tables = {}
+    for device_id in device_ids:
+        members = [s for s in shortcuts if s.device_id is None or s.device_id == device_id]
+        table_name = name if device_id is None else f"{name}@{device_id}"
+        tables[device_id] = _compile_group(members, table_name)
+    logger.debug(f"Compiled profile '{name}': {len(shortcuts)} shortcuts, {len(tables)} table(s)")
+    return CompiledProfile(name=name, tables=tables, shortcuts=len(shortcuts))
+
+def _compile_group(shortcuts: List[Shortcut], name: str) -> KeymapTable:
+    bindings = {}
+    chords = {}
+    for shortcut in shortcuts:
+        target, trigger = (chords, ((shortcut.modifiers, shortcut.code),)) if shortcut.modifiers \
+            else (bindings, shortcut.code)
+        if trigger in target:
+            raise ProfileError(f"Profile '{name}': shortcut {shortcut.id} repeats the trigger of another")
+        target[trigger] = shortcut.action
+    try:
+        chord_table = compile_chords(chords, name=f"{name}/chords") if chords else None
+    except ValueError as e:
+        raise ProfileError(f"Profile '{name}': {e}") from None
+    return compile_keymap(bindings, name=name, chords=chord_table)
+
+
+class ProfileLoader:
+    """
+    Loads profiles/<name>.json into CompiledProfiles. Compiled profiles stay
+    in memory (revalidated by a stat) and in a binary cache keyed by the
+    source's mtime and size, falling back to its hash, so only edited
+    profiles are parsed again. cache_dir=None keeps them in memory only.
+    """
+
+    def __init__(self, directory: Optional[str] = None, cache_dir: Optional[str] = None):
+        self.directory = directory or default_profile_dir()
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.cache_hits = 0
+        self.compiles = 0
+        self._loaded: Dict[str, Tuple[Tuple[int, int], CompiledProfile]] = {}
+        self._lock = threading.Lock()
+
+    def names(self) -> List[str]:
+        try:
+            return sorted(entry[:-5] for entry in os.listdir(self.directory) if entry.endswith(".json"))
+        except FileNotFoundError:
+            return []
+
+    def path(self, name: str) -> str:
+        if not name or os.sep in name or name.startswith("."):
+            raise ProfileError(f"Invalid profile name: {name!r}")
+        return os.path.join(self.directory, f"{name}.json")
+
+    def load(self, name: str) -> CompiledProfile:
+        path = self.path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise ProfileError(f"No such profile: {name}") from None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        loaded = self._loaded.get(name)
+        if loaded is not None and loaded[0] == stamp:
+            self.hits += 1
+            return loaded[1]
+
+        with self._lock:
+            profile = self._load_cached(name, stamp)
+            if profile is None:
+                with open(path, "rb") as f:
+                    source = f.read()
+                profile = self._from_source(name, source, stamp)
+            self._loaded[name] = (stamp, profile)
+        return profile
+
+    def compile_profile(self, name: str) -> CompiledProfile:
+        """For device_manager.hotplug.ProfileBinder"""
+        return self.load(name)
+
+    def switch(self, keymap: Keymap, name: str, device_id: Optional[str] = None) -> KeymapTable:
+        """Point a live Keymap at a profile's table; returns the previous table"""
+        return keymap.swap(self.load(name).table(device_id))
+
+    def invalidate(self, name: Optional[str] = None):
+        """Forget in-memory profiles (the disk cache revalidates itself)"""
+        with self._lock:
+            if name is None:
+                self._loaded.clear()
+            else:
+                self._loaded.pop(name, None)
+
+    def _cache_path(self, name: str) -> str:
+        # Keyed by the source's location too, so two profile directories never collide
+        where = hashlib.sha1(os.path.abspath(self.directory).encode()).hexdigest()[:8]
+        return os.path.join(self.cache_dir, f"{name}-{where}{CACHE_SUFFIX}")
+
+    def _trusted(self, path: str, st: os.stat_result) -> bool:
+        """
+        Cached shortcuts can launch programs, and the daemon often runs as
+        root: only use what this user owns and nobody else can write
+        """
+        if st.st_uid == os.geteuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            return True
+        logger.warning(f"Not using profile cache {path}: owned by uid {st.st_uid} "
+                       f"or writable by others (mode {stat.S_IMODE(st.st_mode):o})")
+        return False
+
+    def _cache_dir_trusted(self) -> bool:
+        try:
+            return self._trusted(self.cache_dir, os.stat(self.cache_dir))
+        except FileNotFoundError:
+            return True
+
+    def _load_cached(self, name: str, stamp: Tuple[int, int]) -> Optional[CompiledProfile]:
+        """The cached compile if the source is unchanged; a touched but identical source refreshes the stamp"""
+        if not self.cache_dir or not self._cache_dir_trusted():
+            return None
+        cache_path = self._cache_path(name)
+        try:
+            with open(cache_path, "rb") as f:
+                if not self._trusted(cache_path, os.fstat(f.fileno())):
+                    return None
+                data = f.read()
+            magic, version, code, mtime_ns, size, digest = CACHE_HEADER.unpack_from(data)
+        except FileNotFoundError:
+            return None
+        except (OSError, struct.error) as e:
+            logger.warning(f"Ignoring unreadable profile cache {cache_path}: {e}")
+            return None
+        if magic != CACHE_MAGIC or version != CACHE_VERSION or code != CACHE_CODE:
+            return None
+
+        if (mtime_ns, size) != stamp:
+            with open(self.path(name), "rb") as f:
+                source = f.read()
+            if hashlib.sha256(source).digest() != digest:
+                return self._from_source(name, source, stamp)
+            self._write_cache(name, stamp, digest, data[CACHE_HEADER.size:])
+        try:
+            cached = json.loads(data[CACHE_HEADER.size:])
+            # Actions are immutable, so shortcuts with the same one share it
+            handlers = [_action_from_data(action) for action in cached['actions']]
+            shortcuts = [Shortcut(id=label, code=code, modifiers=modifiers, device_id=device_id,
+                                  action_type=handlers[index].action_type, action=handlers[index])
+                         for label, code, modifiers, device_id, index in cached['shortcuts']]
+            profile = compile_profile(shortcuts, name)
+        except (ValueError, TypeError, KeyError, IndexError) as e:
+            logger.warning(f"Discarding profile cache {cache_path}: {e}")
+            return None
+        self.cache_hits += 1
+        return profile
+
+    def _from_source(self, name: str, source: bytes, stamp: Tuple[int, int]) -> CompiledProfile:
+        try:
+            data = json.loads(source) if source.strip() else None
+        except ValueError as e:
+            raise ProfileError(f"Profile '{name}' is not valid JSON: {e}") from None
+        shortcuts = parse_profile(data, name)
+        profile = compile_profile(shortcuts, name)
+        self.compiles += 1
+        if self.cache_dir:
+            indices = {}
+            entries = [[shortcut.id, shortcut.code, shortcut.modifiers, shortcut.device_id,
+                        indices.setdefault(_action_data(shortcut.action), len(indices))]
+                       for shortcut in shortcuts]
+            payload = {'actions': list(indices), 'shortcuts': entries}
+            self._write_cache(name, stamp, hashlib.sha256(source).digest(),
+                              json.dumps(payload, separators=(",", ":")).encode())
+        logger.info(f"Compiled profile '{name}' ({profile.shortcuts} shortcuts)")
+        return profile
+
+    def _write_cache(self, name: str, stamp: Tuple[int, int], digest: bytes, payload: bytes):
+        cache_path = self._cache_path(name)
+        tmp_path = f"{cache_path}.tmp"
+        try:
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            if not self._cache_dir_trusted():
+                return
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+            with open(fd, "wb") as f:
+                f.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, CACHE_CODE, stamp[0], stamp[1], digest))
+                f.write(payload)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not save profile cache {cache_path}: {e}")
+
+
+# COLDKEYS_PROFILE_CACHE= (empty) keeps compiled profiles in memory only
+PROFILES = ProfileLoader(os.environ.get("COLDKEYS_PROFILE_DIR") or None,
+                         os.environ.get("COLDKEYS_PROFILE_CACHE", default_cache_dir()) or None)
@@ -0,0 +1,171 @@
+# keymap_handler/tap_hold.py
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional, Union
+
+from evdev import ecodes
+from keymap_handler.core import KEY_DOWN, KEY_UP, KeyHandler, resolve_key_code
+from utils.latency import LATENCY, TAP_DECISION
+from utils.logger import get_logger
+from utils.timer_wheel import TIMERS, TimerWheel
+
+logger = get_logger("keymap_tap_hold")
+
+# Decisions
+TAP, HOLD, DOUBLE_TAP, TAP_HOLD = "tap", "hold", "double_tap", "tap_hold"
+
+# Defaults for the mapper's "key hold duration" setting and the double-tap window
+HOLD_TIME = 0.2
+DOUBLE_TAP_TIME = 0.25
+
+# Key states while a decision is pending
+_DOWN, _RELEASED, _SECOND_DOWN, _HELD = range(4)
+
+
+@dataclass(frozen=True)
+class TapHoldBinding:
+    """
+    What a key does when tapped, held, double-tapped or tapped then held.
+    tap/double_tap handlers get KEY_DOWN once decided; hold/tap_hold
+    handlers get KEY_DOWN when decided and KEY_UP on release.
+    """
+    tap: Optional[KeyHandler] = None
+    hold: Optional[KeyHandler] = None
+    double_tap: Optional[KeyHandler] = None
+    tap_hold: Optional[KeyHandler] = None
+    hold_time: float = HOLD_TIME
+    double_tap_time: float = DOUBLE_TAP_TIME
+
+    @property
+    def waits_for_second_tap(self) -> bool:
+        return self.double_tap is not None or self.tap_hold is not None
+
+
+def compile_tap_hold(bindings: Mapping[Union[int, str], TapHoldBinding]) -> tuple:
+    """Keycode-indexed tuple of bindings (None elsewhere), for KeymapTable.tap_hold"""
+    table = [None] * (ecodes.KEY_MAX + 1)
+    for key, binding in bindings.items():
+        if not isinstance(binding, TapHoldBinding):
+            raise TypeError(f"Invalid tap/hold binding for {key!r}: {binding!r}")
+        if binding.hold_time <= 0 or binding.double_tap_time <= 0:
+            raise ValueError(f"Tap/hold times for {key!r} must be positive")
+        table[resolve_key_code(key)] = binding
+    return tuple(table)
+
+
+class _PendingKey:
+    __slots__ = ('device', 'code', 'binding', 'state', 'timer', 'deadline', 'held_action')
+
+    def __init__(self, device, code: int, binding: TapHoldBinding):
+        self.device = device
+        self.code = code
+        self.binding = binding
+        self.state = _DOWN
+        self.timer = None
+        self.deadline = 0.0
+        self.held_action = None
+
+
+class TapHoldEngine:
+    """
+    Classifies presses of tap/hold keys. Pending decisions are timers on a
+    TimerWheel, one per key in flight, so any number of keys across devices
+    cost O(1) per tick. Each timer-driven decision records how far past its
+    configured threshold it fired (latency stage TAP_DECISION).
+    """
+
+    def __init__(self, wheel: Optional[TimerWheel] = None):
+        self.wheel = wheel if wheel is not None else TIMERS
+        self.decisions: Dict[str, int] = {TAP: 0, HOLD: 0, DOUBLE_TAP: 0, TAP_HOLD: 0}
+        self._keys: Dict[tuple, _PendingKey] = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self._keys)
+
+    def feed(self, device, code: int, value: int, binding: TapHoldBinding, now: float):
+        """Take every event of a bound key; actions run once a press is classified"""
+        key = (device.path, code)
+        pending = self._keys.get(key)
+        if value == KEY_DOWN:
+            if pending is None:
+                pending = self._keys[key] = _PendingKey(device, code, binding)
+                if binding.hold is not None:
+                    self._arm(key, pending, now + binding.hold_time)
+            elif pending.state == _RELEASED:
+                self.wheel.cancel(pending.timer)
+                pending.state = _SECOND_DOWN
+                pending.timer = None
+                if binding.tap_hold is not None:
+                    self._arm(key, pending, now + binding.hold_time)
+        elif value == KEY_UP and pending is not None:
+            self.wheel.cancel(pending.timer)
+            pending.timer = None
+            if pending.state == _DOWN:
+                if binding.waits_for_second_tap:
+                    pending.state = _RELEASED
+                    self._arm(key, pending, now + binding.double_tap_time)
+                else:
+                    del self._keys[key]
+                    self._decide(pending, TAP)
+            elif pending.state == _SECOND_DOWN:
+                del self._keys[key]
+                if binding.double_tap is not None:
+                    self._decide(pending, DOUBLE_TAP)
+                else:
+                    # Only waited for a tap_hold: that was two plain taps
+                    self._decide(pending, TAP)
+                    self._decide(pending, TAP)
+            elif pending.state == _HELD:
+                del self._keys[key]
+                self._run(pending, pending.held_action, KEY_UP)
+        # Autorepeats (KEY_HOLD) carry nothing the timers don't already know
+
+    def _arm(self, key: tuple, pending: _PendingKey, deadline: float):
+        pending.deadline = deadline
+        pending.timer = self.wheel.schedule(deadline, self._expired, key)
+
+    def _expired(self, now: float, key: tuple):
+        pending = self._keys.get(key)
+        if pending is None:
+            return
+        pending.timer = None
+        if pending.state == _RELEASED:
+            del self._keys[key]
+            decision = TAP
+        else:
+            pending.state, decision = _HELD, HOLD if pending.state == _DOWN else TAP_HOLD
+        if LATENCY.enabled:
+            # How far past the configured hold/double-tap time the decision came
+            LATENCY.record(TAP_DECISION, decision, int((now - pending.deadline) * 1e9))
+        self._decide(pending, decision)
+
+    def _decide(self, pending: _PendingKey, decision: str):
+        self.decisions[decision] += 1
+        action = getattr(pending.binding, decision)
+        if decision in (HOLD, TAP_HOLD):
+            pending.held_action = action
+        self._run(pending, action, KEY_DOWN)
+
+    def _run(self, pending: _PendingKey, action: Optional[KeyHandler], value: int):
+        if action is None:
+            return
+        try:
+            action(pending.device, pending.code, value)
+        except Exception as e:
+            logger.error(f"Tap/hold action failed for key {pending.code} on {pending.device.path}: {e}")
+
+    def reset(self, path: Optional[str] = None):
+        """
+        Drop pending decisions (of one device, or all) without running them;
+        keys already decided as held get their release
+        """
+        for key, pending in list(self._keys.items()):
+            if path is None or key[0] == path:
+                self.wheel.cancel(pending.timer)
+                del self._keys[key]
+                if pending.state == _HELD:
+                    self._run(pending, pending.held_action, KEY_UP)
+
+
+# Tap/hold state of every device read through input_handler
+TAP_HOLD_ENGINE = TapHoldEngine()
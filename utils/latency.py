@@ -0,0 +1,153 @@
+# utils/latency.py
+import json
+import os
+import threading
+from array import array
+from typing import Dict, Optional
+
+# Stages of the input path, each measured in nanoseconds
+KERNEL_TO_READ = "kernel_to_read"      # kernel event timestamp -> frame handled
+READ_TO_MAPPED = "read_to_mapped"      # frame handled -> keymap resolved
+MAPPED_TO_ACTION = "mapped_to_action"  # action / passthrough write started -> returned
+TAP_DECISION = "tap_decision"          # tap/hold threshold reached -> press classified
+
+SUB_BUCKET_BITS = 7                    # 128 linear sub-buckets: ~1% relative precision
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF_SUB_BUCKETS = SUB_BUCKETS >> 1
+MAX_VALUE_BITS = 40                    # ~18 minutes in ns; larger values are clamped
+
+
+class LatencyHistogram:
+    """
+    HDR-style log-bucketed histogram: exact below 128, then 64 linear
+    sub-buckets per power of two, so recording is O(1) and memory is fixed.
+    """
+
+    BUCKET_COUNT = (MAX_VALUE_BITS - SUB_BUCKET_BITS + 1) * HALF_SUB_BUCKETS + HALF_SUB_BUCKETS
+    MAX_VALUE = (1 << MAX_VALUE_BITS) - 1
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = array('Q', bytes(8 * self.BUCKET_COUNT))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def bucket_index(value: int) -> int:
+        if value < SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return shift * HALF_SUB_BUCKETS + (value >> shift)
+
+    @staticmethod
+    def bucket_value(index: int) -> int:
+        """Highest value that lands in bucket `index`"""
+        if index < SUB_BUCKETS:
+            return index
+        shift = (index - HALF_SUB_BUCKETS) // HALF_SUB_BUCKETS
+        mantissa = index - shift * HALF_SUB_BUCKETS
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int):
+        if value < 0:
+            value = 0
+        elif value > self.MAX_VALUE:
+            value = self.MAX_VALUE
+        self.counts[self.bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+    def percentile(self, percent: float) -> int:
+        if not self.count:
+            return 0
+        target = max(1, int(round(self.count * percent / 100.0)))
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            if bucket:
+                seen += bucket
+                if seen >= target:
+                    return min(self.bucket_value(index), self.max)
+        return self.max
+
+    def merge(self, other: "LatencyHistogram"):
+        counts = self.counts
+        for index, bucket in enumerate(other.counts):
+            if bucket:
+                counts[index] += bucket
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+
+    def summary(self) -> Dict[str, float]:
+        """Counts plus p50/p99/p999 in microseconds"""
+        return {
+            'count': self.count,
+            'min_us': (self.min or 0) / 1e3,
+            'mean_us': (self.total / self.count / 1e3) if self.count else 0.0,
+            'p50_us': self.percentile(50) / 1e3,
+            'p99_us': self.percentile(99) / 1e3,
+            'p999_us': self.percentile(99.9) / 1e3,
+            'max_us': self.max / 1e3,
+        }
+
+
+class LatencyRecorder:
+    """Histograms per (stage, label); labels are device paths or action types"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._histograms: Dict[tuple, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage: str, label: str) -> LatencyHistogram:
+        key = (stage, label)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, LatencyHistogram())
+        return histogram
+
+    def record(self, stage: str, label: str, nanoseconds: int):
+        self.histogram(stage, label).record(nanoseconds)
+
+    def summary(self, stage: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Queryable at runtime: {stage: {label: {count, p50_us, p99_us, ...}}}"""
+        result: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for (hist_stage, label), histogram in list(self._histograms.items()):
+            if stage is None or hist_stage == stage:
+                result.setdefault(hist_stage, {})[label] = histogram.summary()
+        return result
+
+    def dump_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2, sort_keys=True)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+def action_label(action) -> str:
+    """
+    MAPPED_TO_ACTION label of an action: its action_type or function name;
+    keymap sentinels such as PASSTHROUGH go by their lowercased name
+    """
+    label = getattr(action, 'action_type', None) or getattr(action, '__name__', None)
+    if label is None:
+        name = getattr(action, 'name', None)
+        label = name.lower() if isinstance(name, str) else 'handler'
+    return label
+
+
+# Shared recorder for the input -> keymap -> action path. Off unless
+# COLDKEYS_LATENCY=1: the clock reads cost more than the path they time
+LATENCY = LatencyRecorder(enabled=os.environ.get("COLDKEYS_LATENCY", "0") == "1")
@@ -1,4 +1,6 @@
 # utils/led_control.py
+import threading
+from typing import Dict, Iterable
 
 from evdev import ecodes
 from utils.logger import get_logger
@@ -11,8 +13,66 @@ LED_CODES = {
     'SCROLL_LOCK': ecodes.LED_SCROLLL,
 }
 
-# Store just one global LED state
-GLOBAL_LED_STATE = {}
+
+class LedStateRegistry:
+    """
+    LED state per device path, saved when a device is grabbed and written
+    back to that same device when it is released
+    """
+
+    def __init__(self):
+        self._states: Dict[str, Dict[int, bool]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def save(self, device) -> bool:
+        """Remember the device's lock LEDs (one EVIOCGLED); False if they could not be read"""
+        try:
+            lit = set(device.leds())
+        except Exception as e:
+            logger.warning(f"Could not save LED state from {device.path}: {e}")
+            return False
+        state = {code: code in lit for code in LED_CODES.values()}
+        with self._lock:
+            self._states[device.path] = state
+        logger.debug(f"Saved LED state of {device.path}: {state}")
+        return True
+
+    def saved(self, path: str) -> Dict[int, bool]:
+        return dict(self._states.get(path, {}))
+
+    def forget(self, path: str):
+        with self._lock:
+            self._states.pop(path, None)
+
+    def restore(self, devices: Iterable, forget: bool = True) -> int:
+        """
+        Put saved LED state back on devices that have one, writing only the
+        LEDs that differ and one SYN per device; returns the LED writes made
+        """
+        writes = 0
+        for device in devices:
+            with self._lock:
+                state = self._states.pop(device.path, None) if forget else self._states.get(device.path)
+            if not state:
+                continue
+            try:
+                lit = set(device.leds())
+                changed = [(code, value) for code, value in state.items() if (code in lit) != value]
+                for code, value in changed:
+                    device.write(ecodes.EV_LED, code, int(value))
+                if changed:
+                    device.syn()
+                writes += len(changed)
+            except Exception as e:
+                logger.warning(f"Could not restore LEDs on {device.name} ({device.path}): {e}")
+        return writes
+
+
+# LED state of the devices currently grabbed through device_manager.linux
+LED_STATES = LedStateRegistry()
 
 def set_led_state(device, led_name, state):
     code = LED_CODES.get(led_name.upper())
@@ -25,42 +85,15 @@ def set_led_state(device, led_name, state):
         logger.warning(f"Failed to set {led_name} on {device.name}: {e}")
 
 def save_led_state(device):
-    global GLOBAL_LED_STATE
-    try:
-        cache = {}
-        for name, code in LED_CODES.items():
-            current = code in device.leds()
-            cache[name] = current
-        GLOBAL_LED_STATE = cache
-        logger.debug(f"Saved global LED state from {device.path}: {cache}")
-    except Exception as e:
-        logger.warning(f"Could not save LED state from {device.path}: {e}")
+    LED_STATES.save(device)
 
 def restore_led_state(device):
-    if not GLOBAL_LED_STATE:
-        logger.debug("No global LED state to restore.")
-        return
-    try:
-        for name, value in GLOBAL_LED_STATE.items():
-            set_led_state(device, name, value)
-        logger.info(f"Restored global LED state on {device.name}")
-    except Exception as e:
-        logger.warning(f"Could not restore LEDs on {device.path}: {e}")
+    if LED_STATES.restore([device]):
+        logger.info(f"Restored LED state on {device.name}")
 
 def restore_led_state_all():
-    """
-    Restores LED state for all connected keyboards using GLOBAL_LED_STATE.
-    """
-    if not GLOBAL_LED_STATE:
-        logger.warning("GLOBAL_LED_STATE is empty. Nothing to restore.")
-        return
-
-    from device_manager.linux import list_keyboards, open_device
-    
-    keyboards = list_keyboards()
-    for name, path in keyboards:
-        try:
-            device = open_device(path)
-            restore_led_state(device)
-        except Exception as e:
-            logger.warning(f"Could not restore LED for {name} ({path}): {e}")
+    """Restore LED state on every open device that has one saved, without reopening anything"""
+    from device_manager.handles import DEVICE_HANDLES
+
+    writes = LED_STATES.restore(DEVICE_HANDLES.open_devices())
+    logger.debug(f"Restored LED state with {writes} LED write(s)")
@@ -1,22 +1,231 @@
 # utils/logger.py
+import atexit
+import itertools
 import logging
+import logging.handlers
 import os
+import queue
+import struct
+from typing import Dict, List, Optional
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# "sync": handlers write on the calling thread
+# "async": a background QueueListener owns the console and file handlers
+LOG_MODE = os.environ.get("COLDKEYS_LOG_MODE", "sync")
+LOG_LEVEL = getattr(logging, os.environ.get("COLDKEYS_LOG_LEVEL", "DEBUG").upper(), logging.DEBUG)
+
+_managed: Dict[str, str] = {}  # logger name -> log file
+_listeners: Dict[str, logging.handlers.QueueListener] = {}
+_queue_handlers: Dict[str, logging.handlers.QueueHandler] = {}
+_gates: List["LogGate"] = []
+
+def _build_handlers(log_file: str) -> List[logging.Handler]:
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    # Console output
+    ch = logging.StreamHandler()
+    ch.setFormatter(formatter)
+
+    # File output
+    fh = logging.FileHandler(log_file)
+    fh.setFormatter(formatter)
+
+    return [ch, fh]
+
+def _queue_handler_for(log_file: str) -> logging.handlers.QueueHandler:
+    """One queue and listener thread per log file, shared by every logger"""
+    handler = _queue_handlers.get(log_file)
+    if handler is None:
+        log_queue = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(log_queue)
+        listener = logging.handlers.QueueListener(log_queue, *_build_handlers(log_file))
+        listener.start()
+        _queue_handlers[log_file] = handler
+        _listeners[log_file] = listener
+    return handler
+
+def _attach_handlers(logger: logging.Logger, log_file: str):
+    if LOG_MODE == "async":
+        logger.addHandler(_queue_handler_for(log_file))
+    else:
+        for handler in _build_handlers(log_file):
+            logger.addHandler(handler)
 
 def get_logger(name: str, log_file: str = "device_log.log"):
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(LOG_LEVEL)
 
     if not logger.handlers:
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        _attach_handlers(logger, log_file)
+        _managed[name] = log_file
 
-        # Console output
-        ch = logging.StreamHandler()
-        ch.setFormatter(formatter)
-        logger.addHandler(ch)
+    return logger
 
-        # File output
-        fh = logging.FileHandler(log_file)
-        fh.setFormatter(formatter)
-        logger.addHandler(fh)
+def set_log_mode(mode: str):
+    """Switch every logger created by get_logger between "sync" and "async" """
+    global LOG_MODE
+    if mode not in ("sync", "async"):
+        raise ValueError(f"Unknown log mode: {mode}")
+    if mode == LOG_MODE:
+        return
 
-    return logger
+    LOG_MODE = mode
+    for name, log_file in _managed.items():
+        logger = logging.getLogger(name)
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            if not isinstance(handler, logging.handlers.QueueHandler):
+                handler.close()
+        _attach_handlers(logger, log_file)
+
+    if mode == "sync":
+        stop_log_listeners()
+
+def set_log_level(level: int):
+    """Change the level of every managed logger and refresh hot-path gates"""
+    global LOG_LEVEL
+    LOG_LEVEL = level
+    for name in _managed:
+        logging.getLogger(name).setLevel(level)
+    for gate in _gates:
+        gate.refresh()
+
+def stop_log_listeners():
+    """Flush and stop background listeners (also run at interpreter exit)"""
+    for listener in _listeners.values():
+        listener.stop()
+    _listeners.clear()
+    _queue_handlers.clear()
+
+atexit.register(stop_log_listeners)
+
+
+class LogGate:
+    """
+    Precomputed isEnabledFor() for hot paths: `if gate.enabled:` is a single
+    attribute read, so disabled logging never builds its message.
+    """
+
+    __slots__ = ('logger', 'level', 'enabled')
+
+    def __init__(self, logger: logging.Logger, level: int = logging.DEBUG):
+        self.logger = logger
+        self.level = level
+        self.enabled = False
+        self.refresh()
+        _gates.append(self)
+
+    def refresh(self):
+        self.enabled = self.logger.isEnabledFor(self.level)
+
+
+class EventJournal:
+    """
+    Preallocated binary ring of fixed-size event records. Recording is one
+    struct.pack_into; nothing is formatted until snapshot()/flush() is called.
+    """
+
+    # timestamp, device id, type, code, action id, value
+    RECORD = struct.Struct("<dHHHHi")
+
+    def __init__(self, capacity: int = 65536):
+        self.capacity = capacity
+        self.buffer = bytearray(self.RECORD.size * capacity)
+        self._sequence = itertools.count()  # next() is atomic under the GIL
+        self._written = 0
+        self._flushed = 0
+        self._pack_into = self.RECORD.pack_into
+        self._record_size = self.RECORD.size
+        self._frame_structs: Dict[int, struct.Struct] = {}
+
+        self.device_names: List[str] = []
+        self._device_ids: Dict[str, int] = {}
+        self.action_names: List[str] = []
+        self._action_ids: Dict[str, int] = {}
+        self.action_id("none")
+
+    def device_id(self, path: str) -> int:
+        device_id = self._device_ids.get(path)
+        if device_id is None:
+            device_id = self._device_ids.setdefault(path, len(self.device_names))
+            if device_id == len(self.device_names):
+                self.device_names.append(path)
+        return device_id
+
+    def action_id(self, name: str) -> int:
+        action_id = self._action_ids.get(name)
+        if action_id is None:
+            action_id = self._action_ids.setdefault(name, len(self.action_names))
+            if action_id == len(self.action_names):
+                self.action_names.append(name)
+        return action_id
+
+    def record(self, timestamp: float, device_id: int, etype: int, code: int, value: int, action_id: int = 0):
+        sequence = next(self._sequence)
+        self._pack_into(self.buffer, (sequence % self.capacity) * self._record_size,
+                        timestamp, device_id, etype, code, action_id, value)
+        if sequence >= self._written:
+            self._written = sequence + 1
+
+    def record_frame(self, fields: list):
+        """
+        Record several events with one pack: fields holds each event's
+        (timestamp, device id, type, code, action id, value) back to back
+        """
+        count = len(fields) // 6
+        if not count:
+            return
+        # max(islice(count)) runs in C, so the sequences taken are contiguous
+        last = max(itertools.islice(self._sequence, count))
+        first = last - count + 1
+        offset = first % self.capacity
+        if offset + count <= self.capacity:
+            frame_struct = self._frame_structs.get(count)
+            if frame_struct is None:
+                frame_struct = self._frame_structs.setdefault(count, struct.Struct("<" + "dHHHHi" * count))
+            frame_struct.pack_into(self.buffer, offset * self._record_size, *fields)
+        else:
+            # Wraps around the end of the ring
+            for index in range(count):
+                self._pack_into(self.buffer, ((first + index) % self.capacity) * self._record_size,
+                                *fields[index * 6:index * 6 + 6])
+        if last >= self._written:
+            self._written = last + 1
+
+    def __len__(self) -> int:
+        return min(self._written, self.capacity)
+
+    def snapshot(self, since: Optional[int] = None) -> List[tuple]:
+        """Decode records (oldest first), optionally only those after sequence `since`"""
+        end = self._written
+        start = max(end - self.capacity, since if since is not None else 0)
+        size = self.RECORD.size
+        unpack_from = self.RECORD.unpack_from
+        return [unpack_from(self.buffer, (seq % self.capacity) * size) for seq in range(start, end)]
+
+    def format_record(self, record: tuple) -> str:
+        timestamp, device_id, etype, code, action_id, value = record
+        device = self.device_names[device_id] if device_id < len(self.device_names) else device_id
+        action = self.action_names[action_id] if action_id < len(self.action_names) else action_id
+        return f"{timestamp:.6f} {device} type={etype} code={code} value={value} action={action}"
+
+    def flush(self, logger: logging.Logger, level: int = logging.INFO) -> int:
+        """Format everything recorded since the last flush into `logger`"""
+        end = self._written
+        records = self.snapshot(since=self._flushed)
+        self._flushed = end
+        if records and logger.isEnabledFor(level):
+            for record in records:
+                logger.log(level, self.format_record(record))
+        return len(records)
+
+    def dump(self, path: str):
+        """Write the raw ring contents (oldest first) for offline decoding"""
+        with open(path, "wb") as f:
+            for record in self.snapshot():
+                f.write(self.RECORD.pack(*record))
+
+
+# Shared journal for the input hot path
+EVENT_JOURNAL = EventJournal()
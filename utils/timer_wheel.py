@@ -0,0 +1,136 @@
+# utils/timer_wheel.py
+import math
+import time
+from typing import Callable, Dict, Optional
+
+TICK = 0.001
+SLOTS = 1024  # one round is ~1 s at the default tick; later timers wait in their round's bucket
+
+
+class TimerWheel:
+    """
+    Timer wheel with one bucket per later round. schedule() and cancel() are
+    O(1). The slots only hold timers due this round, so each tick of
+    advance() looks at one slot whose timers are all due; a round's bucket
+    is moved into the slots once, when that round starts. Not thread-safe:
+    use it from the loop that advances it.
+    """
+
+    def __init__(self, tick: float = TICK, slots: int = SLOTS, now: Optional[float] = None):
+        if slots & (slots - 1):
+            raise ValueError(f"Slot count must be a power of two: {slots}")
+        self.tick = tick
+        self._mask = slots - 1
+        self._bits = slots.bit_length() - 1
+        self._slots = [{} for _ in range(slots)]
+        # Round (due tick >> bits) -> timers due in that round, for rounds after the current one
+        self._rounds: Dict[int, dict] = {}
+        self._current = int((time.time() if now is None else now) / tick)
+        self._where: Dict[int, dict] = {}
+        # Lower bound on the earliest pending due tick (cancels may leave it
+        # early, which only costs a wakeup); inf while nothing is pending
+        self._earliest = math.inf
+        self._next_id = 0
+        self.fired = 0
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def schedule(self, deadline: float, callback: Callable, *args) -> int:
+        """Run callback(now, *args) from the first advance() at or after deadline; returns a timer id"""
+        due_tick = max(math.ceil(deadline / self.tick), self._current + 1)
+        timer_id = self._next_id
+        self._next_id += 1
+        round_ = due_tick >> self._bits
+        if round_ == self._current >> self._bits:
+            slot = self._slots[due_tick & self._mask]
+        else:
+            slot = self._rounds.get(round_)
+            if slot is None:
+                slot = self._rounds[round_] = {}
+        slot[timer_id] = (due_tick, callback, args)
+        self._where[timer_id] = slot
+        if due_tick < self._earliest:
+            self._earliest = due_tick
+        return timer_id
+
+    def cancel(self, timer_id: Optional[int]) -> bool:
+        slot = self._where.pop(timer_id, None)
+        if slot is None:
+            return False
+        due_tick = slot.pop(timer_id)[0]
+        if not slot and self._rounds.get(due_tick >> self._bits) is slot:
+            del self._rounds[due_tick >> self._bits]
+        return True
+
+    def next_deadline(self) -> Optional[float]:
+        """When the earliest pending timer is due, None while nothing is pending"""
+        if not self._where:
+            return None
+        return self._earliest * self.tick
+
+    def next_timeout(self, now: Optional[float] = None) -> Optional[float]:
+        """How long the owning loop may block: until the earliest deadline, None while nothing is pending"""
+        if not self._where:
+            return None
+        if now is None:
+            now = time.time()
+        return max(self._earliest * self.tick - now, 0.0)
+
+    def advance(self, now: Optional[float] = None) -> int:
+        """Fire every timer due by now; returns how many fired"""
+        if now is None:
+            now = time.time()
+        target = int(now / self.tick)
+        fired = 0
+        while self._current < target:
+            if self._earliest > target:
+                # Nothing due yet: skip the idle stretch in one step
+                self._move_to(target)
+                break
+            # Ticks before the earliest due one have nothing to fire
+            current = max(self._current + 1, self._earliest)
+            self._move_to(current)
+            slot = self._slots[current & self._mask]
+            # Everything in the slot is due now; callbacks may cancel the rest
+            # or schedule more, which never lands in this slot
+            for timer_id in list(slot):
+                entry = slot.pop(timer_id, None)
+                if entry is None:
+                    continue
+                del self._where[timer_id]
+                entry[1](now, *entry[2])
+                fired += 1
+            if self._earliest <= current:
+                self._earliest = self._find_earliest()
+        self.fired += fired
+        return fired
+
+    def _move_to(self, tick: int):
+        """Make tick current; entering a new round moves its bucket into the slots"""
+        round_ = tick >> self._bits
+        changed = round_ != self._current >> self._bits
+        self._current = tick
+        if changed:
+            bucket = self._rounds.pop(round_, None)
+            if bucket:
+                slots, mask, where = self._slots, self._mask, self._where
+                for timer_id, entry in bucket.items():
+                    slot = slots[entry[0] & mask]
+                    slot[timer_id] = entry
+                    where[timer_id] = slot
+
+    def _find_earliest(self) -> float:
+        """Due tick of the earliest pending timer: the next occupied slot this round, else the next round's"""
+        if not self._where:
+            return math.inf
+        slots, mask, current = self._slots, self._mask, self._current
+        for tick in range(current + 1, ((current >> self._bits) + 1) << self._bits):
+            if slots[tick & mask]:
+                return tick
+        return min(entry[0] for entry in self._rounds[min(self._rounds)].values())
+
+
+# Timers of the input loop; EventReactor advances it between polls and the
+# asyncio front end from a ticker task. Threads reading on their own keep their own wheel
+TIMERS = TimerWheel()